@@ -0,0 +1,145 @@
+import os
+import sys
+import textwrap
+import pytest
+
+# A stand-in for krono, for tests that relax models: a package with the same
+# modules and classes (gravity.tof4, models.*Model, eos.aneos_pure and
+# eos.mh13_scvh) whose "relaxation" is a cheap fixed-point iteration. Each
+# outer iteration makes one call to each eos and moves the model's adjusted
+# quantities a fixed fraction of the way to their converged values, so
+# iteration and eos call counts are exact and warm starts converge faster. J2
+# is proportional to the rotation parameter small and J4 linear in rio.
+_STUB = {
+    '__init__.py': "__version__ = 'stub-1'\n",
+    'const.py': "cgrav = 6.674e-8; mjup = 1.898e30; rjup = 7.1492e9\n",
+    'eos/__init__.py': "",
+    'eos/aneos_pure.py': '''
+        import numpy as np
+
+        class eos:
+            def __init__(self, name):
+                self.name = name
+
+            def get_logrho(self, logp, logt):
+                off = {'ice': 0.2, 'serpentine': 0.5}.get(self.name, 0.4)
+                return 0.4*np.asarray(logp) - 0.1*np.asarray(logt) + off
+
+            def get_logs(self, logp, logt):
+                return 0.01*np.asarray(logp) + 0.02*np.asarray(logt)
+        ''',
+    'eos/mh13_scvh.py': '''
+        import numpy as np
+
+        class eos:
+            def get_logrho(self, logp, logt, y):
+                return 0.5*np.asarray(logp) - 0.3*np.asarray(logt) + 0.1*y
+        ''',
+    'models.py': '''
+        import numpy as np
+
+        # converged values of the adjusted quantities
+        TARGETS = {'z2': 0.3, 'y2_xy': 0.32, 'ri': 0.12, 'small': 0.09}
+
+        class _Model:
+            adjusts = ()
+
+            def __init__(self, hhe_eos, z_eos, params, y_adjust_qty=None):
+                self.hhe_eos = hhe_eos
+                self.z_eos = z_eos
+                self.params = params
+                for key in ('z2', 'y2_xy', 'ri', 'small'):
+                    if key in params:
+                        setattr(self, key, params[key])
+
+            def keys(self):
+                return [key for key in self.adjusts if key in self.params] + \\
+                       (['small'] if self.params.get('adjust_small') else [])
+
+            def update(self, logp, logt):
+                rho = (self.hhe_eos.get_logrho(logp, logt, 0.27) +
+                       self.z_eos.get_logrho(logp, logt))
+                return 10**(0.5*rho)
+
+            def adjust(self):
+                change = 0.0
+                for key in self.keys():
+                    new = TARGETS[key] + 0.5*(getattr(self, key) - TARGETS[key])
+                    change = max(change, abs(new - getattr(self, key)))
+                    setattr(self, key, new)
+                return change
+
+        class dualCavityModel(_Model):
+            adjusts = ('z2',)
+
+        class twoLayerModel(_Model):
+            adjusts = ('y2_xy',)
+
+        class threeLayerModel(_Model):
+            adjusts = ('y2_xy', 'ri')
+        ''',
+    'gravity.py': '''
+        import itertools
+        import numpy as np
+
+        _uid = itertools.count()
+
+        class tof4:
+            def __init__(self, model, params):
+                self.model = model
+                self.params = params
+                self.uid = next(_uid)
+                nz = params['nz']
+                self.l = np.linspace(1e-3, 1, nz)
+                self.p = np.logspace(13, 6, nz)
+                self.t = np.logspace(4.5, 2.2, nz)
+                self.rho = np.ones(nz)
+
+            def relax(self):
+                self.outer_iteration = 0
+                for it in range(self.params.get('max_iters_outer', 199)):
+                    self.outer_iteration = it + 1
+                    self.rho = self.model.update(np.log10(self.p),
+                                                 np.log10(self.t))
+                    if self.model.adjust() < 1e-6:
+                        break
+                else:
+                    raise RuntimeError('Outer iterations did not converge.')
+                z2 = getattr(self.model, 'z2', 0.3)
+                small = getattr(self.model, 'small', 0.089)
+                self.j2 = 0.0147*(1 + 0.01*z2)*small/0.089
+                self.j4 = -5.8e-4*(1 + 0.1*self.params.get('rio', 0.0))
+                self.j6, self.j8 = 3.4e-5, -2.4e-6
+                self.j10, self.j12, self.j14 = 1.7e-7, 0.0, 0.0
+                self.mtot_calc = self.params['mtot']
+                self.ymean_xy = self.params.get('ymean_xy', 0.275)
+        ''',
+}
+
+@pytest.fixture(scope='session')
+def krono_stub(tmp_path_factory):
+    """Directory holding the stub krono package (see _STUB)."""
+    root = tmp_path_factory.mktemp('krono_stub')
+    for name, src in _STUB.items():
+        fname = root / 'krono' / name
+        fname.parent.mkdir(parents=True, exist_ok=True)
+        fname.write_text(textwrap.dedent(src))
+    return str(root)
+
+@pytest.fixture
+def krono(krono_stub, tmp_path, monkeypatch):
+    """Make `import krono` give the stub, with caches under tmp_path."""
+    import lamat2021 as l21
+    if 'krono' in sys.modules and not sys.modules['krono'].__file__.startswith(
+            krono_stub):
+        pytest.skip("a real krono is already imported")
+    monkeypatch.syspath_prepend(krono_stub)
+    monkeypatch.setenv('PYTHONPATH', os.pathsep.join(
+        [krono_stub, os.path.dirname(l21.__file__),
+         os.getenv('PYTHONPATH', '')]))
+    monkeypatch.setenv('LAMAT2021_CACHE', str(tmp_path / 'cache'))
+    monkeypatch.setattr(l21, '_eos_instances', {})
+    monkeypatch.setattr(l21, '_memo_instances', {})
+    monkeypatch.setattr(l21, '_stores', {})
+    import krono
+    return krono
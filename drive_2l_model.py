@@ -3,13 +3,10 @@
 #   python driver_2l_model.py --help
 # for list of required and optional parameters.
 #------------------------------------------------------------------------------
-import sys, os
-import numpy as np
+import os
 import argparse
 import observables
-from timeit import default_timer as timer
-from krono import gravity, const, models
-from krono.eos import mh13_scvh, aneos_pure
+import lamat2021 as l21
 
 def _main(args):
 
@@ -59,10 +56,54 @@ def _main(args):
 
     params['use_gauss_lobatto'] = args.use_gauss_lobatto
 
+    # Z-component eos: a material name or an ice mass fraction
+    try:
+        z_spec = float(args.z_eos)
+    except ValueError:
+        z_spec = args.z_eos
+
+    # Hand the model to a running model server instead (see drive_server.py)
+    if args.server is not None:
+        req = {'model': 'twoLayerModel', 'params': params, 'z_eos': z_spec}
+        if args.cache:
+            req['cache'] = os.path.abspath(args.cache)
+        if args.checkpoint:
+            req['checkpoint'] = [os.path.abspath(args.checkpoint),
+                                 args.checkpoint_every]
+        if args.accel:
+            req['accel'] = args.accel
+        rec = l21.submit(req, args.server or None)
+        if rec['status'] != 'ok':
+            raise RuntimeError(
+                    f"Server failed to relax model: {rec['status']} "
+                    f"{rec.get('error', '')}")
+        return l21.CachedModel(rec), obs
+
+    # Imported here so that runs handed to a server never import krono
+    from krono import gravity, models
+
+    # Return the cached result if this exact model was relaxed before
+    if args.cache:
+        cache = l21.ResultCache(args.cache)
+        ckey = cache.key(params, model='twoLayerModel', eos=l21.eos_tag(z_spec))
+        entry = cache.get(ckey)
+        if entry is not None:
+            return l21.CachedModel(entry), obs
+
+    # Resume from the checkpoint of an interrupted run, if there is one
+    ckpt = None
+    if args.checkpoint:
+        ckpt = l21.Checkpoint(args.checkpoint, args.checkpoint_every)
+        if ckpt.resume(params, 'twoLayerModel') is not None:
+            l21.apply_warm_start(params, ckpt.state, model='twoLayerModel')
+
     # Initialize eos objects
     try:
-        hhe_eos = mh13_scvh.eos()
-        z_eos = aneos_pure.eos('ice')
+        hhe_eos = l21.get_eos('hhe')
+        z_eos = l21.get_z_eos(z_spec)
+        if args.memo_eos:
+            hhe_eos = l21.memo_eos('hhe', args.memo_eos)
+            z_eos = l21.memo_eos(z_spec, args.memo_eos)
     except OSError:
         raise Exception('Failed to initialize eos; did you unpack eos_data.tar.gz?')
 
@@ -71,7 +112,25 @@ def _main(args):
 
     # Finally, make a tof4 instance and relax the model
     t = gravity.tof4(model, params)
+    if ckpt is not None:
+        if ckpt.state is not None:
+            l21.seed_tof(t, ckpt.state)
+        ckpt.attach(t)
+    if args.accel:
+        l21.OuterAccelerator(args.accel).attach(t)
     t.relax()
+    if ckpt is not None:
+        ckpt.clear()
+    if args.accel and args.verbosity > 0:
+        rec = l21.summarize(t)
+        print(f"{rec['niter']} outer iterations, {rec['n_accel']} " +
+              f"accelerated ({args.accel}).")
+    if args.memo_eos and args.verbosity > 0:
+        for (spec, tol), st in l21.memo_stats().items():
+            print(f"eos memo {spec}: {st['hits']} hits, {st['misses']} " +
+                  f"misses ({st['hit_rate']:.1%}), {st['nbytes']/2**20:.1f} MB")
+    if args.cache:
+        cache.put(ckey, t)
     return t, obs
 
 def _PCL():
@@ -99,6 +158,19 @@ def _PCL():
     parser.add_argument('--prefix', default='',
         help="Base name for output directory.")
 
+    parser.add_argument('--cache', default='',
+        help="Result cache directory; reuse a cached model if one matches.")
+
+    parser.add_argument('--server', nargs='?', const='', default=None,
+        help="Relax on a running model server (drive_server.py) listening " +
+             "on this socket (default: $LAMAT2021_SOCKET or a /tmp path).")
+
+    parser.add_argument('--checkpoint', default='',
+        help="Checkpoint file (.npz); resume from it if it exists.")
+
+    parser.add_argument('--checkpoint-every', type=float, default=600.,
+        help="Seconds between checkpoints.")
+
     mdlgroup = parser.add_argument_group('Additional model options')
 
     mdlgroup.add_argument('--rt', type=float, default=0.8,
@@ -111,7 +183,7 @@ def _PCL():
         help="Number of zones (model resolution).")
 
     mdlgroup.add_argument('--f-ice', type=float, default=0.5,
-        help="Not really sure what this does, maybe eos mixing?")
+        help="Passed to the model as f_ice (the Z eos is set by --z-eos).")
 
     mdlgroup.add_argument('--y-mean', type=float, default=0.275,
         help="Target M_He/(M_H + M_He) fraction (solar is 0.275).")
@@ -125,6 +197,9 @@ def _PCL():
     mdlgroup.add_argument('--M-tol', type=float, default=1e-4,
         help="Mass convergence tolerance.")
 
+    mdlgroup.add_argument('--accel', choices=['anderson','secant'],
+        help="Accelerate the outer iterations with this method.")
+
     mdlgroup.add_argument('--max-iters', type=int, default=199,
         help="Stop if fail to converge after this many iterations.")
 
@@ -133,6 +208,13 @@ def _PCL():
 
     eosgroup = parser.add_argument_group('EOS options')
 
+    eosgroup.add_argument('--z-eos', default='ice',
+        help="aneos_pure material for the Z component, or a number to use " +
+             "that ice mass fraction in a tabulated ice/rock mixture.")
+
+    eosgroup.add_argument('--memo-eos', type=float, default=0.,
+        help="Memoize eos calls at this absolute tolerance (0 disables).")
+
     eosgroup.add_argument('--drho-a', type=float, default=0.0,
         help="Force ad-hoc relative density change (usually negative).")
 
@@ -159,7 +241,5 @@ if __name__ == "__main__":
     print(f"Model J2 = {mdl.j2}")
     print(f"Model J4 = {mdl.j4}")
     print(f"Model J6 = {mdl.j6}")
-    J_err = np.sqrt(((mdl.j2 - obs.J2)/obs.dJ2)**2 +
-                    ((mdl.j4 - obs.J4)/obs.dJ4)**2 +
-                    ((mdl.j6 - obs.J6)/obs.dJ6)**2)
+    J_err = obs.J_mahalanobis(l21.model_Js(mdl), jmax=6)
     print(f"Model-to-observation Mahalanobis distance = {J_err}")
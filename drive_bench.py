@@ -0,0 +1,85 @@
+#------------------------------------------------------------------------------
+# Benchmark suite for relaxation throughput. Run
+#   python drive_bench.py --help
+# for list of optional parameters. Typical use:
+#   python drive_bench.py --save-baseline    # once, on a known-good version
+#   python drive_bench.py                    # after changes; exit status 1
+#                                            # if any case got slower
+#------------------------------------------------------------------------------
+import sys, os
+import json
+import argparse
+import lamat2021 as l21
+
+def _main(args):
+
+    cases = args.cases.split(',') if args.cases else None
+    run = l21.run_benchmarks(cases, nz=[int(nz) for nz in args.nz.split(',')],
+                             repeat=args.repeat, verbosity=args.verbosity)
+
+    # Every run goes into the history
+    if args.history:
+        with open(args.history, 'a') as f:
+            f.write(json.dumps(run) + '\n')
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(run, f, indent=1)
+        print(f"Saved baseline to {args.baseline}.")
+        return []
+
+    if not os.path.isfile(args.baseline):
+        print(f"No baseline {args.baseline}; run with --save-baseline first.")
+        return []
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    flagged = l21.compare_bench(run, baseline, tol=args.tol)
+    for case, nz, qty, old, new in flagged:
+        print(f"REGRESSION {case} nz={nz}: {qty} {old} -> {new}")
+    if not flagged:
+        print(f"No regressions against baseline of {baseline['time']} " +
+              f"(commit {baseline.get('commit') or '?'}).")
+    return flagged
+
+def _PCL():
+    # Return struct with command line arguments as fields.
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark relaxations and flag slowdowns vs a baseline.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('--cases', default='',
+        help="Comma-separated cases to run (default: all of " +
+             ', '.join(l21.BENCH_CASES) + ").")
+
+    parser.add_argument('--nz', default='1024,4096',
+        help="Comma-separated resolutions to run each case at.")
+
+    parser.add_argument('--repeat', type=int, default=1,
+        help="Run each case this many times and keep the fastest.")
+
+    parser.add_argument('--history', default='bench_history.jsonl',
+        help="Append each run to this JSON-lines file ('' to skip).")
+
+    parser.add_argument('--baseline', default='bench_baseline.json',
+        help="Baseline run to compare against.")
+
+    parser.add_argument('--save-baseline', action='store_true',
+        help="Save this run as the baseline instead of comparing.")
+
+    parser.add_argument('--tol', type=float, default=0.2,
+        help="Flag wall time, iteration, or eos call increases above this " +
+             "fraction.")
+
+    parser.add_argument('-v', '--verbosity', type=int, default=1,
+        help="Control runtime message verbosity.")
+
+    args = parser.parse_args()
+
+    return args
+
+if __name__ == "__main__":
+    # Parse command line arguments
+    clargs = _PCL()
+    flagged = _main(clargs)
+    sys.exit(1 if flagged else 0)
@@ -0,0 +1,120 @@
+#------------------------------------------------------------------------------
+# Driver for scans over the ad-hoc H/He density perturbation (drho_*). Run
+#   python drive_drho_scan.py --help
+# for list of required and optional parameters. For example
+#   python drive_drho_scan.py saturn --model 3l --set y1=0.27 --set z1=0.015 \
+#       --drho-a=-0.2,-0.15,-0.1,-0.05 --drho-c 10.5,11,11.5
+# relaxes the unperturbed model once and continues from it over the grid.
+#------------------------------------------------------------------------------
+import json
+import argparse
+import lamat2021 as l21
+
+def _num(s):
+    # Parse a command line number, keeping integers (e.g. nz) integral.
+    try:
+        return int(s)
+    except ValueError:
+        return float(s)
+
+def _main(args):
+
+    # Fixed model parameters
+    par = {key: _num(val) for key, val in
+           (spec.split('=') for spec in args.set or [])}
+    par['nz'] = args.nzones
+    if args.drho_type:
+        par['drho_type'] = args.drho_type
+
+    # The drho grid
+    grid = {}
+    for key in ('drho_a', 'drho_c', 'drho_w'):
+        vals = getattr(args, key)
+        if vals:
+            grid[key] = [float(v) for v in vals.split(',')]
+    if 'drho_a' not in grid:
+        raise ValueError("Nothing to do; supply --drho-a values.")
+
+    fout = open(args.output, 'a') if args.output else None
+    rstore = l21.ResultsStore(args.results) if args.results else None
+    def report(rec):
+        if rstore is not None:
+            rstore.append(rec)
+        line = json.dumps(rec)
+        if fout:
+            fout.write(line + '\n')
+            fout.flush()
+        if args.verbosity > 0:
+            print(line, flush=True)
+
+    try:
+        run = l21.run_3l if args.model == '3l' else l21.run_one
+        try:
+            z_eos = float(args.z_eos)
+        except ValueError:
+            z_eos = args.z_eos
+        return l21.drho_scan(par, grid, obs=args.planet, z_eos=z_eos, run=run,
+                             memo=args.memo_eos, callback=report,
+                             verbosity=args.verbosity)
+    finally:
+        if fout:
+            fout.close()
+
+def _PCL():
+    # Return struct with command line arguments as fields.
+
+    parser = argparse.ArgumentParser(
+        description="Scan the ad-hoc density perturbation from one base model.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('planet', choices=['jupiter','saturn'],
+        help="Target planet.")
+
+    parser.add_argument('--drho-a', default='',
+        help="Comma-separated relative density changes (usually negative).")
+
+    parser.add_argument('--drho-c', default='',
+        help="Comma-separated log P (cgs) centers of the density change.")
+
+    parser.add_argument('--drho-w', default='',
+        help="Comma-separated log P widths of the density change.")
+
+    parser.add_argument('--drho-type', choices=['sigmoid','gaussian','boxcar'],
+        help="Type of density modification (three-layer model).")
+
+    parser.add_argument('--set', action='append',
+        help="Fixed model parameter as name=value (repeatable).")
+
+    parser.add_argument('--model', choices=['dual','3l'], default='dual',
+        help="Dual-cavity model (run_one) or three-layer model (run_3l).")
+
+    parser.add_argument('--nzones', type=int, default=4096,
+        help="Number of zones (model resolution).")
+
+    parser.add_argument('--z-eos', default='ice',
+        help="aneos_pure material or ice fraction for the Z component.")
+
+    parser.add_argument('--memo-eos', type=float, default=1e-5,
+        help="Tolerance of the eos memoization (0 disables).")
+
+    parser.add_argument('-o', '--output', default='',
+        help="Append result records (JSON lines) to this file.")
+
+    parser.add_argument('-r', '--results', default='',
+        help="Append result records to this columnar results store.")
+
+    parser.add_argument('-v', '--verbosity', type=int, default=1,
+        help="Control runtime message verbosity.")
+
+    args = parser.parse_args()
+
+    return args
+
+if __name__ == "__main__":
+    # Parse command line arguments
+    clargs = _PCL()
+    results, base = _main(clargs)
+    nok = sum(rec['status'] == 'ok' for rec in results)
+    niter = sum(rec['niter'] for rec in results if rec['status'] == 'ok')
+    print(f"Relaxed {nok} of {len(results)} models in {niter} outer " +
+          f"iterations (base model: {base['niter']}).")
@@ -0,0 +1,97 @@
+#------------------------------------------------------------------------------
+# Driver fitting model parameters to the observed J2, J4, ... Run
+#   python drive_fit.py --help
+# for list of required and optional parameters. For example
+#   python drive_fit.py jupiter --vary rio=0.15:0.05:0.5 --vary z1=0.0075 \
+#       --set roo=0.8 --set y2_xy=0.28
+#------------------------------------------------------------------------------
+import argparse
+import lamat2021 as l21
+
+def _num(s):
+    # Parse a command line number, keeping integers (e.g. nz) integral.
+    try:
+        return int(s)
+    except ValueError:
+        return float(s)
+
+def _main(args):
+
+    # Starting point, bounds, and fixed parameters
+    par, names, bounds = {}, [], {}
+    for spec in args.vary:
+        name, vals = spec.split('=')
+        vals = [float(v) for v in vals.split(':')]
+        par[name] = vals[0]
+        names.append(name)
+        if len(vals) == 3:
+            bounds[name] = (vals[1], vals[2])
+    for spec in args.set or []:
+        name, val = spec.split('=')
+        par[name] = _num(val)
+    par['nz'] = args.nzones
+
+    try:
+        z_eos = float(args.z_eos)
+    except ValueError:
+        z_eos = args.z_eos
+    run = l21.run_3l if args.model == '3l' else l21.run_one
+    return l21.fit_Js(par, names, obs=args.planet, jmax=args.jmax,
+                      z_eos=z_eos, run=run, bounds=bounds, tol=args.tol,
+                      max_relax=args.max_relax, nworkers=args.workers,
+                      verbosity=args.verbosity)
+
+def _PCL():
+    # Return struct with command line arguments as fields.
+
+    parser = argparse.ArgumentParser(
+        description="Fit model parameters to the observed low-order Js.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('planet', choices=['jupiter','saturn'],
+        help="Target planet.")
+
+    parser.add_argument('--vary', action='append', required=True,
+        help="Fitted parameter as name=start or name=start:lo:hi " +
+             "(repeat for more parameters).")
+
+    parser.add_argument('--set', action='append',
+        help="Fixed model parameter as name=value (repeatable).")
+
+    parser.add_argument('--model', choices=['dual','3l'], default='dual',
+        help="Dual-cavity model (run_one) or three-layer model (run_3l).")
+
+    parser.add_argument('--jmax', type=int, default=4,
+        help="Highest J to fit.")
+
+    parser.add_argument('--tol', type=float, default=1.0,
+        help="Stop when every fitted J is within this many sigmas.")
+
+    parser.add_argument('--max-relax', type=int, default=20,
+        help="Give up after this many relaxations.")
+
+    parser.add_argument('--nzones', type=int, default=4096,
+        help="Number of zones (model resolution).")
+
+    parser.add_argument('--z-eos', default='ice',
+        help="aneos_pure material or ice fraction for the Z component.")
+
+    parser.add_argument('-n', '--workers', type=int, default=None,
+        help="Parallel relaxations for finite differences.")
+
+    parser.add_argument('-v', '--verbosity', type=int, default=1,
+        help="Control runtime message verbosity.")
+
+    args = parser.parse_args()
+
+    return args
+
+if __name__ == "__main__":
+    # Parse command line arguments
+    clargs = _PCL()
+    par, summary, report = _main(clargs)
+    print(f"Fit took {len(report)} relaxations, |r| = {report[-1]['r']:.3g}")
+    for name in par:
+        print(f"{name} = {par[name]}")
+    print(f"Model J2 = {summary['J2']}")
+    print(f"Model J4 = {summary['J4']}")
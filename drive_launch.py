@@ -0,0 +1,178 @@
+#------------------------------------------------------------------------------
+# Launcher for sweeps split over SLURM array tasks. Run
+#   python drive_launch.py --help
+#   python drive_launch.py <command> --help
+# for list of commands and their required and optional parameters.
+#
+# A typical sweep:
+#   python drive_launch.py slurm table.csv out --ntasks 20 --submit
+#   python drive_launch.py merge out
+# Pass --failures DIR to log failed models, and summarize them with
+#   python drive_launch.py failures DIR
+# or, on a single machine without a scheduler:
+#   python drive_launch.py local table.csv out --ntasks 4
+#------------------------------------------------------------------------------
+import os
+import argparse
+import subprocess
+import lamat2021 as l21
+
+def _task_args(args):
+    # Options passed from the slurm/local commands on to each task.
+    targs = ['--planet', args.planet, '--z-eos', args.z_eos]
+    if args.store:
+        targs += ['--store', args.store]
+    if args.cache:
+        targs += ['--cache', args.cache]
+    if args.profiles:
+        targs += ['--profiles']
+    if args.timeout:
+        targs += ['--timeout', str(args.timeout)]
+    if args.retries:
+        targs += ['--retries', str(args.retries)]
+    if args.max_iters:
+        targs += ['--max-iters', str(args.max_iters)]
+    if args.failures:
+        targs += ['--failures', os.path.abspath(args.failures)]
+    if args.checkpoints:
+        targs += ['--checkpoints', os.path.abspath(args.checkpoints),
+                  '--checkpoint-every', str(args.checkpoint_every)]
+    if args.memo_eos:
+        targs += ['--memo-eos', str(args.memo_eos)]
+    if args.accel:
+        targs += ['--accel', args.accel]
+    return targs
+
+def _main(args):
+
+    if args.command == 'task':
+        task = args.task
+        if task is None:
+            task = int(os.environ['SLURM_ARRAY_TASK_ID'])
+        try:
+            z_eos = float(args.z_eos)
+        except ValueError:
+            z_eos = args.z_eos
+        n = l21.run_task(args.table, task, args.ntasks, args.outdir,
+                         obs=args.planet, z_eos=z_eos, nworkers=args.workers,
+                         store=args.store or None, cache=args.cache or None,
+                         profiles=args.profiles, timeout=args.timeout,
+                         retries=args.retries, max_iters=args.max_iters,
+                         failures=args.failures or None,
+                         checkpoints=args.checkpoints or None,
+                         checkpoint_every=args.checkpoint_every,
+                         memo_eos=args.memo_eos, accel=args.accel)
+        print(f"Task {task}: relaxed {n} models.")
+
+    elif args.command == 'slurm':
+        script = l21.slurm_array_script(os.path.abspath(args.table),
+            args.ntasks, os.path.abspath(args.outdir),
+            args=' '.join(_task_args(args)), job_name=args.job_name,
+            cpus_per_task=args.cpus_per_task, time=args.time,
+            setup=args.setup)
+        os.makedirs(args.outdir, exist_ok=True)
+        fname = os.path.join(args.outdir, 'array.slurm')
+        with open(fname, 'w') as f:
+            f.write(script)
+        print(f"Wrote {fname}.")
+        if args.submit:
+            subprocess.run(['sbatch', fname], check=True)
+
+    elif args.command == 'local':
+        merged = l21.run_local(args.table, args.ntasks, args.outdir,
+                    _task_args(args) + ['--workers', str(args.workers)])
+        print(f"Merged {len(merged)} records into {merged.path}.")
+
+    elif args.command == 'merge':
+        merged = l21.merge_shards(args.outdir, args.output or None)
+        print(f"Merged {len(merged)} records into {merged.path}.")
+
+    elif args.command == 'failures':
+        print(l21.FailureLog(args.path).summary())
+
+def _PCL():
+    # Return struct with command line arguments as fields.
+
+    parser = argparse.ArgumentParser(
+        description="Split a sweep of dual-cavity models over many tasks.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    cmds = parser.add_subparsers(dest='command', required=True)
+
+    def common(sub):
+        sub.add_argument('table',
+            help="Parameter table (.json list, .csv, or whitespace table).")
+        sub.add_argument('outdir',
+            help="Directory for shard, log, and merged results stores.")
+        sub.add_argument('--ntasks', type=int, default=1,
+            help="Number of tasks to split the table into.")
+        sub.add_argument('--planet', choices=['jupiter','saturn'],
+            default='jupiter', help="Target planet.")
+        sub.add_argument('--z-eos', default='ice',
+            help="aneos_pure material or ice fraction for the Z component.")
+        sub.add_argument('--store', default='',
+            help="Directory of converged models used for warm starts.")
+        sub.add_argument('--cache', default='',
+            help="Result cache directory; models found there are reused.")
+        sub.add_argument('--profiles', action='store_true',
+            help="Also store rho, p, t, l profiles of each model.")
+        sub.add_argument('--timeout', type=float, default=None,
+            help="Kill and record as 'Timeout' models running longer (s).")
+        sub.add_argument('--retries', type=int, default=0,
+            help="Retry failed models this many times with new guesses.")
+        sub.add_argument('--max-iters', type=int, default=None,
+            help="Outer iteration budget per model.")
+        sub.add_argument('--failures', default='',
+            help="Failure log directory shared by all tasks.")
+        sub.add_argument('--checkpoints', default='',
+            help="Per-model checkpoint directory; resubmitted tasks resume.")
+        sub.add_argument('--checkpoint-every', type=float, default=600.,
+            help="Seconds between checkpoints of a model.")
+        sub.add_argument('--memo-eos', type=float, default=0.,
+            help="Memoize eos calls at this tolerance (0 disables).")
+        sub.add_argument('--accel', choices=['anderson','secant'],
+            help="Accelerate the outer iterations with this method.")
+
+    sub = cmds.add_parser('task', help="Run one task (one array element).")
+    common(sub)
+    sub.add_argument('--task', type=int, default=None,
+        help="Task number (default: $SLURM_ARRAY_TASK_ID).")
+    sub.add_argument('--workers', type=int, default=None,
+        help="Processes per task (default: SLURM_NTASKS or cores).")
+
+    sub = cmds.add_parser('slurm', help="Write (and submit) a job array.")
+    common(sub)
+    sub.add_argument('--cpus-per-task', type=int, default=1,
+        help="Cores (and worker processes) per array task.")
+    sub.add_argument('--time', default='64:00:00',
+        help="SLURM time limit per array task.")
+    sub.add_argument('--job-name', default='l21sweep',
+        help="SLURM job name.")
+    sub.add_argument('--setup', default='',
+        help="Shell lines to run before each task (e.g. conda activate).")
+    sub.add_argument('--submit', action='store_true',
+        help="Submit the job array with sbatch.")
+
+    sub = cmds.add_parser('local', help="Run all tasks as local processes.")
+    common(sub)
+    sub.add_argument('--workers', type=int, default=1,
+        help="Processes per task.")
+
+    sub = cmds.add_parser('merge', help="Merge task shards.")
+    sub.add_argument('outdir',
+        help="Directory holding the shard files.")
+    sub.add_argument('-o', '--output', default='',
+        help="Merged results store (default: outdir/results).")
+
+    sub = cmds.add_parser('failures', help="Summarize a failure log.")
+    sub.add_argument('path',
+        help="Failure log directory.")
+
+    args = parser.parse_args()
+
+    return args
+
+if __name__ == "__main__":
+    # Parse command line arguments
+    clargs = _PCL()
+    _main(clargs)
@@ -0,0 +1,130 @@
+#------------------------------------------------------------------------------
+# Driver for ensemble MCMC sampling of the 3-layer model. Run
+#   python drive_mcmc.py --help
+# for list of required and optional parameters.
+#------------------------------------------------------------------------------
+import numpy as np
+import argparse
+import observables
+import lamat2021 as l21
+
+def _main(args):
+
+    # Determine planet and load its observables
+    if args.planet.lower() == 'saturn':
+        obs = observables.Saturn_winds()
+    elif args.planet.lower() == 'jupiter':
+        obs = observables.Jupiter_tof4()
+    else:
+        raise ValueError(
+                f"Unsupported target planet {args.planet}.")
+
+    # Sampled parameters and their prior bounds
+    bounds = l21.default_bounds(obs)
+    for spec in args.bounds or []:
+        name, lims = spec.split('=')
+        bounds[name] = tuple(float(v) for v in lims.split(','))
+    names = args.sample.split(',')
+    if args.adjust_mrot and 'm' in names:
+        names.remove('m')
+
+    # Fixed model parameters
+    fixed = {}
+    fixed['nz'] = args.nzones
+    fixed['adjust_small'] = args.adjust_mrot
+    fixed['max_iters_outer'] = args.max_iters
+
+    # Optionally screen proposals with a surrogate trained on earlier results
+    surrogate = None
+    if args.surrogate:
+        surrogate = l21.Surrogate(names).fit(args.surrogate)
+
+    try:
+        z_eos = float(args.z_eos)
+    except ValueError:
+        z_eos = args.z_eos
+
+    chain, lnp, rate = l21.run_mcmc(names, bounds, args.nwalkers, args.nsteps,
+        obs=obs, fixed=fixed, jmax=args.jmax, checkpoint=args.checkpoint,
+        every=args.every, nworkers=args.workers, store=args.store or None,
+        seed=args.seed, verbosity=args.verbosity,
+        results=args.results or None, surrogate=surrogate, z_eos=z_eos)
+    return names, chain, lnp, rate
+
+def _PCL():
+    # Return struct with command line arguments as fields.
+
+    parser = argparse.ArgumentParser(
+        description="Sample krono's 3-layer model with an ensemble MCMC.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('planet', choices=['jupiter','saturn'],
+        help="Target planet.")
+
+    parser.add_argument('checkpoint',
+        help="Chain checkpoint file (.npz); resumed from if it exists.")
+
+    parser.add_argument('-v', '--verbosity', type=int, default=1,
+        help="Control runtime message verbosity.")
+
+    mcgroup = parser.add_argument_group('Sampler options')
+
+    mcgroup.add_argument('--sample', default='y1,z1,z2,rt,drho_a,drho_c,m',
+        help="Comma-separated parameters to sample (drive_3l_model names).")
+
+    mcgroup.add_argument('--bounds', action='append',
+        help="Override prior bounds as name=lo,hi (repeatable).")
+
+    mcgroup.add_argument('--nwalkers', type=int, default=32,
+        help="Number of walkers (even, at least twice the sampled dims).")
+
+    mcgroup.add_argument('--nsteps', type=int, default=1000,
+        help="Total chain length, including any resumed steps.")
+
+    mcgroup.add_argument('--every', type=int, default=1,
+        help="Checkpoint the chain every this many steps.")
+
+    mcgroup.add_argument('--jmax', type=int, default=6,
+        help="Highest J used in the likelihood.")
+
+    mcgroup.add_argument('--workers', type=int, default=None,
+        help="Number of worker processes (default: SLURM_NTASKS or cores).")
+
+    mcgroup.add_argument('--store', default='',
+        help="Directory of converged models used to warm-start new ones.")
+
+    mcgroup.add_argument('--results', default='',
+        help="Append every relaxed model to this results store.")
+
+    mcgroup.add_argument('--surrogate', default='',
+        help="Results store to train a surrogate that screens proposals.")
+
+    mcgroup.add_argument('--seed', type=int, default=None,
+        help="Random seed (ignored when resuming).")
+
+    mdlgroup = parser.add_argument_group('Additional model options')
+
+    mdlgroup.add_argument('--adjust-mrot', action='store_true',
+        help="Don't sample rotation parameter (use obs.m instead).")
+
+    mdlgroup.add_argument('--nzones', type=int, default=4096,
+        help="Number of zones (model resolution).")
+
+    mdlgroup.add_argument('--z-eos', default='ice',
+        help="aneos_pure material or ice fraction for the Z component.")
+
+    mdlgroup.add_argument('--max-iters', type=int, default=199,
+        help="Stop if fail to converge after this many iterations.")
+
+    args = parser.parse_args()
+
+    return args
+
+if __name__ == "__main__":
+    # Parse command line arguments
+    clargs = _PCL()
+    names, chain, lnp, rate = _main(clargs)
+    best = np.unravel_index(np.argmax(lnp), lnp.shape)
+    print(f"Chain shape = {chain.shape}, throughput = {rate:.1f} models/hour")
+    for name, val in zip(names, chain[best]):
+        print(f"Best {name} = {val}")
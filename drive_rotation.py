@@ -0,0 +1,93 @@
+#------------------------------------------------------------------------------
+# Driver for Monte Carlo over the rotation period uncertainty. Run
+#   python drive_rotation.py --help
+# for list of required and optional parameters. For example
+#   python drive_rotation.py saturn out.npz --set rio=0.15 --set roo=0.8 \
+#       --set y2_xy=0.3 --draws 10000
+# relaxes a few models spanning the drawn periods and interpolates the Js of
+# every draw from them.
+#------------------------------------------------------------------------------
+import argparse
+import numpy as np
+import lamat2021 as l21
+
+def _num(s):
+    # Parse a command line number, keeping integers (e.g. nz) integral.
+    try:
+        return int(s)
+    except ValueError:
+        return float(s)
+
+def _main(args):
+
+    # Model parameters other than the rotation
+    par = {key: _num(val) for key, val in
+           (spec.split('=') for spec in args.set or [])}
+    par['nz'] = args.nzones
+
+    run = l21.run_3l if args.model == '3l' else l21.run_one
+    try:
+        z_eos = float(args.z_eos)
+    except ValueError:
+        z_eos = args.z_eos
+    out = l21.rotation_scan(par, args.draws, obs=args.planet, z_eos=z_eos,
+                            run=run, nodes=args.nodes or None, seed=args.seed,
+                            memo=args.memo_eos, verbosity=args.verbosity)
+    np.savez(args.output, small=out['small'], P=out['P'], Js=out['Js'],
+             node_small=out['node_small'], node_Js=out['node_Js'])
+    return out
+
+def _PCL():
+    # Return struct with command line arguments as fields.
+
+    parser = argparse.ArgumentParser(
+        description="Propagate the rotation period uncertainty to the Js.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('planet',
+        help="Target planet (jupiter, saturn, or e.g. uranus+ppwd+" +
+             "uncertain_rotation for an observables catalog variant).")
+
+    parser.add_argument('output',
+        help="Output file (.npz) of drawn small, P, and Js.")
+
+    parser.add_argument('--draws', type=int, default=1000,
+        help="Number of rotation periods drawn from obs.P +/- obs.dP.")
+
+    parser.add_argument('--nodes', type=int, default=5,
+        help="Number of models relaxed to interpolate from (0 relaxes " +
+             "every draw).")
+
+    parser.add_argument('--seed', type=int, default=None,
+        help="Random seed of the draws.")
+
+    parser.add_argument('--set', action='append',
+        help="Fixed model parameter as name=value (repeatable).")
+
+    parser.add_argument('--model', choices=['dual','3l'], default='dual',
+        help="Dual-cavity model (run_one) or three-layer model (run_3l).")
+
+    parser.add_argument('--nzones', type=int, default=4096,
+        help="Number of zones (model resolution).")
+
+    parser.add_argument('--z-eos', default='ice',
+        help="aneos_pure material or ice fraction for the Z component.")
+
+    parser.add_argument('--memo-eos', type=float, default=1e-5,
+        help="Tolerance of the eos memoization (0 disables).")
+
+    parser.add_argument('-v', '--verbosity', type=int, default=1,
+        help="Control runtime message verbosity.")
+
+    args = parser.parse_args()
+
+    return args
+
+if __name__ == "__main__":
+    # Parse command line arguments
+    clargs = _PCL()
+    out = _main(clargs)
+    for n in (2, 4, 6):
+        Jn = out['Js'][:,n//2]
+        print(f"J{n} = {np.mean(Jn):.6e} +/- {np.std(Jn):.2e} " +
+              f"(from {len(out['node_small'])} relaxed models)")
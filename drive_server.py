@@ -0,0 +1,61 @@
+#------------------------------------------------------------------------------
+# Persistent model server: keeps krono and the eos tables loaded and relaxes
+# models sent to it over a Unix socket (or stdin/stdout). Run
+#   python drive_server.py --help
+# for list of optional parameters. Drivers hand models to it with --server:
+#   python drive_server.py &
+#   python drive_3l_model.py jupiter 0.27 0.02 0.1 --server
+#------------------------------------------------------------------------------
+import argparse
+import lamat2021 as l21
+
+def _num(s):
+    # A Z eos spec: an ice fraction if it parses as a number, else a material.
+    try:
+        return float(s)
+    except ValueError:
+        return s
+
+def _main(args):
+
+    z_eos = [_num(spec) for spec in args.z_eos.split(',') if spec]
+    if args.stdio:
+        l21.serve_stdio(z_eos=z_eos)
+    else:
+        l21.serve(args.socket or None, z_eos=z_eos, nworkers=args.workers,
+                  verbosity=args.verbosity)
+
+def _PCL():
+    # Return struct with command line arguments as fields.
+
+    parser = argparse.ArgumentParser(
+        description="Serve krono model relaxations from a warm process.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('-s', '--socket', default='',
+        help="Unix socket to listen on (default: $LAMAT2021_SOCKET or a " +
+             "/tmp path).")
+
+    parser.add_argument('--stdio', action='store_true',
+        help="Read requests from stdin and reply on stdout instead.")
+
+    parser.add_argument('-n', '--workers', type=int, default=None,
+        help="Models relaxed at once (default: SLURM_NTASKS or cores).")
+
+    parser.add_argument('--z-eos', default='ice,0.5',
+        help="Comma-separated Z eos (materials or ice fractions) to preload.")
+
+    parser.add_argument('-v', '--verbosity', type=int, default=1,
+        help="Control runtime message verbosity.")
+
+    args = parser.parse_args()
+
+    return args
+
+if __name__ == "__main__":
+    # Parse command line arguments
+    clargs = _PCL()
+    try:
+        _main(clargs)
+    except KeyboardInterrupt:
+        pass
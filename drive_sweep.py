@@ -0,0 +1,190 @@
+#------------------------------------------------------------------------------
+# Driver for parallel parameter sweeps of the dual-cavity model. Run
+#   python drive_sweep.py --help
+# for list of required and optional parameters.
+#------------------------------------------------------------------------------
+import json
+import argparse
+import lamat2021 as l21
+
+def _num(s):
+    # Parse a command line number, keeping integers (e.g. nz) integral.
+    try:
+        return int(s)
+    except ValueError:
+        return float(s)
+
+def _main(args):
+
+    # Collect parameter dicts from a table file and/or a grid specification
+    par_list = []
+    if args.table:
+        with open(args.table) as f:
+            par_list.extend(json.load(f))
+    if args.grid:
+        axes = {}
+        for spec in args.grid:
+            key, vals = spec.split('=')
+            axes[key] = [_num(v) for v in vals.split(',')]
+        par_list.extend(l21.param_grid(**axes))
+    if args.design:
+        # Space-filling design, extending what the results store holds
+        bounds = dict(l21.DESIGN_BOUNDS)
+        if args.bounds:
+            bounds = {}
+            for spec in args.bounds:
+                key, lims = spec.split('=')
+                bounds[key] = tuple(float(v) for v in lims.split(','))
+        fixed = {key: _num(val) for key, val in
+                 (spec.split('=') for spec in args.fixed or [])}
+        if args.results and len(l21.ResultsStore(args.results)):
+            par_list.extend(l21.refine_design(args.results, args.design,
+                bounds, focus=args.focus, seed=args.seed, fixed=fixed))
+        else:
+            par_list.extend(l21.design(args.design, bounds, args.method,
+                                       seed=args.seed, fixed=fixed))
+    if not par_list:
+        raise ValueError("Nothing to do; supply --grid, --table, or --design.")
+
+    fout = open(args.output, 'a') if args.output else None
+    rstore = l21.ResultsStore(args.results) if args.results else None
+    def report(rec):
+        if rstore is not None:
+            rstore.append(rec)
+        line = json.dumps({key: val for key, val in rec.items()
+                           if key != 'profiles'})
+        if fout:
+            fout.write(line + '\n')
+            fout.flush()
+        if args.verbosity > 0:
+            print(line, flush=True)
+
+    try:
+        try:
+            z_eos = float(args.z_eos)
+        except ValueError:
+            z_eos = args.z_eos
+        results = l21.sweep(par_list, obs=args.planet, z_eos=z_eos,
+                            nworkers=args.workers, callback=report,
+                            store=args.store or None,
+                            cache=args.cache or None,
+                            profiles=args.profiles,
+                            timeout=args.timeout, retries=args.retries,
+                            max_iters=args.max_iters,
+                            failures=args.failures or None,
+                            checkpoints=args.checkpoints or None,
+                            checkpoint_every=args.checkpoint_every,
+                            memo_eos=args.memo_eos,
+                            accel=args.accel,
+                            levels=[int(nz) for nz in args.levels.split(',')
+                                    if nz])
+    finally:
+        if fout:
+            fout.close()
+    return results
+
+def _PCL():
+    # Return struct with command line arguments as fields.
+
+    parser = argparse.ArgumentParser(
+        description="Relax a sweep of dual-cavity models in parallel.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('planet', choices=['jupiter','saturn'],
+        help="Target planet.")
+
+    parser.add_argument('-g', '--grid', action='append',
+        help="Grid axis as key=v1,v2,... (repeat for more axes), " +
+             "e.g. --grid rio=0.15,0.2 --grid y2_xy=0.28,0.35.")
+
+    parser.add_argument('-t', '--table',
+        help="JSON file with a list of parameter dicts.")
+
+    parser.add_argument('-d', '--design', type=int, default=0,
+        help="Add this many points of a space-filling design; with a " +
+             "non-empty --results store, extend the design already there.")
+
+    parser.add_argument('--bounds', action='append',
+        help="Design parameter bounds as key=lo,hi (repeatable; default: " +
+             "lamat2021.DESIGN_BOUNDS).")
+
+    parser.add_argument('--fixed', action='append',
+        help="Parameter added to every design point, as key=value " +
+             "(repeatable).")
+
+    parser.add_argument('--method', choices=['sobol','lhs'], default='sobol',
+        help="Design type for a new design.")
+
+    parser.add_argument('--focus', type=float, default=0.5,
+        help="Fraction of design extension points placed where models " +
+             "failed or J2 changes quickly (the rest fill space).")
+
+    parser.add_argument('--seed', type=int, default=None,
+        help="Seed of the design's random shift (keep it when extending).")
+
+    parser.add_argument('-n', '--workers', type=int, default=None,
+        help="Number of worker processes (default: SLURM_NTASKS or cores).")
+
+    parser.add_argument('-o', '--output', default='',
+        help="Append result records (JSON lines) to this file.")
+
+    parser.add_argument('-r', '--results', default='',
+        help="Append result records to this columnar results store.")
+
+    parser.add_argument('--profiles', action='store_true',
+        help="Also keep rho, p, t, l profiles in the results store.")
+
+    parser.add_argument('--levels', default='',
+        help="Comma-separated coarse nz levels (e.g. 512,1024) to relax " +
+             "on before finishing at the model's nz.")
+
+    parser.add_argument('--store', default='',
+        help="Directory of converged models used to warm-start new ones.")
+
+    parser.add_argument('--cache', default='',
+        help="Result cache directory; models found there are not relaxed.")
+
+    parser.add_argument('--timeout', type=float, default=None,
+        help="Kill and record as 'Timeout' models running longer (s).")
+
+    parser.add_argument('--retries', type=int, default=0,
+        help="Retry failed models this many times with new initial guesses.")
+
+    parser.add_argument('--max-iters', type=int, default=None,
+        help="Outer iteration budget per model (default: model default).")
+
+    parser.add_argument('--failures', default='',
+        help="Log failed models to this failure log directory.")
+
+    parser.add_argument('--checkpoints', default='',
+        help="Directory of per-model checkpoints; interrupted models resume.")
+
+    parser.add_argument('--checkpoint-every', type=float, default=600.,
+        help="Seconds between checkpoints of a model.")
+
+    parser.add_argument('--accel', choices=['anderson','secant'],
+        help="Accelerate the models' outer iterations with this method.")
+
+    parser.add_argument('--memo-eos', type=float, default=0.,
+        help="Memoize eos calls whose arguments agree to this absolute " +
+             "tolerance (log P, log T, Y, Z); 0 disables.")
+
+    parser.add_argument('--z-eos', default='ice',
+        help="aneos_pure material for the Z component, or a number to use " +
+             "that ice mass fraction in a tabulated ice/rock mixture.")
+
+    parser.add_argument('-v', '--verbosity', type=int, default=1,
+        help="Control runtime message verbosity.")
+
+    args = parser.parse_args()
+
+    return args
+
+if __name__ == "__main__":
+    # Parse command line arguments
+    clargs = _PCL()
+    results = _main(clargs)
+    nok = sum(rec['status'] == 'ok' for rec in results)
+    print(f"Relaxed {nok} of {len(results)} models.")
+    if clargs.verbosity > 0:
+        print(l21.timing_report([rec for rec in results if 't_total' in rec]))
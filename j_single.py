@@ -3,25 +3,26 @@ import numpy as np
 # from pathlib import Path
 
 from krono import const, gravity, models
-from krono.eos import mh13_scvh, aneos_pure
+import lamat2021 as l21
 
 # create eos instances
-hhe_eos = mh13_scvh.eos()
-z_eos = aneos_pure.eos('ice') # water ice; can instead pass 'serpentine' to get density typical of silicates
+hhe_eos = l21.get_eos('hhe')
+z_eos = l21.get_eos('ice') # water ice; can instead pass 'serpentine' to get density typical of silicates
 # instead of aneos_pure you can also use aneos_mix which mixes ice and rock on the fly, introducing a large
 # number of eos calls (slowest part of the code). choosing pure ice or rock is much faster.
 
-def logerr(e, uid, theta):
-    errtype = str(type(e)).split('.')[-1].split("\'")[0]
-    if '<' in errtype:
-        raise ValueError(errtype)
-    with open(f'got_{errtype}.dat', 'a') as fw:
-        fw.write(f'{uid} ')
-        [fw.write(f'{qty} ') for qty in theta]
-        fw.write('\n')
-        print(f'{uid}', end=' ')
-        [print(f'{qty}', end=' ') for qty in theta]
-        print(f'-> got_{errtype}.dat\n')
+# failed models are logged to a store that many processes can share; it is
+# created on the first failure, so importing this module writes nothing
+failures = None
+
+def logerr(e, t, par):
+    global failures
+    if failures is None:
+        failures = l21.FailureLog('failures')
+    rec = failures.add(e, par, t)
+    print(f'{rec["uid"]}', end=' ')
+    [print(f'{par[qty]}', end=' ') for qty in par]
+    print(f'-> {rec["status"]} at {rec["where"]} (logged to {failures.store.path})\n')
     if debug:
         raise e
 
@@ -73,7 +74,7 @@ def run_one(par):
         t.error = err
 
     if hasattr(t, 'error'):
-        logerr(t.error, t.uid, np.array([par[qty] for qty in par]))
+        logerr(t.error, t, par)
         # if debug: raise t.error
 
     return t
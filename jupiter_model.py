@@ -1,6 +1,6 @@
 import numpy as np
 from krono import const, gravity, models
-from krono.eos import mh13_scvh, aneos_pure
+import lamat2021 as l21
 import observables
 
 ## Select planet
@@ -11,8 +11,8 @@ obs = observables.Jupiter()
 #  silicates. Instead of aneos_pure you can also use aneos_mix which mixes ice
 #  and rock on the fly, introducing a large number of eos calls (slowest part
 #  of the code). Choosing pure ice or rock is much faster.
-hhe_eos = mh13_scvh.eos()
-z_eos = aneos_pure.eos('ice')
+hhe_eos = l21.get_eos('hhe')
+z_eos = l21.get_eos('ice')
 
 debug = False
 user_params = {
@@ -1,4 +1,3245 @@
 ###############################################################################
 # Project-specific functions and/or specialized versions of package methods
 ###############################################################################
+import os
+import sys
+import json
+import pickle
+import socket
+import platform
+import shutil
+import hashlib
+import tempfile
+import socketserver
+import functools
+import itertools
+import threading
+import traceback
+import collections
 import numpy as np
+import multiprocessing as mp
+import multiprocessing.connection
+import concurrent.futures as cf
+from timeit import default_timer as timer
+
+import observables
+
+###############################################################################
+# EOS instances and the shared eos table cache
+###############################################################################
+# EOS tables are expensive to parse, so each process keeps one instance of each
+# eos it has used. Pass 'hhe' for the H/He eos, or any material understood by
+# aneos_pure ('ice', 'serpentine', ...) for the Z component.
+#
+# Instances are also cached on disk, once per node: the first process to need
+# an eos pickles it with every large array written to its own .npy file, and
+# later processes unpickle that skeleton and memory-map the arrays read-only.
+# All workers on a node then share the same physical pages through the OS page
+# cache, and none of them re-parses the original tables. Set use_eos_cache to
+# False to always build eos objects from the original tables.
+_eos_instances = {}
+use_eos_cache = True
+
+def cache_dir(*sub):
+    """Root of lamat2021's on-disk caches ($LAMAT2021_CACHE or ~/.cache)."""
+    root = os.getenv('LAMAT2021_CACHE',
+        os.path.join(os.path.expanduser('~'), '.cache', 'lamat2021'))
+    return os.path.join(root, *sub)
+
+_krono_version = None
+def krono_version():
+    """A string identifying the installed krono (version or source digest)."""
+    global _krono_version
+    if _krono_version is None:
+        import krono
+        ver = getattr(krono, '__version__', None)
+        if ver is None:
+            # No version string; fingerprint the package sources instead
+            h = hashlib.sha1()
+            root = os.path.dirname(krono.__file__)
+            for dirpath, dirnames, files in os.walk(root):
+                dirnames.sort()
+                for fn in sorted(files):
+                    if fn.endswith('.py'):
+                        with open(os.path.join(dirpath, fn), 'rb') as f:
+                            h.update(f.read())
+            ver = h.hexdigest()[:12]
+        _krono_version = str(ver)
+    return _krono_version
+
+def _new_eos(name):
+    # Build eos `name` from the original tables.
+    if name == 'hhe':
+        from krono.eos import mh13_scvh
+        return mh13_scvh.eos()
+    from krono.eos import aneos_pure
+    return aneos_pure.eos(name)
+
+class _ArrayPickler(pickle.Pickler):
+    # Pickler that writes large numpy arrays to separate .npy files.
+    def __init__(self, f, arrdir, min_bytes=4096):
+        super().__init__(f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.arrdir = arrdir
+        self.min_bytes = min_bytes
+        self.saved = {}
+
+    def persistent_id(self, obj):
+        if (type(obj) is not np.ndarray or obj.dtype.hasobject or
+            obj.nbytes < self.min_bytes):
+            return None
+        if id(obj) not in self.saved:
+            fname = f'a{len(self.saved)}.npy'
+            np.save(os.path.join(self.arrdir, fname), obj)
+            self.saved[id(obj)] = (fname, obj) # keep obj alive so id is unique
+        return self.saved[id(obj)][0]
+
+class _ArrayUnpickler(pickle.Unpickler):
+    # Unpickler that memory-maps arrays saved by _ArrayPickler.
+    def __init__(self, f, arrdir):
+        super().__init__(f)
+        self.arrdir = arrdir
+
+    def persistent_load(self, pid):
+        return np.load(os.path.join(self.arrdir, pid), mmap_mode='r')
+
+def _eos_cache_path(name):
+    return cache_dir('eos', f'{name}-{krono_version()}')
+
+# Errors that make load_eos fall back to building the eos from its tables
+_EOS_CACHE_ERRORS = (OSError, pickle.PicklingError, AttributeError, TypeError)
+
+def prepare_eos_cache(names):
+    """Make sure the on-disk cache holds eos `names` (call once per node).
+
+    Safe to call from many processes at once: each entry is written to a
+    private directory and renamed into place, and the first rename wins.
+    """
+    for name in names:
+        path = _eos_cache_path(name)
+        if os.path.isdir(path):
+            continue
+        tmp = f'{path}.tmp-{platform.node()}-{os.getpid()}'
+        os.makedirs(tmp, exist_ok=True)
+        try:
+            with open(os.path.join(tmp, 'eos.pkl'), 'wb') as f:
+                _ArrayPickler(f, tmp).dump(_new_eos(name))
+            os.rename(tmp, path)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+def load_eos(name):
+    """Load eos `name` from the node-wide cache, with memory-mapped tables.
+
+    Falls back to building the eos from the original tables if the eos object
+    can't be pickled or the cache directory isn't writable.
+    """
+    try:
+        prepare_eos_cache([name])
+        path = _eos_cache_path(name)
+        with open(os.path.join(path, 'eos.pkl'), 'rb') as f:
+            return _ArrayUnpickler(f, path).load()
+    except _EOS_CACHE_ERRORS:
+        return _new_eos(name)
+
+def get_eos(name):
+    """Return this process's instance of eos `name`, creating it if needed."""
+    if name not in _eos_instances:
+        if use_eos_cache:
+            _eos_instances[name] = load_eos(name)
+        else:
+            _eos_instances[name] = _new_eos(name)
+    return _eos_instances[name]
+
+###############################################################################
+# Tabulated ice/rock mixture eos
+###############################################################################
+# krono's aneos_mix mixes ice and rock on the fly, which doubles the number of
+# (already slow) aneos calls. Instead we tabulate pure ice and pure rock once on
+# a regular (logP, logT) mesh, cache the tables on disk next to the eos cache,
+# and mix by additive volumes, 1/rho = f_ice/rho_ice + (1 - f_ice)/rho_rock, with
+# entropy per unit mass s = f_ice*s_ice + (1 - f_ice)*s_rock. Because 1/rho and
+# s are exactly linear in f_ice, the two pure tables are the complete
+# (logP, logT, f_ice) table; no interpolation error is made along f_ice.
+_icerock_tables = {}
+
+def _interp2(table, x0, dx, y0, dy, x, y):
+    # Vectorized bilinear interpolation on a regular mesh (no bounds checks).
+    fx = (x - x0)/dx
+    fy = (y - y0)/dy
+    i = np.clip(fx.astype(int), 0, table.shape[0] - 2)
+    j = np.clip(fy.astype(int), 0, table.shape[1] - 2)
+    u = fx - i
+    v = fy - j
+    return ((1 - u)*(1 - v)*table[i, j] + u*(1 - v)*table[i + 1, j] +
+            (1 - u)*v*table[i, j + 1] + u*v*table[i + 1, j + 1])
+
+def _tabulate_pure_eos(name, logp, logt):
+    # Tabulate logrho and logs of eos `name` on the (logp, logt) mesh.
+    eos = get_eos(name)
+    lp, lt = np.meshgrid(logp, logt, indexing='ij')
+    tabs = {'logrho': np.reshape(eos.get_logrho(lp.ravel(), lt.ravel()),
+                                 lp.shape)}
+    if hasattr(eos, 'get_logs'):
+        tabs['logs'] = np.reshape(eos.get_logs(lp.ravel(), lt.ravel()),
+                                  lp.shape)
+    return tabs
+
+def icerock_tables(rock='serpentine', logp=(5., 15., 401), logt=(1.5, 5., 281)):
+    """Load (or build and cache) pure ice and rock tables on a regular mesh.
+
+    Returns a dict with the mesh vectors and the tables, memory-mapped from the
+    on-disk cache when possible.
+    """
+    key = (rock, tuple(logp), tuple(logt))
+    if key in _icerock_tables:
+        return _icerock_tables[key]
+
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()[:10]
+    path = cache_dir('eos', f'icerock-{rock}-{krono_version()}-{digest}')
+    if not os.path.isdir(path):
+        tmp = f'{path}.tmp-{platform.node()}-{os.getpid()}'
+        os.makedirs(tmp, exist_ok=True)
+        try:
+            np.save(os.path.join(tmp, 'logp.npy'), np.linspace(*logp))
+            np.save(os.path.join(tmp, 'logt.npy'), np.linspace(*logt))
+            for name, tag in (('ice', 'ice'), (rock, 'rock')):
+                tabs = _tabulate_pure_eos(name, np.linspace(*logp),
+                                          np.linspace(*logt))
+                for qty, tab in tabs.items():
+                    np.save(os.path.join(tmp, f'{qty}_{tag}.npy'), tab)
+            os.rename(tmp, path)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    tables = {}
+    for fname in os.listdir(path):
+        tables[fname[:-4]] = np.load(os.path.join(path, fname), mmap_mode='r')
+    tables['rock'] = rock
+    _icerock_tables[key] = tables
+    return tables
+
+class IceRockEOS:
+    """Ice/rock mixture eos for the Z component, interpolated from tables.
+
+    Usable anywhere krono expects a z_eos. Queries inside the tabulated mesh
+    are answered by vectorized bilinear interpolation; points outside it are
+    passed to the pure eos objects directly. The ice mass fraction is the
+    instance's f_ice unless given explicitly in a query.
+    """
+
+    def __init__(self, f_ice=0.5, rock='serpentine', **mesh):
+        self.f_ice = f_ice
+        self.rock = rock
+        self.tables = icerock_tables(rock, **mesh)
+        lp, lt = self.tables['logp'], self.tables['logt']
+        self._mesh = (lp[0], lp[1] - lp[0], lt[0], lt[1] - lt[0])
+        self._lims = (lp[0], lp[-1], lt[0], lt[-1])
+
+    def _pure(self, qty, tag, logp, logt, inside):
+        # Pure-component qty, tabulated inside the mesh and direct elsewhere.
+        val = np.empty(logp.shape)
+        val[inside] = _interp2(self.tables[f'{qty}_{tag}'], *self._mesh,
+                               logp[inside], logt[inside])
+        if not inside.all():
+            eos = get_eos('ice' if tag == 'ice' else self.rock)
+            val[~inside] = getattr(eos, f'get_{qty}')(logp[~inside],
+                                                       logt[~inside])
+        return val
+
+    def _args(self, logp, logt, f_ice):
+        logp, logt = np.broadcast_arrays(np.asarray(logp, dtype=float),
+                                         np.asarray(logt, dtype=float))
+        f = self.f_ice if f_ice is None else f_ice
+        p0, p1, t0, t1 = self._lims
+        inside = (logp >= p0) & (logp <= p1) & (logt >= t0) & (logt <= t1)
+        return logp, logt, f, inside
+
+    def get_logrho(self, logp, logt, f_ice=None):
+        """Log10 density of the mixture (additive volumes)."""
+        logp, logt, f, inside = self._args(logp, logt, f_ice)
+        rhoinv = (f*10**-self._pure('logrho', 'ice', logp, logt, inside) +
+                  (1 - f)*10**-self._pure('logrho', 'rock', logp, logt, inside))
+        return -np.log10(rhoinv)
+
+    def get_logs(self, logp, logt, f_ice=None):
+        """Log10 specific entropy of the mixture (no entropy of mixing)."""
+        if 'logs_ice' not in self.tables:
+            raise AttributeError("pure eos tables have no entropy.")
+        logp, logt, f, inside = self._args(logp, logt, f_ice)
+        s = (f*10**self._pure('logs', 'ice', logp, logt, inside) +
+             (1 - f)*10**self._pure('logs', 'rock', logp, logt, inside))
+        return np.log10(s)
+
+    def get(self, logp, logt, f_ice=None):
+        """Dict of available mixture quantities (logrho and, if known, logs)."""
+        res = {'logrho': self.get_logrho(logp, logt, f_ice)}
+        if 'logs_ice' in self.tables:
+            res['logs'] = self.get_logs(logp, logt, f_ice)
+        return res
+
+def get_z_eos(spec):
+    """Return a Z-component eos from a material name, ice fraction, or object.
+
+    A number is taken as the ice mass fraction of an ice/serpentine mixture;
+    0 and 1 select the pure aneos eos directly.
+    """
+    if isinstance(spec, str):
+        return get_eos(spec)
+    if isinstance(spec, (int, float)):
+        if spec >= 1:
+            return get_eos('ice')
+        if spec <= 0:
+            return get_eos('serpentine')
+        return IceRockEOS(spec)
+    return spec
+
+def eos_tag(z_eos):
+    """Name of Z eos `z_eos` (as get_z_eos takes it) for result cache keys.
+
+    Specs that give the same eos get the same tag, e.g. 1.0 and 'ice'.
+    """
+    if isinstance(z_eos, str):
+        try:
+            z_eos = float(z_eos)
+        except ValueError:
+            return f'z_eos={z_eos}'
+    if isinstance(z_eos, IceRockEOS):
+        if z_eos.rock != 'serpentine':
+            return f'z_eos=f_ice={float(z_eos.f_ice)!r},{z_eos.rock}'
+        z_eos = z_eos.f_ice
+    if isinstance(z_eos, (int, float)):
+        if z_eos >= 1:
+            return 'z_eos=ice'
+        if z_eos <= 0:
+            return 'z_eos=serpentine'
+        return f'z_eos=f_ice={float(z_eos)!r}'
+    return f'z_eos={type(z_eos).__name__}'
+
+###############################################################################
+# Memoized eos lookups
+###############################################################################
+# Across the outer iterations of one relaxation, and across neighboring models
+# relaxed by one process, the eos objects are asked for nearly the same points
+# again and again (the profiles move less and less as a model converges).
+# MemoEOS wraps an eos object and remembers its results point by point: each
+# point of a call is binned into a cell of side `tol` in its arguments (an
+# absolute tolerance, so log10 units for P and T), and a point whose cell has
+# been seen before gets the result computed at the first point seen in that
+# cell. Only the points in new cells are passed to the eos, in one call. The
+# default tol=1e-5 dex thus perturbs the results by at most the eos response
+# to a 5e-6 dex shift of its arguments. Methods whose results aren't one value
+# (or a dict of values) per point are passed through. At most `maxbytes` are
+# kept per MemoEOS; when full, the least recently used half of a method's
+# cells is evicted. memo_eos() hands out one MemoEOS per eos and tolerance per
+# process, to be shared by all models it relaxes (pass them as run_one's eos
+# argument, or straight to the krono model constructors).
+_memo_instances = {}
+
+class MemoEOS:
+    """Proxy for an eos object that memoizes its calls (see memo_eos)."""
+
+    def __init__(self, eos, tol=1e-5, maxbytes=256*2**20):
+        self._eos = eos
+        self.tol = tol
+        self.maxbytes = maxbytes
+        self.hits = 0       # points answered from the memo
+        self.misses = 0     # points passed to the eos
+        self.evictions = 0  # cells evicted
+        self._tables = {}
+        self._plain = set()
+        self._tick = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._eos, name)
+        if callable(attr) and not name.startswith('_'):
+            return functools.partial(self._call, name, attr)
+        return attr
+
+    @property
+    def nbytes(self):
+        return sum(_table_nbytes(tab) for tab in self._tables.values())
+
+    def _call(self, name, fn, *args, **kwargs):
+        names = sorted(kwargs)
+        vals = [np.asarray(v) for v in args + tuple(kwargs[n] for n in names)]
+        if (name in self._plain or not vals or
+                not all(v.dtype.kind in 'biuf' for v in vals)):
+            return fn(*args, **kwargs)
+        shape = np.broadcast_shapes(*[v.shape for v in vals])
+        if not int(np.prod(shape)):
+            return fn(*args, **kwargs)
+        X = np.column_stack([np.broadcast_to(v, shape).ravel() for v in vals])
+        cells = np.round(X/self.tol).astype(np.int64)
+        keys = _cell_keys(cells)
+        tkey = (name, len(args), tuple(names))
+        with self._lock:
+            self._tick += 1
+            tab = self._tables.get(tkey)
+            found, pos = _memo_lookup(tab, keys, cells)
+            known = {}
+            if tab is not None:
+                tab['used'][pos[found]] = self._tick
+                known = {f: col[pos[found]] for f, col in tab['vals'].items()}
+        new = np.flatnonzero(~found)
+        res = {}
+        if len(new):
+            # Evaluate the eos once per new cell, at the first point in it
+            _, first, inv = np.unique(keys[new], return_index=True,
+                                      return_inverse=True)
+            pick = new[first]
+            sub = [v if v.ndim == 0 else X[pick, k] for k, v in enumerate(vals)]
+            res = _point_fields(fn(*sub[:len(args)],
+                                   **dict(zip(names, sub[len(args):]))),
+                                len(pick))
+            if res is None or (tab is not None and set(res) != set(known)):
+                with self._lock:
+                    self._plain.add(name)
+                return fn(*args, **kwargs)
+        with self._lock:
+            self.hits += int(found.sum())
+            self.misses += len(new)
+            if len(new):
+                self._insert(tkey, keys[pick], cells[pick], res)
+        out = {}
+        for f in (res or known):
+            parts = [known[f]] if f in known else []
+            parts += [res[f]] if f in res else []
+            arr = np.empty(len(keys), np.result_type(*parts))
+            if f in known:
+                arr[found] = known[f]
+            if f in res:
+                arr[new] = res[f][inv]
+            out[f] = arr.reshape(shape)[()]
+        return out[None] if None in out else out
+
+    def _insert(self, tkey, keys, cells, res):
+        # Add new cells to table tkey (under the lock), evicting if full.
+        tab = self._tables.get(tkey)
+        if tab is None:
+            tab = {'keys': np.empty(0, np.uint64),
+                   'cells': np.empty((0, cells.shape[1]), np.int64),
+                   'used': np.empty(0, np.int64),
+                   'vals': {f: np.empty(0, v.dtype) for f, v in res.items()}}
+        # another thread may have added some of them meanwhile
+        fresh = ~_memo_lookup(tab, keys, cells)[0]
+        tab = {'keys': np.concatenate([tab['keys'], keys[fresh]]),
+               'cells': np.concatenate([tab['cells'], cells[fresh]]),
+               'used': np.concatenate([tab['used'],
+                                       np.full(fresh.sum(), self._tick)]),
+               'vals': {f: np.concatenate([col, res[f][fresh]])
+                        for f, col in tab['vals'].items()}}
+        others = sum(_table_nbytes(t) for key, t in self._tables.items()
+                     if key != tkey)
+        while len(tab['keys']) and others + _table_nbytes(tab) > self.maxbytes:
+            keep = tab['used'] > np.median(tab['used'])
+            self.evictions += int((~keep).sum())
+            tab = _table_rows(tab, keep)
+        self._tables[tkey] = _table_rows(tab, np.argsort(tab['keys'],
+                                                         kind='stable'))
+
+    def clear(self):
+        """Forget all memoized results (the statistics are kept)."""
+        with self._lock:
+            self._tables = {}
+
+    def stats(self):
+        """Dict of hits, misses, hit_rate (per point), evictions, entries
+        (cells held), and nbytes."""
+        npts = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits/npts if npts else np.nan,
+                'evictions': self.evictions,
+                'entries': sum(len(t['keys']) for t in self._tables.values()),
+                'nbytes': self.nbytes}
+
+def _cell_keys(cells):
+    # 64-bit hash of each row of integer cell indices.
+    h = np.zeros(len(cells), np.uint64)
+    with np.errstate(over='ignore'):
+        for col in cells.T:
+            h = (h*np.uint64(1000003)) ^ col.view(np.uint64)
+    return h
+
+def _memo_lookup(tab, keys, cells):
+    # (found, pos): which rows of cells are in table tab, and where.
+    if tab is None or not len(tab['keys']):
+        return np.zeros(len(keys), bool), np.zeros(len(keys), int)
+    pos = np.minimum(np.searchsorted(tab['keys'], keys), len(tab['keys']) - 1)
+    found = ((tab['keys'][pos] == keys) &
+             (tab['cells'][pos] == cells).all(axis=1))
+    return found, pos
+
+def _point_fields(val, n):
+    # Dict of length-n arrays of an eos result (key None for a plain array),
+    # or None if the result isn't one value per point.
+    fields = val if isinstance(val, dict) else {None: val}
+    out = {}
+    for f, v in fields.items():
+        v = np.asarray(v)
+        if v.size != n or v.dtype.kind not in 'biuf':
+            return None
+        out[f] = v.reshape(n)
+    return out
+
+def _table_rows(tab, idx):
+    return {'keys': tab['keys'][idx], 'cells': tab['cells'][idx],
+            'used': tab['used'][idx],
+            'vals': {f: col[idx] for f, col in tab['vals'].items()}}
+
+def _table_nbytes(tab):
+    return (tab['keys'].nbytes + tab['cells'].nbytes + tab['used'].nbytes +
+            sum(col.nbytes for col in tab['vals'].values()))
+
+def memo_eos(spec, tol=1e-5, maxbytes=256*2**20):
+    """This process's shared MemoEOS for eos `spec` at tolerance `tol`.
+
+    spec is 'hhe' or anything get_z_eos accepts. maxbytes bounds the memory
+    used by each MemoEOS.
+    """
+    key = (spec if isinstance(spec, (str, int, float)) else id(spec), tol)
+    if key not in _memo_instances:
+        eos = get_eos('hhe') if spec == 'hhe' else get_z_eos(spec)
+        _memo_instances[key] = MemoEOS(eos, tol, maxbytes)
+    return _memo_instances[key]
+
+def memo_stats():
+    """stats() of every MemoEOS made by memo_eos, by (spec, tol)."""
+    return {key: memo.stats() for key, memo in _memo_instances.items()}
+
+###############################################################################
+# Instrumentation of relaxations
+###############################################################################
+# Timings collects call counts and wall time per phase of one relaxation. The
+# eos objects are wrapped in CountingEOS proxies before the model is built, and
+# instrument() shadows every public method of the tof4 instance and its model
+# with a timed wrapper (relax() calls them through self, so it picks up the
+# wrappers). Time is charged exclusively: time spent in an eos call made from a
+# model method counts as eos time, not model time. The phases are 'eos', 'tof'
+# (tof4 methods: shape and moment iterations), 'model' (model methods: profile
+# construction and the outer z/y/core adjustments), and 'relax' (relax()'s own
+# loop body); their times add up to the wall time of relax().
+_PHASES = ('eos', 'tof', 'model', 'relax')
+
+class Timings:
+    """Call counts and exclusive wall time of the phases of a relaxation."""
+
+    def __init__(self):
+        self.calls = {}
+        self.times = {}
+        self._stack = []
+
+    def wrap(self, fn, key):
+        """Return fn wrapped to be counted and timed under key."""
+        def timed(*args, **kwargs):
+            self._stack.append(0.0)
+            tic = timer()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = timer() - tic
+                child = self._stack.pop()
+                self.calls[key] = self.calls.get(key, 0) + 1
+                self.times[key] = self.times.get(key, 0.0) + elapsed - child
+                if self._stack:
+                    self._stack[-1] += elapsed
+        timed.__wrapped__ = fn
+        return timed
+
+    def summary(self):
+        """Flat dict of n_<phase> and t_<phase> totals, plus t_total."""
+        out = {}
+        for phase in _PHASES:
+            keys = [key for key in self.calls if key.split('.')[0] == phase]
+            out[f'n_{phase}'] = sum(self.calls[key] for key in keys)
+            out[f't_{phase}'] = sum(self.times[key] for key in keys)
+        out['t_total'] = sum(out[f't_{phase}'] for phase in _PHASES)
+        return out
+
+    def detail(self):
+        """Per-method (calls, exclusive time), slowest first."""
+        return sorted(((key, self.calls[key], self.times[key])
+                       for key in self.calls), key=lambda x: -x[2])
+
+class CountingEOS:
+    """Proxy for an eos object that counts and times its method calls."""
+
+    def __init__(self, eos, timings):
+        self._eos = eos
+        self._timings = timings
+
+    def __getattr__(self, name):
+        attr = getattr(self._eos, name)
+        if callable(attr) and not name.startswith('_'):
+            return self._timings.wrap(attr, f'eos.{name}')
+        return attr
+
+def instrument(t, timings):
+    """Time the methods of tof4 instance t and its model under `timings`."""
+    for obj, phase in ((t, 'tof'), (t.model, 'model')):
+        for name in dir(type(obj)):
+            if name.startswith('_') or isinstance(getattr(type(obj), name),
+                                                  property):
+                continue
+            attr = getattr(obj, name, None)
+            if callable(attr) and not isinstance(attr, type):
+                key = 'relax.relax' if obj is t and name == 'relax' else \
+                      f'{phase}.{name}'
+                setattr(obj, name, timings.wrap(attr, key))
+    return t
+
+def timing_report(results):
+    """Text summary of the phase timings of a sweep.
+
+    `results` is anything as_columns accepts (a ResultsStore or a list of
+    sweep records) holding the n_<phase>/t_<phase> fields.
+    """
+    results = as_columns(results)
+    if 't_total' not in results:
+        return "No timing information."
+    t_total = np.asarray(results['t_total'], dtype=float)
+    ok = np.isfinite(t_total)
+    lines = [f"{ok.sum()} timed models, {t_total[ok].sum():.1f} s in relax()"]
+    lines.append(f"{'phase':>8} {'calls/model':>12} {'s/model':>10} {'share':>7}")
+    for phase in _PHASES:
+        n = np.asarray(results[f'n_{phase}'], dtype=float)[ok]
+        t = np.asarray(results[f't_{phase}'], dtype=float)[ok]
+        lines.append(f"{phase:>8} {n.mean():12.1f} {t.mean():10.3f} "
+                     f"{t.sum()/t_total[ok].sum():7.1%}")
+    if 'niter' in results:
+        niter = np.asarray(results['niter'], dtype=float)[ok]
+        lines.append(f"outer iterations/model: mean {niter.mean():.1f}, "
+                     f"max {niter.max():.0f}")
+    return '\n'.join(lines)
+
+###############################################################################
+# Single model
+###############################################################################
+def get_obs(planet):
+    """Return observables for `planet` (name, observables class, or instance).
+
+    A name may carry catalog overlays after '+', e.g. 'saturn+winds'.
+    """
+    if isinstance(planet, str):
+        if '+' in planet:
+            return observables.catalog.get(*planet.split('+'))
+        if planet.lower() == 'jupiter':
+            return observables.Jupiter()
+        if planet.lower() == 'saturn':
+            return observables.Saturn()
+        raise ValueError(f"Unsupported target planet {planet}.")
+    if isinstance(planet, type):
+        return planet()
+    return planet
+
+def dual_cavity_params(par, obs):
+    """Build the params dict for a dual-cavity model mimicking a 3-layer model.
+
+    The defaults follow jupiter_model.py/saturn_model.py. The user dictionary
+    `par` normally holds rio, roo, y2_xy, drho_a, drho_c, and z1, but any entry
+    in `par` overrides the matching default in params.
+    """
+    params = {} # will be passed to gravity and model instances
+
+    params['max_iters_outer'] = 200
+    params['small'] = obs.m # dimensionless
+    params['mtot'] = obs.M*1000
+    params['req'] = obs.a0*100
+    params['nz'] = 4096
+    params['verbosity'] = 0
+    params['ymean_xy'] = 0.275
+    params['t1'] = obs.T0 # K
+    params['drho_a'] = 0.0
+    params['drho_w'] = 1.
+    params['drho_c'] = 10.
+
+    params['z1'] = 0.015
+    params['z2'] = 0.5 # initial guess for inner envelope metallicity
+    params['gradient_shape'] = 'sigmoid'
+
+    # Convergence tolerances (relative)
+    params['j2n_rtol'] = 1e-4
+    params['ymean_rtol'] = 1e-4
+    params['mtot_rtol'] = 1e-4
+
+    params.update(par)
+    params['roi'] = params['roo'] - 1e-2 # effectively a jump
+    params['rii'] = params['rio'] - 1e-2 # effectively a jump
+    return params
+
+def _eos_pair(z_eos, timings, eos=None):
+    # The hhe and z eos objects, wrapped for counting if timings is given.
+    hhe_eos, z_eos = eos or (get_eos('hhe'), get_z_eos(z_eos))
+    if timings is not None:
+        hhe_eos = CountingEOS(hhe_eos, timings)
+        z_eos = CountingEOS(z_eos, timings)
+    return hhe_eos, z_eos
+
+def _relax(t, warm, timings, checkpoint, accel=None):
+    # Seed, instrument, checkpoint, accelerate, and relax tof4 instance t.
+    if warm is not None:
+        seed_tof(t, warm)
+    if timings is not None:
+        instrument(t, timings)
+    if checkpoint is not None:
+        checkpoint.attach(t)
+    if accel is not None:
+        if isinstance(accel, str):
+            accel = OuterAccelerator(accel)
+        accel.attach(t)
+    t.relax()
+    if checkpoint is not None:
+        checkpoint.clear()
+    return t
+
+def run_one(par, obs='jupiter', z_eos='ice', warm=None, timings=None,
+            checkpoint=None, eos=None, accel=None):
+    """Relax a single dual-cavity ToF model for parameter dictionary `par`.
+
+    z_eos is anything get_z_eos accepts: a material name or an ice fraction.
+    warm is an optional state (see model_state) of a converged neighbor to
+    start from. If a Timings instance is given the relaxation is instrumented.
+    If a Checkpoint is given the relaxation resumes from its saved state, if
+    any, and saves its own state there as it goes. eos is an optional
+    (hhe_eos, z_eos) pair of objects to use instead of the shared instances.
+    accel is an optional OuterAccelerator, or its method name ('anderson' or
+    'secant'), to accelerate the outer iterations with.
+    """
+    from krono import gravity, models
+
+    params = dual_cavity_params(par, get_obs(obs))
+    if checkpoint is not None and checkpoint.resume(params) is not None:
+        warm = checkpoint.state
+    if warm is not None:
+        apply_warm_start(params, warm, par)
+    model = models.dualCavityModel(*_eos_pair(z_eos, timings, eos), params)
+    return _relax(gravity.tof4(model, params), warm, timings, checkpoint, accel)
+
+# drive_3l_model.py's command line names of three-layer model params
+_3L_NAMES = {'y1': 'y1_xy', 'rt': 'ro', 'rc': 'ri', 'm': 'small'}
+
+def three_layer_params(par, obs):
+    """Build the params dict for a three-layer model.
+
+    The defaults follow drive_3l_model.py. Entries in `par` override them and
+    may use either params names or drive_3l_model.py's names (y1, rt, rc, m).
+    """
+    params = {}
+    params['small'] = obs.m
+    params['adjust_small'] = False
+    params['mtot'] = obs.M*1000
+    params['req'] = obs.a0*100
+    params['nz'] = 4096
+    params['verbosity'] = 0
+    params['t1'] = obs.T0
+    params['f_ice'] = 0.5
+
+    params['ymean_xy'] = 0.275
+    params['y1_xy'] = 0.27
+    params['y2_xy'] = 0.35 # initial guess, adjusted by model
+    params['z1'] = 0.015
+    params['z2'] = 0.1
+    params['ri'] = 0.1 # initial guess, adjusted by model
+    params['ro'] = 0.8
+
+    params['j2n_rtol']   = 1e-4
+    params['ymean_rtol'] = 1e-4
+    params['mtot_rtol']  = 1e-4
+    params['max_iters_outer'] = 199
+
+    params['drho_a'] = 0.0
+    params['drho_w'] = 1.0
+    params['drho_c'] = 10.
+    params['drho_type'] = 'sigmoid'
+
+    params['use_gauss_lobatto'] = False
+
+    for key, val in par.items():
+        params[_3L_NAMES.get(key, key)] = val
+    return params
+
+def run_3l(par, obs='jupiter', z_eos='ice', warm=None, timings=None,
+           checkpoint=None, eos=None, accel=None):
+    """Relax a single three-layer ToF model for parameter dictionary `par`.
+
+    Arguments are as in run_one; z_eos is any spec get_z_eos takes.
+    """
+    from krono import gravity, models
+
+    params = three_layer_params(par, get_obs(obs))
+    if (checkpoint is not None and
+        checkpoint.resume(params, 'threeLayerModel') is not None):
+        warm = checkpoint.state
+    if warm is not None:
+        apply_warm_start(params, warm, [_3L_NAMES.get(key, key) for key in par],
+                         'threeLayerModel')
+    model = models.threeLayerModel(*_eos_pair(z_eos, timings, eos), params,
+                                   y_adjust_qty='y2_xy')
+    return _relax(gravity.tof4(model, params), warm, timings, checkpoint, accel)
+
+def _first_attr(objs, names, default=np.nan):
+    # Return the first of attributes `names` found on any of objects `objs`.
+    for obj in objs:
+        for name in names:
+            val = getattr(obj, name, None)
+            if val is not None:
+                return val
+    return default
+
+def model_Js(t):
+    """Vector of model Js (J0=-1, J2, ..., J14) laid out like obs.Js."""
+    return np.array([-1] + [getattr(t, f'j{n}', np.nan) for n in range(2, 16, 2)],
+                    dtype=float)
+
+# tof4 attributes holding the outer iteration count, depending on krono
+# version (a CachedModel has niter)
+_NITER_ATTRS = ('outer_iteration', 'iters_outer', 'niter')
+
+def _required_attr(objs, names, what):
+    # Like _first_attr, but raise if none of the attributes is set.
+    val = _first_attr(objs, names, None)
+    if val is None:
+        raise AttributeError(f"No {what} on {type(objs[0]).__name__}: none of "
+                             f"{', '.join(names)} is set (krono version?).")
+    return val
+
+def summarize(t):
+    """Return a small, picklable dict of results from relaxed tof4 instance t.
+
+    Raises AttributeError if t lacks the total mass, mean helium fraction, or
+    outer iteration count.
+    """
+    rec = {}
+    for n in range(2, 16, 2):
+        rec[f'J{n}'] = float(getattr(t, f'j{n}', np.nan))
+    rec['mtot'] = float(_required_attr([t], ['mtot_calc', 'mtot'], 'mass'))
+    rec['ymean'] = float(_required_attr([t, getattr(t, 'model', None)],
+                                        ['ymean_xy', 'ymean'], 'mean Y'))
+    rec['niter'] = int(_required_attr([t], _NITER_ATTRS, 'iteration count'))
+    rec['niter'] += getattr(t, 'resumed_iters', 0)
+    if getattr(t, 'accel', None) is not None:
+        rec['n_accel'] = t.accel.naccel
+    rec['uid'] = str(getattr(t, 'uid', ''))
+    return rec
+
+###############################################################################
+# Warm starts from previously converged models
+###############################################################################
+# A model state is a flat dict holding the quantities the model adjusts while
+# relaxing (see adjusted_keys) and the tof4 profile arrays, the latter under
+# 'tof.<attribute>' keys. A new relaxation starting from a neighbor's state
+# gets the neighbor's adjusted quantities as initial guesses through params,
+# and the neighbor's level shapes and density profile copied onto its tof4
+# instance before relax() is called. Everything else in params is an input of
+# the model and is never taken from a neighbor: e.g. z2 is adjusted by the
+# dual-cavity model but set by the user of the two- and three-layer models,
+# and small is only adjusted with adjust_small.
+_ADJUSTED = {'dualCavityModel': ('z2',),
+             'twoLayerModel': ('y2_xy',),
+             'threeLayerModel': ('y2_xy', 'ri')}
+_PROFILES = ('l', 'r', 'rho', 'p', 't', 'y', 'z', 'm',
+             'ss', 's0', 's2', 's4', 's6', 's8')
+
+def adjusted_keys(model, params):
+    """The params that krono model type `model` adjusts while relaxing."""
+    return _ADJUSTED.get(model, ()) + \
+           (('small',) if params.get('adjust_small') else ())
+
+def _model_type(model):
+    # Name of the krono model type (a key of _ADJUSTED) of model instance model.
+    for cls in type(model).__mro__:
+        if cls.__name__ in _ADJUSTED:
+            return cls.__name__
+    return type(model).__name__
+
+def _input_spec(params, model, skip=()):
+    # params less those that don't determine the converged model: verbosity,
+    # the initial guesses of the adjusted quantities, and `skip`.
+    skip = set(_NO_HASH).union(adjusted_keys(model, params), skip)
+    return {key: val for key, val in params.items() if key not in skip}
+
+def _digest(obj):
+    # sha256 hex digest of JSON-able obj (numpy scalars allowed).
+    blob = json.dumps(obj, sort_keys=True,
+                      default=lambda o: o.item() if hasattr(o, 'item')
+                                        else repr(o))
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+def model_state(t):
+    """Snapshot of relaxed tof4 instance t, for warm-starting other models."""
+    state = {}
+    for key in adjusted_keys(_model_type(t.model), t.params):
+        if key in t.params:
+            val = getattr(t.model, key, None)
+            if val is None or np.ndim(val) != 0:
+                val = t.params[key]
+            state[key] = float(val)
+    for key in _PROFILES:
+        val = getattr(t, key, None)
+        if isinstance(val, np.ndarray):
+            state['tof.' + key] = np.array(val)
+    return state
+
+def apply_warm_start(params, state, par=(), model='dualCavityModel'):
+    """Copy into params the quantities krono model type `model` adjusts, from
+    a state, except those in par."""
+    for key in adjusted_keys(model, params):
+        if key in state and key not in par:
+            params[key] = state[key]
+
+def seed_tof(t, state):
+    """Copy a state's profile arrays onto tof4 instance t where shapes match."""
+    for key, val in state.items():
+        if key.startswith('tof.'):
+            cur = getattr(t, key[4:], None)
+            if isinstance(cur, np.ndarray) and cur.shape == val.shape:
+                setattr(t, key[4:], np.array(val))
+
+class ModelStore:
+    """Converged-model states keyed by parameter vector, for warm starts.
+
+    The parameter vector is made of par[key] for key in `keys`. If `path` is
+    given every added state is also saved there (one .npz file per model), so
+    the store persists and can be shared by the processes of a sweep; call
+    refresh() to pick up states added by other processes. A store with a path
+    holds only the parameter vectors in memory: states are read from their
+    files when needed, and the `cache` most recently used are kept.
+    """
+
+    def __init__(self, keys, path=None, cache=32):
+        self.keys = tuple(keys)
+        self.path = path
+        self.cache = cache
+        self.vecs = []
+        self._entries = []  # file names, or the states of a store without path
+        self._cached = collections.OrderedDict()
+        self._seen = set()
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self.refresh()
+
+    def __len__(self):
+        return len(self.vecs)
+
+    def vector(self, par):
+        return np.array([par[key] for key in self.keys], dtype=float)
+
+    def refresh(self):
+        """Index states saved to the store directory since the last refresh."""
+        for fname in sorted(os.listdir(self.path)):
+            if (not fname.endswith('.npz') or fname.startswith('.') or
+                fname in self._seen):
+                continue # skip non-states, temp files, and known states
+            try:
+                with np.load(os.path.join(self.path, fname)) as npz:
+                    vec = npz['_vec']
+            except (OSError, ValueError, KeyError):
+                continue
+            self._seen.add(fname)
+            self.vecs.append(vec)
+            self._entries.append(fname)
+
+    def add(self, par, t):
+        """Store the state of relaxed tof4 t (or a state dict) under par."""
+        state = t if isinstance(t, dict) else model_state(t)
+        vec = self.vector(par)
+        self.vecs.append(vec)
+        if not self.path:
+            self._entries.append(state)
+            return
+        fname = hashlib.sha1(vec.tobytes()).hexdigest()[:16] + '.npz'
+        tmp = os.path.join(self.path, f'.{fname}.{os.getpid()}.npz')
+        np.savez(tmp, _vec=vec, **state)
+        os.replace(tmp, os.path.join(self.path, fname))
+        self._seen.add(fname)
+        self._entries.append(fname)
+        self._remember(fname, state)
+
+    def state(self, k):
+        """The k-th stored state (None if its file can't be read)."""
+        entry = self._entries[k]
+        if isinstance(entry, dict):
+            return entry
+        if entry in self._cached:
+            self._cached.move_to_end(entry)
+            return self._cached[entry]
+        try:
+            with np.load(os.path.join(self.path, entry)) as npz:
+                state = {key: (npz[key].item() if npz[key].ndim == 0 else
+                               npz[key]) for key in npz.files if key != '_vec'}
+        except (OSError, ValueError):
+            return None
+        self._remember(entry, state)
+        return state
+
+    def _remember(self, fname, state):
+        self._cached[fname] = state
+        while len(self._cached) > self.cache:
+            self._cached.popitem(last=False)
+
+    def nearest(self, par, maxdist=np.inf):
+        """State of the stored model nearest par, or None if none within maxdist.
+
+        Distance is Euclidean after scaling each parameter by its range in the
+        store (so parameters with different units count equally).
+        """
+        if not self.vecs:
+            return None
+        vecs = np.array(self.vecs)
+        scale = np.ptp(vecs, axis=0)
+        scale[scale == 0] = 1.0
+        dist = np.sqrt((((vecs - self.vector(par))/scale)**2).sum(axis=1))
+        k = np.argmin(dist)
+        return self.state(k) if dist[k] <= maxdist else None
+
+def obs_tag(obs):
+    """Planet name of observables `obs` with its catalog overlays, e.g.
+    'saturn+winds'."""
+    obs = get_obs(obs)
+    variant = getattr(obs, 'variant', '')
+    return obs.pname.lower() + (f'+{variant}' if variant else '')
+
+_stores = {}
+def _open_store(path, keys, obs, model='dualCavityModel'):
+    # Per-process ModelStore for a sweep, refreshed from disk on each use. The
+    # models of each krono model type and planet (with overlays) are kept in
+    # their own subdirectory, so warm starts only come from the same kind.
+    path = os.path.join(path, model, obs_tag(obs))
+    if path not in _stores:
+        _stores[path] = ModelStore(keys, path)
+    else:
+        _stores[path].refresh()
+    return _stores[path]
+
+###############################################################################
+# Checkpointed relaxations
+###############################################################################
+# krono can't suspend a relaxation, but a restarted one can start where the
+# last one stopped. While relax() runs, the model state (see model_state: the
+# adjusted quantities, level shapes, and density profile) is saved to a
+# checkpoint file at most every `interval` seconds, each time a call to one of
+# the model's methods returns. A resubmitted job given the same checkpoint file
+# resumes from the saved state as a warm start, and the outer iterations done
+# before are added to the new count. The file is removed once the model has
+# converged. The checkpoint also records a digest of the model's inputs (its
+# params less the initial guesses and the iteration budget), and a run whose
+# inputs differ (say, after a change of command line) starts afresh instead.
+class Checkpoint:
+    """Periodic state snapshots of one relaxation, for resuming it later.
+
+    On creation, the state saved in `fname` by an earlier run (if any, and if
+    resume is True) is loaded into self.state. Pass the new run's params to
+    resume() to get it as a warm start.
+    """
+
+    def __init__(self, fname, interval=600.0, resume=True):
+        self.fname = fname
+        self.interval = interval
+        self.state = self.load() if resume else None
+        self.resumed_iters = 0
+        self.inputs = None
+        if self.state is not None:
+            self.resumed_iters = int(self.state.pop('_niter', 0))
+            self.inputs = self.state.pop('_inputs', None)
+
+    def resume(self, params, model='dualCavityModel'):
+        """The saved state if it was saved relaxing a krono `model` with the
+        inputs of params, else None (and the saved state is dropped)."""
+        if self.state is not None and self.inputs != self._digest(params, model):
+            print(f"Checkpoint {self.fname} is of a model with other inputs; "
+                  "not resuming from it.", file=sys.stderr)
+            self.state, self.resumed_iters = None, 0
+        return self.state
+
+    @staticmethod
+    def _digest(params, model):
+        return _digest([_input_spec(params, model, ('max_iters_outer',)),
+                        model])
+
+    def load(self):
+        """The saved state, or None if there is no (readable) checkpoint."""
+        try:
+            with np.load(self.fname) as npz:
+                return {key: (npz[key].item() if npz[key].ndim == 0 else
+                              npz[key]) for key in npz.files}
+        except (OSError, ValueError):
+            return None
+
+    def save(self, t):
+        """Atomically write the current state of tof4 instance t."""
+        state = model_state(t)
+        state['_niter'] = (self.resumed_iters +
+                           int(_first_attr([t], _NITER_ATTRS, 0)))
+        state['_inputs'] = self._inputs
+        dirname = os.path.dirname(os.path.abspath(self.fname))
+        os.makedirs(dirname, exist_ok=True)
+        tmp = os.path.join(dirname, f'.ckpt.{os.getpid()}.npz')
+        np.savez(tmp, **state)
+        os.replace(tmp, self.fname)
+        self._last = timer()
+
+    def attach(self, t):
+        """Save t's state every `interval` seconds while it relaxes."""
+        t.resumed_iters = self.resumed_iters
+        self._inputs = self._digest(t.params, _model_type(t.model))
+        self._last = timer()
+        depth = [0] # only check after outermost calls
+        def checked(fn):
+            def call(*args, **kwargs):
+                depth[0] += 1
+                try:
+                    out = fn(*args, **kwargs)
+                finally:
+                    depth[0] -= 1
+                if not depth[0] and timer() - self._last > self.interval:
+                    self.save(t)
+                return out
+            return call
+        for name in dir(type(t.model)):
+            if name.startswith('_') or isinstance(getattr(type(t.model), name),
+                                                  property):
+                continue
+            attr = getattr(t.model, name, None)
+            if callable(attr) and not isinstance(attr, type):
+                setattr(t.model, name, checked(attr))
+        return t
+
+    def clear(self):
+        """Remove the checkpoint file (e.g. once the model has converged)."""
+        try:
+            os.remove(self.fname)
+        except FileNotFoundError:
+            pass
+
+###############################################################################
+# Accelerated outer iterations
+###############################################################################
+# Each outer iteration of a relaxation has the model update its adjusted
+# quantities (z2 for the dual-cavity model, y2_xy and the core radius ri for
+# the three-layer model) from the mass and helium residuals of the current
+# profiles. The updates form a fixed-point iteration x -> g(x) that converges
+# only linearly, and often slowly. An OuterAccelerator attached to a tof4
+# instance watches the model's methods like a Checkpoint does; after every
+# outermost call that changed the adjusted quantities it replaces the model's
+# proposal g(x) with an Anderson-mixed one (the secant step on the residual
+# g(x) - x, per quantity, for method 'secant'). Steps that leave [0, 1] or are
+# more than max_step times longer than the model's own are rejected in favor
+# of the model's proposal. compare_outer() relaxes a model both ways and
+# reports the outer iterations saved.
+class OuterAccelerator:
+    """Anderson (or secant) acceleration of a model's outer adjustments."""
+
+    def __init__(self, method='anderson', depth=3, max_step=10.):
+        if method not in ('anderson', 'secant'):
+            raise ValueError(f"Unknown acceleration method {method}.")
+        self.method = method
+        self.depth = 1 if method == 'secant' else depth
+        self.max_step = max_step
+        self.nupdates = 0   # model updates seen
+        self.naccel = 0     # updates replaced by an accelerated step
+        self.log = []
+        self._x = []
+        self._g = []
+
+    @staticmethod
+    def _values(model, keys):
+        vals = [getattr(model, key, None) for key in keys]
+        if any(val is None or np.ndim(val) != 0 for val in vals):
+            return None
+        vals = np.array(vals, dtype=float)
+        return vals if np.all(np.isfinite(vals)) else None
+
+    def attach(self, t):
+        """Accelerate the adjustments t's model makes while t relaxes."""
+        keys = [key for key in adjusted_keys(_model_type(t.model), t.params)
+                if key in t.params]
+        t.accel = self
+        depth = [0] # only look after outermost calls
+        def accelerated(fn):
+            def call(*args, **kwargs):
+                if not depth[0]:
+                    call.before = self._values(t.model, keys)
+                depth[0] += 1
+                try:
+                    out = fn(*args, **kwargs)
+                finally:
+                    depth[0] -= 1
+                if not depth[0] and call.before is not None:
+                    after = self._values(t.model, keys)
+                    if after is not None and np.any(after != call.before):
+                        new = self.update(call.before, after)
+                        for key, val in zip(keys, new):
+                            setattr(t.model, key, float(val))
+                return out
+            call.before = None
+            return call
+        for name in dir(type(t.model)):
+            if name.startswith('_') or isinstance(getattr(type(t.model), name),
+                                                  property):
+                continue
+            attr = getattr(t.model, name, None)
+            if callable(attr) and not isinstance(attr, type):
+                setattr(t.model, name, accelerated(attr))
+        return t
+
+    def update(self, x, g):
+        """The next value of the adjusted quantities, given the model's
+        update g of x."""
+        self.nupdates += 1
+        self._x = (self._x + [x])[-(self.depth + 1):]
+        self._g = (self._g + [g])[-(self.depth + 1):]
+        new = g
+        if len(self._x) > 1:
+            G = np.array(self._g)
+            F = G - np.array(self._x)
+            dF, dG = np.diff(F, axis=0), np.diff(G, axis=0)
+            f = g - x
+            if self.method == 'secant':
+                ok = dF[-1] != 0
+                gamma = np.where(ok, f/np.where(ok, dF[-1], 1.0), 0.0)
+                trial = g - dG[-1]*gamma
+            else:
+                gamma = np.linalg.lstsq(dF.T, f, rcond=None)[0]
+                trial = g - dG.T @ gamma
+            if (np.all(np.isfinite(trial)) and np.all(trial > 0) and
+                    np.all(trial < 1) and np.linalg.norm(trial - x) <=
+                    self.max_step*np.linalg.norm(g - x)):
+                new = trial
+                self.naccel += 1
+        self.log.append((x, g, new))
+        return new
+
+def compare_outer(par, run=None, obs='jupiter', z_eos='ice', method='anderson',
+                  eos=None):
+    """Relax `par` with the model's own outer loop and with acceleration.
+
+    Returns a dict with the outer iterations and wall times of both
+    relaxations, the iterations saved, the number of accelerated steps, and
+    dJ: the largest difference in J2-J14 in units of the ToF4 truncation
+    error.
+    """
+    run = run or run_one
+    out = {}
+    Js = {}
+    for tag, accel in (('default', None), ('accel', method)):
+        tic = timer()
+        t = run(par, obs, z_eos, accel=accel, eos=eos)
+        out[f'niter_{tag}'] = summarize(t)['niter']
+        out[f'walltime_{tag}'] = timer() - tic
+        Js[tag] = model_Js(t)
+    out['saved'] = out['niter_default'] - out['niter_accel']
+    out['naccel'] = t.accel.naccel
+    dJs = _tof4_obs(get_obs(obs)).dJs
+    use = np.isfinite(dJs) & (dJs > 0)
+    out['dJ'] = float(np.max(np.abs(Js['accel'] - Js['default'])[use]/
+                             dJs[use]))
+    return out
+
+###############################################################################
+# Multi-resolution relaxation
+###############################################################################
+# Most outer iterations only move the adjusted quantities (z2, y2_xy, core
+# radius) towards their converged values, and that doesn't need the full 4096
+# zones. relax_multires() relaxes a model on a coarse mesh first and then
+# finishes on successively finer meshes, each level warm-started from the one
+# before with its profiles interpolated onto the finer mesh. The change in the
+# Js between the last two levels is reported relative to the 4th-order ToF
+# truncation error (observables.<Planet>_tof4 uncertainties), so a value well
+# below one means the coarse levels didn't bias the result.
+def resample_state(state, nz):
+    """Copy of a model state with its profiles interpolated onto nz zones.
+
+    Profiles are interpolated linearly in normalized zone index, i.e. the
+    coarse and fine meshes are assumed to be built by the same rule.
+    """
+    out = {}
+    for key, val in state.items():
+        if key.startswith('tof.') and np.ndim(val) > 0 and val.shape[-1] != nz:
+            x0 = np.linspace(0, 1, val.shape[-1])
+            x1 = np.linspace(0, 1, nz)
+            val = np.apply_along_axis(lambda v: np.interp(x1, x0, v), -1, val)
+        out[key] = val
+    return out
+
+def _tof4_obs(obs):
+    # The observables variant with ToF4 truncation-error uncertainties.
+    cls = getattr(observables, obs.pname.capitalize() + '_tof4', None)
+    return cls() if cls is not None else obs
+
+def relax_multires(par, levels=(512, 4096), obs='jupiter', z_eos='ice',
+                   warm=None, timings=None, run=None, checkpoint=None,
+                   eos=None, accel=None):
+    """Relax a model on successively finer meshes of nz = levels[0], ...
+
+    `run` is run_one (default) or run_3l; other arguments are passed to it.
+    A Checkpoint only applies to the finest level; if it holds a saved state
+    the coarse levels are skipped.
+    Returns (t, report) where t is the final tof4 instance and report is a
+    list with a dict per level holding nz, J2-J14, niter, walltime and, from
+    the second level on, dJ: the largest |change in Jn| between this level
+    and the previous one, in units of the ToF4 truncation error.
+    """
+    run = run or run_one
+    obs = get_obs(obs)
+    dJs = _tof4_obs(obs).dJs
+    use = np.isfinite(dJs) & (dJs > 0)
+    if checkpoint is not None and checkpoint.state is not None:
+        levels = levels[-1:]
+    report = []
+    for nz in levels:
+        tic = timer()
+        last = len(report) == len(levels) - 1
+        t = run(dict(par, nz=nz), obs, z_eos, warm=warm, timings=timings,
+                checkpoint=checkpoint if last else None, eos=eos,
+                accel=accel)
+        level = summarize(t)
+        level['nz'] = nz
+        level['walltime'] = timer() - tic
+        Js = model_Js(t)
+        if report:
+            level['dJ'] = float(np.max(np.abs(Js - prev)[use]/dJs[use]))
+        report.append(level)
+        prev = Js
+        warm = model_state(t)
+        if nz != levels[-1]:
+            warm = resample_state(warm, levels[len(report)])
+    return t, report
+
+###############################################################################
+# Scans over the ad-hoc density perturbation
+###############################################################################
+# Models that differ only in their drho_* parameters (the ad-hoc relative
+# change of the H/He density, drho_a, centered at log10 P = drho_c over a width
+# drho_w, of shape drho_type) share everything else. drho_scan() relaxes the
+# unperturbed base model once, evaluates the analytic perturbation on its
+# converged pressure profile for the whole drho grid at once, and relaxes the
+# grid points in order of increasing perturbation. Each starts from the
+# converged model (the base or an earlier grid point) whose perturbation is
+# closest to its own, with that model's density profile rescaled by the ratio
+# of the two perturbations, so it only has to re-converge the difference. The
+# H/He eos is memoized (see memo_eos) and shared by all the relaxations;
+# memo_stats() reports how many of their lookups it answered.
+def drho_profile(logp, drho_a, drho_c=10., drho_w=1., drho_type='sigmoid'):
+    """Relative density change of the drho_* perturbation at log10 P (cgs).
+
+    Arguments broadcast, e.g. a (nz,) logp with (n, 1) columns of drho_a,
+    drho_c, and drho_w give an (n, nz) array for a grid of n perturbations.
+    """
+    x = (np.asarray(logp) - drho_c)/drho_w
+    if drho_type == 'sigmoid':
+        shape = 1/(1 + np.exp(-x))
+    elif drho_type == 'gaussian':
+        shape = np.exp(-x**2/2)
+    elif drho_type == 'boxcar':
+        shape = (np.abs(x) < 0.5).astype(float)
+    else:
+        raise ValueError(f"Unknown drho_type {drho_type}.")
+    return drho_a*shape
+
+def drho_scan(par, grid, obs='jupiter', z_eos='ice', run=None, memo=1e-5,
+              callback=None, verbosity=0):
+    """Relax models that differ from `par` only in their drho_* parameters.
+
+    grid is a dict of drho_* axes (spanned like param_grid, e.g. for 1-D or
+    2-D scans) or a list of dicts of drho_* values. run is run_one (default)
+    or run_3l; memo is the eos memoization tolerance (0 to disable). Returns
+    (records, base): a record per grid point in grid order, as sweep() makes,
+    with warm_from the grid index of the model it started from (-1 for the
+    base model), and the base model's record.
+    """
+    run = run or run_one
+    points = param_grid(**grid) if isinstance(grid, dict) else list(grid)
+    eos = None
+    if memo:
+        eos = (memo_eos('hhe', memo), memo_eos(z_eos, memo))
+
+    tic = timer()
+    base_par = dict(par, drho_a=0.0)
+    t = run(base_par, obs, z_eos, eos=eos)
+    base = dict(base_par, **summarize(t))
+    base.update(status='ok', walltime=timer() - tic)
+    states = {-1: model_state(t)}
+    if verbosity > 0:
+        print(f"base model: {base['niter']} iterations, "
+              f"{base['walltime']:.1f} s", flush=True)
+
+    # The perturbation of every grid point on the base model's adiabat
+    logp = np.log10(states[-1]['tof.p']) if 'tof.p' in states[-1] else None
+    drho = np.zeros((len(points), 0 if logp is None else len(logp)))
+    if logp is not None:
+        for k, point in enumerate(points):
+            kw = dict(par, **point)
+            drho[k] = drho_profile(logp, kw.get('drho_a', 0.0),
+                                   kw.get('drho_c', 10.), kw.get('drho_w', 1.),
+                                   kw.get('drho_type', 'sigmoid'))
+    profiles = {-1: np.zeros(drho.shape[1])}
+
+    results = [None]*len(points)
+    for k in np.argsort(np.abs(drho).sum(axis=1), kind='stable'):
+        tic = timer()
+        rec = dict(par, **points[k])
+        src = min(profiles, key=lambda j: np.sum((drho[k] - profiles[j])**2))
+        warm = dict(states[src])
+        if 'tof.rho' in warm and logp is not None:
+            warm['tof.rho'] = warm['tof.rho']*(1 + drho[k])/(1 + profiles[src])
+        rec['warm_from'] = int(src)
+        try:
+            t = run(dict(par, **points[k]), obs, z_eos, warm=warm, eos=eos)
+            rec.update(summarize(t))
+            rec['status'] = 'ok'
+            states[k], profiles[k] = model_state(t), drho[k]
+        except Exception as err:
+            rec.update(failure_record(err, rec))
+        rec['walltime'] = timer() - tic
+        results[k] = rec
+        if callback is not None:
+            callback(rec)
+    return results, base
+
+###############################################################################
+# Rotation continuation
+###############################################################################
+# The observed rotation period is uncertain (obs.dP), and so is the rotation
+# parameter small = m = w^2*s0^3/(GM) the models are built with. For a Monte
+# Carlo over the period, rotation_scan() relaxes the model at the nominal m
+# once and then only at a few Chebyshev nodes spanning the drawn m values,
+# each node warm-started from the converged node (or the nominal model) nearest
+# in m, so mostly the figure has to re-converge. The J2n of every draw are then
+# interpolated from the nodes with a low-order polynomial in m, which is smooth
+# over the small range of m allowed by the period uncertainty. Pass nodes=None
+# to relax every draw instead (still by continuation, in order of m).
+def rotation_draws(obs, n, seed=None):
+    """n rotation periods drawn from obs.P +/- obs.dP and their m values."""
+    obs = get_obs(obs)
+    P = obs.draw(n, seed)['P']
+    return P, obs.m*(obs.P/P)**2
+
+def rotation_scan(par, n=1000, obs='jupiter', z_eos='ice', run=None, nodes=5,
+                  seed=None, smalls=None, memo=1e-5, verbosity=0):
+    """J2n as a function of the rotation parameter, for n drawn periods.
+
+    par holds the model's other parameters; run is run_one (default) or
+    run_3l. The m values are drawn with rotation_draws unless given in
+    `smalls`. Returns a dict with 'small' and 'P' (n,) and 'Js' (n, 8, laid
+    out like obs.Js) for the draws, 'node_small' and 'node_Js' for the relaxed
+    models, and 'records' of all relaxations (the nominal model first).
+    """
+    run = run or run_one
+    obs = get_obs(obs)
+    if smalls is None:
+        P, smalls = rotation_draws(obs, n, seed)
+    else:
+        smalls = np.asarray(smalls, dtype=float)
+        P = obs.P*np.sqrt(obs.m/smalls)
+    eos = None
+    if memo:
+        eos = (memo_eos('hhe', memo), memo_eos(z_eos, memo))
+    if nodes is None:
+        node_small = np.unique(smalls)
+    else:
+        lo, hi = smalls.min(), smalls.max()
+        x = np.cos(np.pi*(np.arange(nodes) + 0.5)/nodes)
+        node_small = np.sort(0.5*(lo + hi) + 0.5*(hi - lo)*x)
+
+    # Relax the nominal model, then the nodes nearest to it first
+    states, records = {}, []
+    todo = [obs.m] + sorted(node_small, key=lambda m: abs(m - obs.m))
+    node_Js = {}
+    for m in todo:
+        tic = timer()
+        rec = dict(par, small=float(m))
+        warm = states[min(states, key=lambda s: abs(s - m))] if states else None
+        try:
+            t = run(dict(par, small=float(m)), obs, z_eos, warm=warm, eos=eos)
+            rec.update(summarize(t))
+            rec['status'] = 'ok'
+            states[m] = model_state(t)
+            node_Js[m] = model_Js(t)
+        except Exception as err:
+            rec.update(failure_record(err, rec))
+        rec['walltime'] = timer() - tic
+        records.append(rec)
+        if verbosity > 0:
+            print(f"small = {m:.6g}: {rec['status']}, niter "
+                  f"{rec.get('niter', -1)}, {rec['walltime']:.1f} s", flush=True)
+
+    ok = [m for m in node_small if m in node_Js]
+    if not ok:
+        raise RuntimeError("No rotation node converged.")
+    fit_small = np.array(sorted(set(ok) | ({obs.m} & set(node_Js))))
+    fit_Js = np.array([node_Js[m] for m in fit_small])
+    if nodes is None:
+        Js = np.array([node_Js.get(m, np.full(8, np.nan)) for m in smalls])
+    else:
+        deg = min(len(fit_small) - 1, 3)
+        x0 = 0.5*(fit_small.min() + fit_small.max())
+        coef = np.polyfit(fit_small - x0, fit_Js, deg)
+        Js = np.stack([np.polyval(coef[:,j], smalls - x0) for j in range(8)],
+                      axis=1)
+    return {'small': smalls, 'P': P, 'Js': Js, 'node_small': fit_small,
+            'node_Js': fit_Js, 'records': records}
+
+###############################################################################
+# Content-addressed cache of relaxed models
+###############################################################################
+# Relaxed-model results are cached on disk under a digest of everything that
+# determines them: the params dict (but not the initial guesses of the adjusted
+# quantities, which a warm start replaces), the model type, the eos choice, and
+# the krono version. Entries are written to a private file and renamed into
+# place, so many processes (e.g. SLURM tasks sharing a filesystem) can use one
+# cache directory; a reader that loses a race with eviction just sees a miss.
+# Hits refresh an entry's mtime, and the oldest entries are evicted first once
+# the cache outgrows its size limit.
+_NO_HASH = ('verbosity',) # params that don't affect the converged model
+
+class CachedModel:
+    """Stand-in for a relaxed tof4 instance rebuilt from a cache entry.
+
+    Exposes j2...j14 and the other summarize() fields as attributes, and the
+    cached profile arrays under their tof4 names (e.g. rho, p, t, l). Model
+    server replies (see submit) are wrapped the same way.
+    """
+
+    def __init__(self, entry):
+        self.entry = entry
+        for key, val in entry.items():
+            name = key[4:] if key.startswith('tof.') else key
+            setattr(self, name.lower() if name[0] == 'J' else name, val)
+        self.cached = bool(entry.get('cached', True))
+
+class ResultCache:
+    """Persistent on-disk cache of relaxed-model results with LRU eviction."""
+
+    def __init__(self, path=None, max_bytes=2**30):
+        self.path = path or cache_dir('results')
+        self.max_bytes = max_bytes
+        os.makedirs(self.path, exist_ok=True)
+
+    def key(self, params, model='dualCavityModel', eos=''):
+        """Digest of params (less the initial guesses of the quantities the
+        model adjusts), model type, eos choice, and krono version."""
+        return _digest([_input_spec(params, model), model, str(eos),
+                        krono_version()])
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.npz')
+
+    def get(self, key):
+        """The cached entry dict for key, or None on a miss."""
+        fname = self._file(key)
+        try:
+            with np.load(fname) as npz:
+                entry = {key: (npz[key].item() if npz[key].ndim == 0 else
+                               npz[key]) for key in npz.files}
+            os.utime(fname)
+        except (OSError, ValueError, EOFError):
+            return None # missing, evicted, or partially written
+        return entry
+
+    def put(self, key, t):
+        """Store relaxed tof4 t (summary record and profiles) under key."""
+        entry = summarize(t)
+        entry.update({key_: val for key_, val in model_state(t).items()
+                      if key_.startswith('tof.')})
+        tmp = os.path.join(self.path,
+                           f'.{key}.{platform.node()}.{os.getpid()}.npz')
+        np.savez(tmp, **entry)
+        os.replace(tmp, self._file(key))
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until under max_bytes."""
+        entries = []
+        with os.scandir(self.path) as it:
+            for de in it:
+                if de.name.endswith('.npz') and not de.name.startswith('.'):
+                    try:
+                        st = de.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, de.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, fname in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(fname)
+            except FileNotFoundError:
+                pass # another process got there first
+            total -= size
+
+###############################################################################
+# Persistent model server
+###############################################################################
+# Starting a driver per model pays for interpreter startup, the krono import,
+# and eos setup every time. serve() keeps one warm process listening on a Unix
+# socket instead: each connection is handled by a child forked from it, which
+# inherits the imported modules and the loaded eos objects, so a model starts
+# relaxing within milliseconds. The protocol is one JSON object per line each
+# way: a request names the krono model type, its full params dict, and the Z
+# eos (see serve_request); the reply is the summarize() record with status
+# 'ok', or a failure_record. A connection may carry any number of requests,
+# answered in order; requests on different connections run in parallel, up to
+# the server's worker limit. serve_stdio() speaks the same protocol over
+# stdin/stdout, one model at a time, for use as a subprocess.
+_MODEL_TYPES = {'dualCavityModel': {},
+                'twoLayerModel': {'y_adjust_qty': 'y2_xy'},
+                'threeLayerModel': {'y_adjust_qty': 'y2_xy'}}
+
+def default_socket():
+    """Node-local socket path of the model server ($LAMAT2021_SOCKET)."""
+    return os.getenv('LAMAT2021_SOCKET', os.path.join(tempfile.gettempdir(),
+                                                      f'lamat2021-{os.getuid()}.sock'))
+
+def relax_params(model, params, z_eos='ice', checkpoint=None, accel=None):
+    """Relax krono model type `model` (e.g. 'twoLayerModel') built from a full
+    params dict, as the drivers do. Returns the tof4 instance."""
+    from krono import gravity, models
+
+    if model not in _MODEL_TYPES:
+        raise ValueError(f"Unsupported model type {model}.")
+    params = dict(params)
+    warm = checkpoint.resume(params, model) if checkpoint is not None else None
+    if warm is not None:
+        apply_warm_start(params, warm, model=model)
+    mdl = getattr(models, model)(get_eos('hhe'), get_z_eos(z_eos), params,
+                                 **_MODEL_TYPES[model])
+    return _relax(gravity.tof4(mdl, params), warm, None, checkpoint, accel)
+
+def serve_request(req):
+    """Relax the model of request `req` and return the reply (never raises).
+
+    req holds 'model' (krono model type), 'params' (its full params dict),
+    and optionally 'z_eos' (anything get_z_eos accepts, default 'ice'),
+    'cache' (a ResultCache directory to look the model up in and store it
+    to), 'checkpoint' ([file, interval], see Checkpoint), and 'accel' (an
+    OuterAccelerator method).
+    """
+    tic = timer()
+    try:
+        model, params = req['model'], req['params']
+        z_eos = req.get('z_eos', 'ice')
+        cache = ResultCache(req['cache']) if req.get('cache') else None
+        if cache is not None:
+            ckey = cache.key(params, model=model, eos=eos_tag(z_eos))
+            entry = cache.get(ckey)
+            if entry is not None:
+                rec = {key: np.asarray(val).item() for key, val in entry.items()
+                       if not key.startswith('tof.')}
+                rec.update(status='ok', cached=True, walltime=timer() - tic)
+                return rec
+        ckpt = Checkpoint(*req['checkpoint']) if req.get('checkpoint') else None
+        t = relax_params(model, params, z_eos, ckpt, req.get('accel'))
+        rec = summarize(t)
+        rec.update(status='ok', cached=False)
+        if cache is not None:
+            cache.put(ckey, t)
+    except Exception as err:
+        rec = failure_record(err)
+    rec['walltime'] = timer() - tic
+    return rec
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if line.strip():
+                rep = serve_request(json.loads(line))
+                self.wfile.write((json.dumps(rep) + '\n').encode())
+                self.wfile.flush()
+
+class ModelServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """Unix-socket server relaxing each connection's models in a forked child."""
+    request_queue_size = 128
+
+def _preload(z_eos):
+    # Import krono and load the eos objects children should inherit.
+    from krono import gravity, models
+    krono_version()
+    get_eos('hhe')
+    for spec in z_eos:
+        get_z_eos(spec)
+
+def serve(path=None, z_eos=('ice',), nworkers=None, verbosity=1):
+    """Serve model requests on Unix socket `path` until interrupted.
+
+    The eos objects for every Z eos in `z_eos` are loaded up front; others are
+    loaded by each child that needs one. At most nworkers (default: SLURM
+    allocation or usable cores) models are relaxed at once.
+    """
+    path = path or default_socket()
+    if os.path.exists(path):
+        with socket.socket(socket.AF_UNIX) as sock:
+            try:
+                sock.connect(path)
+            except OSError:
+                os.remove(path) # stale socket of a server that died
+            else:
+                raise RuntimeError(f"A server is already listening on {path}.")
+    _preload(z_eos)
+    with ModelServer(path, _RequestHandler) as server:
+        server.max_children = nworkers or default_workers()
+        if verbosity > 0:
+            print(f"Serving models on {path} with {server.max_children} "
+                  "workers.", flush=True)
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(path)
+
+def serve_stdio(fin=None, fout=None, z_eos=('ice',)):
+    """Serve model requests read from fin (stdin), replying on fout (stdout).
+
+    Anything the models print goes to stderr, to keep the replies parseable.
+    """
+    fin, fout = fin or sys.stdin, fout or sys.stdout
+    _preload(z_eos)
+    stdout, sys.stdout = sys.stdout, sys.stderr
+    try:
+        for line in fin:
+            if line.strip():
+                fout.write(json.dumps(serve_request(json.loads(line))) + '\n')
+                fout.flush()
+    finally:
+        sys.stdout = stdout
+
+def submit(requests, path=None):
+    """Relax models on a running model server and return the replies.
+
+    `requests` is a request dict (see serve_request), answered with one reply
+    dict, or a list of them, answered with a list of replies in the same
+    order; each request of a list goes on its own connection, so the server
+    relaxes them in parallel.
+    """
+    single = isinstance(requests, dict)
+    socks = []
+    try:
+        for req in [requests] if single else requests:
+            sock = socket.socket(socket.AF_UNIX)
+            socks.append(sock)
+            sock.connect(path or default_socket())
+            sock.sendall((json.dumps(req) + '\n').encode())
+            sock.shutdown(socket.SHUT_WR) # no more requests on it
+        replies = []
+        for sock in socks:
+            with sock.makefile('r') as f:
+                line = f.readline()
+            if not line:
+                raise ConnectionError("Model server closed the connection.")
+            replies.append(json.loads(line))
+    finally:
+        for sock in socks:
+            sock.close()
+    return replies[0] if single else replies
+
+###############################################################################
+# Columnar, append-only store of sweep results
+###############################################################################
+# A results store is a directory with one raw binary file per column (input
+# parameters, J2-J14, ymean, mtot, niter, walltime, status, ...), optional
+# profile files holding nz values per row (rho, p, t, l on the model mesh), and
+# a schema.json describing them. Rows are only ever appended, under an flock on
+# the store, and a row exists once every column holds it, so a writer killed
+# mid-append leaves no partial row. Readers memory-map the columns, so scanning
+# a million-model sweep doesn't read anything it doesn't touch. Integers are
+# stored as int64 and floats as float64; an integer column is rewritten as
+# float64 when a float is appended to it, or when it needs back-filling. Columns
+# that first appear after some rows were written are back-filled (nan, False,
+# or empty string). Strings are stored UTF-8 encoded in fixed-width columns at
+# least _STR_WIDTH bytes wide; a column is rewritten wider when a longer value
+# is appended, so values are never truncated.
+_STR_WIDTH = 32
+
+def _column_dtype(val):
+    # Store column dtype for a record value (None if it can't be stored).
+    if isinstance(val, (bool, np.bool_)):
+        return '|b1'
+    if isinstance(val, (int, np.integer)):
+        return '<i8'
+    if isinstance(val, (float, np.floating)):
+        return '<f8'
+    if isinstance(val, str):
+        return f'|S{max(_STR_WIDTH, len(val.encode()))}'
+    return None
+
+def _store_value(val):
+    return val.encode() if isinstance(val, str) else val
+
+def _lock_file(f):
+    # Hold an exclusive lock on open file f until it is closed. Without fcntl
+    # (Windows) appends are not locked, so use one writer per store there.
+    try:
+        import fcntl
+    except ImportError:
+        return
+    fcntl.flock(f, fcntl.LOCK_EX)
+
+def _fill_value(dtype):
+    return {'b': False, 'f': np.nan, 'S': b''}[np.dtype(dtype).kind]
+
+def _merged_dtype(old, new):
+    # Column dtype holding values of dtypes old and new (old if none does).
+    old, new = np.dtype(old), np.dtype(new)
+    if old.kind == new.kind == 'S':
+        return max(old, new, key=lambda dt: dt.itemsize).str
+    if {old.kind, new.kind} == {'i', 'f'}:
+        return '<f8'
+    return old.str
+
+def as_columns(results):
+    """Dict of column arrays from a ResultsStore, its path, or a record list."""
+    if isinstance(results, str):
+        results = ResultsStore(results)
+    if isinstance(results, ResultsStore):
+        results = results.read()
+    if isinstance(results, dict):
+        return {key: (np.char.decode(val, 'utf-8')
+                      if np.asarray(val).dtype.kind == 'S' else np.asarray(val))
+                for key, val in results.items()}
+    keys = {key: None for rec in results for key in rec if key != 'profiles'}
+    return {key: np.array([rec.get(key, np.nan) for rec in results])
+            for key in keys}
+
+class ResultsStore:
+    """Append-only columnar store of sweep results, read by memory mapping."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._load_schema()
+
+    def _load_schema(self):
+        try:
+            with open(os.path.join(self.path, 'schema.json')) as f:
+                self.schema = json.load(f)
+        except FileNotFoundError:
+            self.schema = {'columns': {}, 'profiles': [], 'nz': None}
+
+    def _save_schema(self):
+        tmp = os.path.join(self.path, f'.schema.{os.getpid()}.json')
+        with open(tmp, 'w') as f:
+            json.dump(self.schema, f, indent=1)
+        os.replace(tmp, os.path.join(self.path, 'schema.json'))
+
+    def _file(self, name, profile=False):
+        return os.path.join(self.path, ('p.' if profile else 'c.') + name)
+
+    def _nrows(self):
+        # Rows held by every column and profile file.
+        sizes = [os.path.getsize(self._file(name))//np.dtype(dt).itemsize
+                 for name, dt in self.schema['columns'].items()]
+        sizes += [os.path.getsize(self._file(name, True))//(8*self.schema['nz'])
+                  for name in self.schema['profiles']]
+        return min(sizes) if sizes else 0
+
+    def __len__(self):
+        self._load_schema()
+        return self._nrows()
+
+    @property
+    def columns(self):
+        return list(self.schema['columns'])
+
+    def append(self, recs):
+        """Append records (dicts); a record's 'profiles' entry, if any, is a
+        dict of length-nz arrays."""
+        recs = [recs] if isinstance(recs, dict) else list(recs)
+        cols = {}
+        for rec in recs:
+            for key, val in rec.items():
+                dt = _column_dtype(val) if key != 'profiles' else None
+                if dt is None:
+                    continue
+                cols[key] = _merged_dtype(cols.get(key, dt), dt)
+        for key, dt in cols.items():
+            if dt == '<i8' and any(key not in rec for rec in recs):
+                cols[key] = '<f8' # no nan to fill the gaps with
+        cols = {key: np.array([_store_value(rec[key]) if key in rec else
+                               _fill_value(dt) for rec in recs], dtype=dt)
+                for key, dt in cols.items()}
+        profs = {}
+        for k, rec in enumerate(recs):
+            for key, val in rec.get('profiles', {}).items():
+                if key not in profs:
+                    profs[key] = np.full((len(recs), len(val)), np.nan)
+                profs[key][k] = val
+        self._append_columns(cols, profs, len(recs))
+
+    def _append_columns(self, cols, profs, n):
+        # Append n rows given as column arrays (missing columns are filled).
+        with open(os.path.join(self.path, '.lock'), 'a') as lock:
+            _lock_file(lock)
+            self._load_schema()
+            nrows = self._nrows()
+            schema = self.schema
+            for key, arr in profs.items():
+                if schema['nz'] is None:
+                    schema['nz'] = arr.shape[1]
+                if arr.shape[1] != schema['nz']:
+                    raise ValueError(f"Profile {key} has {arr.shape[1]} zones; "
+                                     f"store has nz={schema['nz']}.")
+            # New columns and profiles are back-filled to the current length,
+            # and columns retyped to hold the new values (or the fill value)
+            for key, arr in cols.items():
+                if key not in schema['columns']:
+                    dt = '<f8' if nrows and arr.dtype.kind == 'i' else \
+                         arr.dtype.str
+                    schema['columns'][key] = dt
+                    with open(self._file(key), 'wb') as f:
+                        if nrows:
+                            np.full(nrows, _fill_value(dt), dtype=dt).tofile(f)
+                else:
+                    dt = _merged_dtype(schema['columns'][key], arr.dtype)
+                    if dt != schema['columns'][key]:
+                        self._retype(key, dt, nrows)
+            for key, dt in list(schema['columns'].items()):
+                if n and key not in cols and dt == '<i8':
+                    self._retype(key, '<f8', nrows)
+            for key in profs:
+                if key not in schema['profiles']:
+                    schema['profiles'].append(key)
+                    with open(self._file(key, True), 'wb') as f:
+                        np.full((nrows, schema['nz']), np.nan).tofile(f)
+            self._save_schema()
+            # Drop any torn tail, then append
+            for key, dt in schema['columns'].items():
+                arr = cols.get(key)
+                if arr is None:
+                    arr = np.full(n, _fill_value(dt), dtype=dt)
+                with open(self._file(key), 'r+b') as f:
+                    f.truncate(nrows*np.dtype(dt).itemsize)
+                    f.seek(0, os.SEEK_END)
+                    np.asarray(arr, dtype=dt).tofile(f)
+            for key in schema['profiles']:
+                arr = profs.get(key)
+                if arr is None:
+                    arr = np.full((n, schema['nz']), np.nan)
+                with open(self._file(key, True), 'r+b') as f:
+                    f.truncate(nrows*8*schema['nz'])
+                    f.seek(0, os.SEEK_END)
+                    np.asarray(arr, dtype='<f8').tofile(f)
+
+    def _retype(self, key, dtype, nrows):
+        # Rewrite column key with dtype (a wider string, or float for integer)
+        # under the lock.
+        old = np.fromfile(self._file(key), dtype=self.schema['columns'][key],
+                          count=nrows)
+        tmp = os.path.join(self.path, f'.retype.{os.getpid()}')
+        old.astype(dtype).tofile(tmp)
+        os.replace(tmp, self._file(key))
+        self.schema['columns'][key] = np.dtype(dtype).str
+
+    def append_store(self, other, order=None):
+        """Append all rows of ResultsStore `other` (optionally reordered)."""
+        cols = other.read()
+        profs = {name: other.profile(name) for name in other.schema['profiles']}
+        n = len(next(iter(cols.values()))) if cols else 0
+        if order is not None:
+            cols = {key: arr[order] for key, arr in cols.items()}
+            profs = {key: arr[order] for key, arr in profs.items()}
+        if n:
+            self._append_columns(cols, profs, n)
+
+    def read(self, columns=None):
+        """Dict of memory-mapped column arrays (all columns by default)."""
+        self._load_schema()
+        n = self._nrows()
+        out = {}
+        for name in columns or self.schema['columns']:
+            dt = self.schema['columns'][name]
+            out[name] = (np.memmap(self._file(name), dtype=dt, mode='r',
+                                   shape=(n,)) if n else np.empty(0, dt))
+        return out
+
+    def profile(self, name):
+        """Memory-mapped (nrows, nz) array of profile `name`."""
+        self._load_schema()
+        n = self._nrows()
+        nz = self.schema['nz']
+        if not n:
+            return np.empty((0, nz or 0))
+        return np.memmap(self._file(name, True), dtype='<f8', mode='r',
+                         shape=(n, nz))
+
+    def records(self):
+        """The stored rows as a list of dicts (for small stores)."""
+        cols = self.read()
+        recs = [{} for _ in range(len(self))]
+        for key, arr in cols.items():
+            for rec, val in zip(recs, arr.tolist()):
+                rec[key] = val.decode() if isinstance(val, bytes) else val
+        return recs
+
+###############################################################################
+# Failure log
+###############################################################################
+# Failed relaxations are logged as rows of a ResultsStore, so any number of
+# processes (pool workers, SLURM tasks) can share one log directory: each
+# record is appended in one write under the store's flock, so records never
+# interleave or tear. A record holds the model's parameters and uid, the
+# exception type and message, the outer iteration reached, the innermost frame
+# of the traceback, and a digest of the whole traceback (its file:function:line
+# frames, not the message), so that failures with the same cause can be
+# grouped whatever values ended up in their messages. Logging is best effort:
+# a record that can't be written is reported on stderr and dropped, never
+# allowed to abort the sweep that hit the failure.
+def _failed_tof(err):
+    # The tof4 instance whose relaxation raised err, found in its traceback.
+    tb, found = err.__traceback__, None
+    while tb is not None:
+        obj = tb.tb_frame.f_locals.get('self')
+        if hasattr(obj, 'relax') and hasattr(obj, 'model'):
+            found = obj
+        tb = tb.tb_next
+    return found
+
+def failure_record(err, par=None, t=None):
+    """Structured record of exception `err` raised relaxing model `par`.
+
+    t is the tof4 instance, if at hand; otherwise it is looked up in the
+    traceback (for the uid and the iteration reached).
+    """
+    if t is None:
+        t = _failed_tof(err)
+    frames = traceback.extract_tb(err.__traceback__)
+    where = [f'{os.path.basename(fr.filename)}:{fr.name}:{fr.lineno}'
+             for fr in frames]
+    rec = dict(par or {})
+    rec['uid'] = str(getattr(t, 'uid', ''))
+    rec['status'] = type(err).__name__
+    rec['error'] = str(err)
+    rec['where'] = where[-1] if where else ''
+    rec['traceback'] = hashlib.sha1(';'.join(where).encode()).hexdigest()[:12]
+    rec['niter'] = int(_first_attr([t], _NITER_ATTRS, -1))
+    return rec
+
+class FailureLog:
+    """Log of failed models that many processes can append to at once."""
+
+    def __init__(self, path='failures'):
+        self.store = ResultsStore(path)
+
+    def add(self, err, par=None, t=None):
+        """Log exception `err` for model `par` (see failure_record)."""
+        rec = failure_record(err, par, t)
+        self.append(rec)
+        return rec
+
+    def append(self, rec):
+        """Log a ready-made failure record (a dict); errors only warn."""
+        try:
+            self.store.append(rec)
+        except Exception as err:
+            print(f"Could not log failure of {rec.get('uid', '?')} to "
+                  f"{self.store.path}: {err!r}", file=sys.stderr)
+
+    def read(self, status=None):
+        """Dict of columns of the logged failures (only `status` ones if given)."""
+        cols = as_columns(self.store)
+        if status is not None and 'status' in cols:
+            keep = cols['status'] == status
+            cols = {key: val[keep] for key, val in cols.items()}
+        return cols
+
+    def summary(self):
+        """Text table of failure counts by exception type and traceback."""
+        cols = as_columns(self.store)
+        if not len(cols.get('status', ())):
+            return "No failures."
+        where = cols.get('where', np.full(len(cols['status']), ''))
+        digest = cols.get('traceback', np.full(len(cols['status']), ''))
+        groups = collections.Counter(zip(cols['status'], where, digest))
+        lines = [f"{'count':>6s}  {'status':20s} {'traceback':12s} where"]
+        for (status, wh, dg), n in groups.most_common():
+            lines.append(f"{n:6d}  {status:20s} {dg:12s} {wh}")
+        return '\n'.join(lines)
+
+###############################################################################
+# Parameter sweeps
+###############################################################################
+def param_grid(**axes):
+    """Return a list of parameter dicts spanning the product of `axes`.
+
+    Example: param_grid(rio=[0.15, 0.2], roo=[0.6, 0.8], y2_xy=[0.3])
+    """
+    keys = list(axes)
+    vals = [np.atleast_1d(axes[key]).tolist() for key in keys]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*vals)]
+
+###############################################################################
+# Design of experiments
+###############################################################################
+# Space-filling parameter designs: a Sobol sequence (Joe & Kuo direction
+# numbers, optionally with a random digital shift) or a Latin hypercube over
+# declared parameter bounds. refine_design() extends a design already
+# relaxed into a ResultsStore: part of the new points continue the Sobol
+# sequence (skipping points already in the store), and the rest are picked
+# greedily from a large pool of candidates, favoring regions where many
+# neighboring models failed or where J2 changes quickly, while keeping away
+# from points already done.
+DESIGN_BOUNDS = {'rio': (0.05, 0.5), 'roo': (0.5, 0.95), 'y2_xy': (0.27, 0.45),
+                 'drho_a': (-0.15, 0.05), 'drho_c': (8., 12.), 'z1': (0., 0.1)}
+
+# Joe & Kuo (2008) (degree, coefficients, initial m's) for dimensions 2-10
+_SOBOL_DIRECTIONS = [(1, 0, (1,)), (2, 1, (1, 3)), (3, 1, (1, 3, 1)),
+                     (3, 2, (1, 1, 1)), (4, 1, (1, 1, 3, 3)),
+                     (4, 4, (1, 3, 5, 13)), (5, 2, (1, 1, 5, 5, 17)),
+                     (5, 4, (1, 1, 5, 5, 5)), (5, 7, (1, 1, 7, 11, 19))]
+
+def sobol(n, d, start=0, seed=None):
+    """Points start...start+n-1 of the d-dimensional Sobol sequence.
+
+    Returns an (n, d) array in [0, 1). With a seed, a random digital shift is
+    applied (the same for any start, so a sequence can be continued).
+    """
+    if d > len(_SOBOL_DIRECTIONS) + 1:
+        raise ValueError(f"Sobol designs support at most "
+                         f"{len(_SOBOL_DIRECTIONS) + 1} dimensions.")
+    bits = 32
+    V = np.zeros((d, bits), dtype=np.uint64)
+    V[0] = 1 << np.arange(bits - 1, -1, -1, dtype=np.uint64)
+    for j in range(1, d):
+        deg, a, m = _SOBOL_DIRECTIONS[j-1]
+        for i in range(bits):
+            if i < deg:
+                V[j,i] = m[i] << (bits - 1 - i)
+            else:
+                v = V[j,i-deg] ^ (V[j,i-deg] >> np.uint64(deg))
+                for k in range(1, deg):
+                    if (a >> (deg - 1 - k)) & 1:
+                        v ^= V[j,i-k]
+                V[j,i] = v
+    idx = np.arange(start, start + n, dtype=np.uint64)
+    gray = idx ^ (idx >> np.uint64(1))
+    X = np.zeros((n, d), dtype=np.uint64)
+    for b in range(bits):
+        on = ((gray >> np.uint64(b)) & np.uint64(1)).astype(bool)
+        X[on] ^= V[:,b]
+    if seed is not None:
+        shift = np.random.default_rng(seed).integers(0, 2**bits, d,
+                                                     dtype=np.uint64)
+        X ^= shift
+    return X.astype(float)/2**bits
+
+def latin_hypercube(n, d, seed=None):
+    """An (n, d) Latin hypercube sample in [0, 1)."""
+    rng = np.random.default_rng(seed)
+    X = (np.arange(n)[:,None] + rng.random((n, d)))/n
+    for j in range(d):
+        X[:,j] = X[rng.permutation(n), j]
+    return X
+
+def _design_ok(par):
+    # Dual-cavity models need room for the two 0.01-wide transitions.
+    return not ('rio' in par and 'roo' in par and par['roo'] - par['rio'] < 0.03)
+
+def _to_params(U, bounds, fixed):
+    # Parameter dicts from unit-cube points.
+    names = list(bounds)
+    lo = np.array([bounds[name][0] for name in names])
+    hi = np.array([bounds[name][1] for name in names])
+    X = lo + U*(hi - lo)
+    return [dict(fixed, **dict(zip(names, x.tolist()))) for x in X]
+
+def design(n, bounds=None, method='sobol', start=0, seed=None, fixed=None):
+    """n parameter dicts spread over `bounds` (name -> (lo, hi)).
+
+    bounds defaults to DESIGN_BOUNDS; fixed holds parameters added to every
+    point (e.g. nz). method is 'sobol' (points start, start+1, ... of the
+    sequence, skipping points that don't make a valid model) or 'lhs'.
+    """
+    bounds = bounds or DESIGN_BOUNDS
+    fixed = fixed or {}
+    if method == 'lhs':
+        return [par for par in _to_params(latin_hypercube(n, len(bounds), seed),
+                                          bounds, fixed) if _design_ok(par)]
+    out = []
+    while len(out) < n:
+        pars = _to_params(sobol(2*(n - len(out)), len(bounds), start, seed),
+                          bounds, fixed)
+        start += len(pars)
+        out.extend(par for par in pars if _design_ok(par))
+    return out[:n]
+
+def refine_design(results, n, bounds=None, focus=0.5, seed=None, fixed=None,
+                  k=5, pool=20):
+    """n new parameter dicts extending the design relaxed into `results`.
+
+    results is anything as_columns accepts. A fraction 1 - focus of the new
+    points continues the Sobol sequence (from the number of rows already in
+    results), without repeating any point already there. The rest are chosen
+    from pool*n further Sobol candidates, greedily, by score
+        (failed fraction + J2 gradient) * distance to the nearest point,
+    with the failed fraction and the J2 spread (per unit distance, relative
+    to its largest value) taken over each candidate's k nearest relaxed
+    neighbors, and distances measured in the unit cube of `bounds`. A small
+    floor on the score keeps the choice space-filling where nothing failed
+    and J2 is flat. No point is repeated.
+
+    Bounds whose column results lacks (e.g. drho_a, for a store filled from
+    a rio/roo/y2_xy grid) are held at their value in fixed, and the design
+    is refined over the rest; a ValueError names any that fixed lacks too.
+    """
+    bounds = bounds or DESIGN_BOUNDS
+    cols = as_columns(results)
+    nrows = len(next(iter(cols.values()))) if cols else 0
+    if nrows:
+        missing = [name for name in bounds if name not in cols]
+        unset = [name for name in missing if name not in (fixed or {})]
+        if unset or len(missing) == len(bounds):
+            raise ValueError(f"Results lack the columns {unset or missing} of "
+                             "the design bounds; hold them at a value with "
+                             "fixed (--fixed) or drop them from the bounds.")
+        bounds = {name: lims for name, lims in bounds.items()
+                  if name not in missing}
+    names = list(bounds)
+    lo = np.array([bounds[name][0] for name in names])
+    hi = np.array([bounds[name][1] for name in names])
+    if nrows:
+        done = (np.column_stack([cols[name] for name in names]) - lo)/(hi - lo)
+        ok = (cols['status'] == 'ok') if 'status' in cols else \
+             np.ones(nrows, bool)
+        J2 = cols['J2'] if 'J2' in cols else np.full(nrows, np.nan)
+    else:
+        done, ok, J2 = np.empty((0, len(names))), np.empty(0, bool), None
+
+    def unit(pars):
+        return (np.array([[par[name] for name in names] for par in pars]) -
+                lo)/(hi - lo)
+
+    def is_new(u, pts):
+        return not len(pts) or np.min(np.abs(pts - u).max(axis=1)) > 1e-9
+
+    # Space-filling part: continue the sequence
+    def fill(nfill, start):
+        nonlocal pts
+        while len(out) < nfill:
+            for par in design(nfill - len(out), bounds, start=start, seed=seed,
+                              fixed=fixed):
+                u = unit([par])[0]
+                if is_new(u, pts):
+                    out.append(par)
+                    pts = np.vstack([pts, u])
+            start += nfill
+        return start
+
+    out, pts = [], done
+    start = fill(n - int(round(focus*n)) if nrows else n, nrows)
+    if len(out) == n:
+        return out
+
+    # Focused part: score candidates by their relaxed neighbors
+    cands = design(pool*n, bounds, start=start + n, seed=seed, fixed=fixed)
+    U = unit(cands)
+    dist = np.sqrt(((U[:,None,:] - done[None,:,:])**2).sum(axis=-1))
+    near = np.argsort(dist, axis=1)[:,:min(k, nrows)]
+    fail = 1.0 - ok[near].mean(axis=1)
+    grad = np.zeros(len(cands))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for c in range(len(cands)):
+            nb = near[c][ok[near[c]] & np.isfinite(J2[near[c]])]
+            if len(nb) > 1:
+                grad[c] = np.ptp(J2[nb])/np.mean(dist[c, nb])
+    grad = grad/grad.max() if grad.max() > 0 else grad
+    weight = fail + grad + 1e-3
+    dmin = np.sqrt(((U[:,None,:] - pts[None,:,:])**2).sum(axis=-1)).min(axis=1)
+    while len(out) < n:
+        c = int(np.argmax(weight*dmin))
+        if not is_new(U[c], pts):
+            break # every candidate is already in the design
+        out.append(cands[c])
+        pts = np.vstack([pts, U[c]])
+        dmin = np.minimum(dmin, np.sqrt(((U - U[c])**2).sum(axis=1)))
+    fill(n, start + n + pool*n)
+    return out
+
+def default_workers():
+    """Number of worker processes to use: SLURM allocation, else usable cores."""
+    for var in ('SLURM_NTASKS', 'SLURM_CPUS_ON_NODE'):
+        if os.getenv(var):
+            return int(os.getenv(var))
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+# Statuses of models whose worker was killed by a SupervisedPool
+_KILLED = ('Timeout', 'WorkerDied')
+
+def _pool_worker(conn, fn):
+    # Worker process: run fn on each (tag, args) received until told to stop.
+    while True:
+        job = conn.recv()
+        if job is None:
+            break
+        tag, args = job
+        conn.send((tag, fn(*args)))
+
+class SupervisedPool:
+    """Worker processes running fn(*args) -> record dict, with a time limit.
+
+    Unlike a ProcessPoolExecutor, a worker still busy with a task after
+    `timeout` seconds is killed and replaced, and a worker that dies (e.g.
+    segfaults in an eos call) takes only its own task down with it. Either
+    way the task's record is {'status': 'Timeout' or 'WorkerDied',
+    'walltime': ...}.
+    """
+
+    def __init__(self, fn, nworkers, timeout=None, poll=1.0):
+        self.fn = fn
+        self.nworkers = nworkers
+        self.timeout = timeout
+        self.poll = poll
+        self.nkilled = 0
+        self._ctx = mp.get_context()
+        self._queue = collections.deque()
+        self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _spawn(self):
+        conn, child = self._ctx.Pipe()
+        proc = self._ctx.Process(target=_pool_worker, args=(child, self.fn),
+                                 daemon=True)
+        proc.start()
+        child.close()
+        worker = {'proc': proc, 'conn': conn, 'tag': None, 'start': 0.0}
+        self._workers.append(worker)
+        return worker
+
+    def _kill(self, worker):
+        worker['proc'].kill()
+        worker['proc'].join()
+        worker['conn'].close()
+        self._workers.remove(worker)
+        self.nkilled += 1
+
+    def submit(self, tag, *args):
+        """Queue fn(*args); its record is yielded by results() with `tag`."""
+        self._queue.append((tag, args))
+
+    def results(self):
+        """Yield (tag, record) as tasks finish, until no task is left.
+
+        Tasks submitted while iterating (e.g. retries) are run too.
+        """
+        while True:
+            idle = [w for w in self._workers if w['tag'] is None]
+            while self._queue and (idle or len(self._workers) < self.nworkers):
+                worker = idle.pop() if idle else self._spawn()
+                worker['tag'], args = self._queue.popleft()
+                worker['start'] = timer()
+                worker['conn'].send((worker['tag'], args))
+            busy = [w for w in self._workers if w['tag'] is not None]
+            if not busy:
+                return
+            mp.connection.wait([w['conn'] for w in busy] +
+                               [w['proc'].sentinel for w in busy],
+                               self.poll if self.timeout else None)
+            for worker in busy:
+                tag, elapsed = worker['tag'], timer() - worker['start']
+                if worker['conn'].poll():
+                    try:
+                        _, rec = worker['conn'].recv()
+                    except (EOFError, OSError):
+                        status = 'WorkerDied'
+                    else:
+                        worker['tag'] = None
+                        yield tag, rec
+                        continue
+                elif not worker['proc'].is_alive():
+                    status = 'WorkerDied'
+                elif self.timeout and elapsed > self.timeout:
+                    status = 'Timeout'
+                else:
+                    continue
+                self._kill(worker)
+                yield tag, {'status': status, 'walltime': elapsed}
+
+    def close(self):
+        """Stop idle workers and kill busy ones."""
+        for worker in list(self._workers):
+            if worker['tag'] is None:
+                try:
+                    worker['conn'].send(None)
+                    worker['proc'].join(5)
+                except OSError:
+                    pass
+            if worker['proc'].is_alive():
+                worker['proc'].kill()
+                worker['proc'].join()
+            worker['conn'].close()
+        self._workers = []
+
+# Initial guesses drawn for retries of failed models: name -> (lo, hi)
+_RETRY_GUESSES = {'z2': (0.1, 0.9)}
+
+def retry_guess(par, attempt, seed=0):
+    """Initial guesses for retry number `attempt` of a model that failed.
+
+    The first retry starts cold (no warm start) from the default guesses;
+    later ones draw each _RETRY_GUESSES quantity not set in `par` uniformly
+    from its range, reproducibly for a given (seed, attempt).
+    """
+    if attempt < 2:
+        return {}
+    rng = np.random.default_rng([seed, attempt])
+    return {key: rng.uniform(lo, hi) for key, (lo, hi) in _RETRY_GUESSES.items()
+            if key not in par}
+
+# tof4 profiles kept with sweep results when asked for
+_RESULT_PROFILES = ('rho', 'p', 't', 'l')
+
+def _sweep_one(par, obs, z_eos, opts):
+    # Worker: relax one model and return a summary record (never raises).
+    tic = timer()
+    rec = dict(par)
+    store, cache = opts.get('store'), opts.get('cache')
+    profiles, levels = opts.get('profiles'), opts.get('levels')
+    guess = opts.get('guess') # set on retries; no warm start then
+    run_par = dict(par, **(guess or {}))
+    if opts.get('max_iters'):
+        run_par['max_iters_outer'] = opts['max_iters']
+    try:
+        if cache:
+            cache = ResultCache(cache)
+            ckey = cache.key(dual_cavity_params(par, get_obs(obs)),
+                             eos=eos_tag(z_eos))
+            entry = cache.get(ckey)
+            if entry is not None:
+                rec.update({key: val for key, val in entry.items()
+                            if not key.startswith('tof.')})
+                if profiles:
+                    rec['profiles'] = {key: entry['tof.' + key]
+                                       for key in _RESULT_PROFILES
+                                       if 'tof.' + key in entry}
+                rec['status'] = 'ok'
+                rec['cached'] = True
+                rec['walltime'] = timer() - tic
+                return rec
+        mstore = _open_store(store, opts['keys'], obs) if store else None
+        warm = None
+        if mstore is not None and guess is None:
+            warm = mstore.nearest(par)
+        rec['warm_start'] = warm is not None
+        ckpt = None
+        if opts.get('checkpoints'):
+            name = hashlib.sha1(json.dumps(par, sort_keys=True).encode())
+            ckpt = Checkpoint(os.path.join(opts['checkpoints'],
+                                           name.hexdigest()[:16] + '.npz'),
+                              opts.get('checkpoint_every') or 600.0,
+                              resume=guess is None)
+        eos = None
+        if opts.get('memo_eos'):
+            eos = (memo_eos('hhe', opts['memo_eos']),
+                   memo_eos(z_eos, opts['memo_eos']))
+            calls0 = [(memo.hits, memo.misses) for memo in eos]
+        timings = Timings()
+        if levels:
+            nz = par.get('nz', 4096)
+            levels_ = [lev for lev in levels if lev < nz] + [nz]
+            t, report = relax_multires(run_par, levels_, obs, z_eos, warm=warm,
+                                       timings=timings, checkpoint=ckpt,
+                                       eos=eos, accel=opts.get('accel'))
+            rec['dJ_levels'] = report[-1].get('dJ', np.nan)
+        else:
+            t = run_one(run_par, obs, z_eos, warm=warm, timings=timings,
+                        checkpoint=ckpt, eos=eos, accel=opts.get('accel'))
+        rec.update(summarize(t))
+        if levels:
+            # count the iterations of every level, like the eos calls
+            rec['niter_final'] = rec['niter']
+            rec['niter'] = sum(level['niter'] for level in report)
+            if 'n_accel' in rec:
+                rec['n_accel'] = sum(level['n_accel'] for level in report)
+        rec.update(timings.summary())
+        if ckpt is not None:
+            rec['resumed'] = ckpt.state is not None
+        if eos is not None:
+            hits = sum(memo.hits - h for memo, (h, m) in zip(eos, calls0))
+            ncalls = sum(memo.hits + memo.misses - h - m
+                         for memo, (h, m) in zip(eos, calls0))
+            rec['eos_hit_rate'] = hits/ncalls if ncalls else np.nan
+        rec['status'] = 'ok'
+        rec['cached'] = False
+        if profiles:
+            rec['profiles'] = {key: np.asarray(getattr(t, key))
+                               for key in _RESULT_PROFILES
+                               if isinstance(getattr(t, key, None), np.ndarray)}
+        if mstore is not None:
+            mstore.add(par, t)
+        if cache:
+            cache.put(ckey, t)
+    except Exception as err:
+        rec.update(failure_record(err, par))
+    rec['walltime'] = timer() - tic
+    return rec
+
+def sweep(par_list, obs='jupiter', z_eos='ice', nworkers=None, callback=None,
+          extra=None, **opts):
+    """Relax every parameter dict in `par_list` across a process pool.
+
+    Returns a list of result records (see summarize) in the order of
+    `par_list`; failed models have the exception name in rec['status']. If
+    `callback` is given it is called with each record as soon as it is ready.
+    Records include per-phase call counts and times (see Timings.summary).
+    `extra` is an optional list of dicts (one per model) of fields to add to
+    the records without passing them to the models.
+
+    Options:
+      store     directory of ModelStores (one per planet and overlays); each
+                model is warm-started from the nearest converged model of its
+                planet found there and, once converged, added to it
+      cache     directory of a ResultCache; models found there are not
+                relaxed again
+      profiles  if True, records also hold the rho, p, t, and l profiles in
+                rec['profiles']
+      levels    coarse nz levels to relax on before the model's own nz (see
+                relax_multires); records then hold dJ_levels, and niter
+                (and n_accel) summed over the levels, with the model's own
+                level's count in niter_final
+      timeout   wall-clock limit (s) per model; the worker relaxing a model
+                that runs longer is killed and replaced (status 'Timeout')
+      max_iters outer iteration budget per model (max_iters_outer)
+      retries   number of times to retry a failed model, first from a cold
+                start and then from perturbed initial guesses (see
+                retry_guess); records hold the number of attempts made
+      failures  directory of a FailureLog that models still failing after
+                their retries are logged to
+      checkpoints
+                directory of per-model Checkpoint files, saved every
+                checkpoint_every seconds (default 600); a model interrupted
+                in an earlier run resumes from its checkpoint
+      memo_eos  if given, a tolerance at which eos calls are memoized (see
+                memo_eos), shared by all models a worker relaxes; records
+                then hold each model's eos_hit_rate
+      accel     'anderson' or 'secant' to accelerate the outer iterations
+                (see OuterAccelerator); records then hold n_accel
+    """
+    par_list = list(par_list)
+    opts['keys'] = sorted(set.intersection(*[
+        {key for key, val in par.items() if isinstance(val, (int, float))}
+        for par in par_list])) if par_list else []
+    if nworkers is None:
+        nworkers = default_workers()
+    nworkers = max(1, min(nworkers, len(par_list)))
+
+    # Parse eos tables once, here, rather than once in every worker
+    if use_eos_cache:
+        try:
+            prepare_eos_cache(['hhe'])
+            get_z_eos(z_eos) # also builds any ice/rock mixture tables
+        except _EOS_CACHE_ERRORS:
+            pass # workers will fall back to parsing the tables themselves
+
+    timeout, retries = opts.pop('timeout', None), opts.pop('retries', 0)
+    failures = opts.pop('failures', None)
+    flog = FailureLog(failures) if failures else None
+    results = [None]*len(par_list)
+    with SupervisedPool(_sweep_one, nworkers, timeout) as pool:
+        for k, par in enumerate(par_list):
+            pool.submit((k, 0), par, obs, z_eos, opts)
+        for (k, attempt), rec in pool.results():
+            if rec['status'] in _KILLED:
+                rec = dict(par_list[k], cached=False, **rec)
+            if rec['status'] != 'ok' and attempt < retries:
+                guess = retry_guess(par_list[k], attempt + 1, seed=k)
+                pool.submit((k, attempt + 1), par_list[k], obs, z_eos,
+                            dict(opts, guess=guess))
+                continue
+            rec['attempts'] = attempt + 1
+            if extra is not None:
+                rec.update(extra[k])
+            if flog is not None and rec['status'] != 'ok':
+                flog.append(rec)
+            results[k] = rec
+            if callback is not None:
+                callback(rec)
+    return results
+
+###############################################################################
+# Sweeps split over SLURM array tasks (or local processes)
+###############################################################################
+# A parameter table is split into ntasks contiguous chunks. Each task relaxes
+# its chunk (with a process pool over the task's cores) and appends its records
+# to its own shard (a ResultsStore) in the output directory, so tasks never
+# write to the same files; a task restarted after a crash skips the rows
+# already in its shard. merge_shards() combines the shards, sorted by table
+# row, once all tasks are done. run_local() runs the same tasks as local
+# subprocesses, standing in for the scheduler on a single machine.
+def read_param_table(fname):
+    """Read a list of parameter dicts from a JSON list or a text table.
+
+    Text tables (.csv comma-separated, otherwise whitespace-separated) have a
+    header line of parameter names and one model per row.
+    """
+    if fname.endswith('.json'):
+        with open(fname) as f:
+            return json.load(f)
+    tab = np.genfromtxt(fname, names=True, dtype=None, encoding=None,
+                        delimiter=',' if fname.endswith('.csv') else None)
+    tab = np.atleast_1d(tab)
+    return [{name: row[name].item() for name in tab.dtype.names} for row in tab]
+
+def task_rows(nrows, ntasks, task):
+    """Row indices assigned to task number `task` of `ntasks`."""
+    bounds = np.linspace(0, nrows, ntasks + 1).round().astype(int)
+    return range(bounds[task], bounds[task+1])
+
+def shard_name(outdir, task):
+    return os.path.join(outdir, f'shard_{task:05d}')
+
+def run_task(table, task, ntasks, outdir, obs='jupiter', z_eos='ice',
+             nworkers=None, **opts):
+    """Relax one task's share of a parameter table into its shard store.
+
+    opts are passed on to sweep().
+    """
+    par_list = read_param_table(table) if isinstance(table, str) else table
+    shard = ResultsStore(shard_name(outdir, task))
+
+    done = set()
+    if 'row' in shard.columns:
+        done = set(shard.read(['row'])['row'].astype(int).tolist())
+    rows = [k for k in task_rows(len(par_list), ntasks, task) if k not in done]
+    if rows:
+        sweep([par_list[k] for k in rows], obs, z_eos, nworkers=nworkers,
+              callback=shard.append, extra=[{'row': k} for k in rows], **opts)
+    return len(rows)
+
+def merge_shards(outdir, path=None):
+    """Combine all shard stores in outdir into one ResultsStore.
+
+    The merged store (outdir/results by default) is rebuilt from scratch, with
+    rows sorted by table row.
+    """
+    path = path or os.path.join(outdir, 'results')
+    shutil.rmtree(path, ignore_errors=True)
+    merged = ResultsStore(path)
+    for name in sorted(os.listdir(outdir)):
+        if name.startswith('shard_'):
+            shard = ResultsStore(os.path.join(outdir, name))
+            if len(shard):
+                rows = shard.read(['row'])['row']
+                merged.append_store(shard, order=np.argsort(rows, kind='stable'))
+    return merged
+
+def slurm_array_script(table, ntasks, outdir, args='', job_name='l21sweep',
+                       cpus_per_task=1, time='64:00:00', setup=''):
+    """Text of an sbatch script running a table as a SLURM job array.
+
+    Each array task runs `drive_launch.py task` on its own chunk of the table
+    and writes its own shard and log file in outdir; `args` are extra options
+    passed on to it (e.g. '--z-eos 0.5 --cache DIR'). `setup` is inserted
+    before the command (e.g. lines that activate a conda environment).
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    return (
+        "#!/bin/bash\n"
+        f"#SBATCH --job-name={job_name}\n"
+        "#SBATCH --mail-type=FAIL\n"
+        f"#SBATCH --array=0-{ntasks - 1}\n"
+        "#SBATCH --ntasks=1\n"
+        f"#SBATCH --cpus-per-task={cpus_per_task}\n"
+        f"#SBATCH --time={time}\n"
+        f"#SBATCH --output={outdir}/log_%a.log\n\n"
+        f"{setup}\n"
+        f"python {here}/drive_launch.py task {table} {outdir} "
+        f"--ntasks {ntasks} --task $SLURM_ARRAY_TASK_ID "
+        f"--workers $SLURM_CPUS_PER_TASK {args}\n")
+
+def run_local(table, ntasks, outdir, args=()):
+    """Run every task of a table as a local subprocess, then merge the shards.
+
+    This is the single-machine stand-in for a SLURM job array: each
+    subprocess runs `drive_launch.py task` exactly as an array task would.
+    Returns the merged ResultsStore.
+    """
+    import subprocess, sys
+    here = os.path.dirname(os.path.abspath(__file__))
+    os.makedirs(outdir, exist_ok=True)
+    procs = []
+    for task in range(ntasks):
+        cmd = [sys.executable, os.path.join(here, 'drive_launch.py'), 'task',
+               table, outdir, '--ntasks', str(ntasks), '--task', str(task)]
+        with open(os.path.join(outdir, f'log_{task}.log'), 'w') as log:
+            procs.append(subprocess.Popen(cmd + list(args), stdout=log,
+                                          stderr=subprocess.STDOUT))
+    failed = [task for task, proc in enumerate(procs) if proc.wait() != 0]
+    if failed:
+        raise RuntimeError(f"Tasks {failed} failed; see their logs in {outdir}.")
+    return merge_shards(outdir)
+
+###############################################################################
+# Fitting parameters to the observed Js
+###############################################################################
+# fit_Js() adjusts a few model parameters until the model's J2...J<jmax> match
+# the observed ones within their uncertainties, i.e. it drives the residuals
+# r = (J_model - J_obs)/dJ to zero. The Jacobian dr/dx is first estimated by
+# forward differences (one relaxation per parameter, all run in parallel and
+# warm-started from the base model), then kept current with Broyden rank-one
+# updates after each Gauss-Newton step, so that later steps cost one
+# relaxation each. Steps are limited to a trust region, measured in units of
+# the difference steps, that grows after a step reduces |r| and shrinks after
+# one that doesn't; after two failed steps in a row the Jacobian is
+# re-estimated from scratch. Every relaxation is warm-started from the last
+# accepted model.
+def _fit_eval(par, obs, z_eos, warm, run):
+    # Worker: relax par and return its Js and state (never raises).
+    try:
+        t = run(par, obs, z_eos, warm=warm)
+    except Exception as err:
+        return {'status': type(err).__name__, 'error': str(err)}
+    return {'status': 'ok', 'Js': model_Js(t), 'state': model_state(t),
+            'summary': summarize(t)}
+
+def fit_Js(par, names, obs='jupiter', jmax=4, z_eos='ice', run=None,
+           bounds=None, steps=None, tol=1.0, max_relax=20, nworkers=None,
+           verbosity=1):
+    """Adjust parameters `names` of model `par` to fit the observed Js.
+
+    par holds the starting values of names and any other model parameters;
+    run is run_one (default, dual-cavity model) or run_3l. The fit matches
+    J2-J<jmax> to within tol times their uncertainties; obs given by name
+    uses the ToF4 truncation-error uncertainties (see observables), while an
+    observables instance is used as is. bounds maps names to (lo, hi) limits,
+    and steps maps names to finite-difference steps (default 1% of the
+    value, or of the bounds range; taken backward at an upper bound). At most max_relax relaxations are done.
+
+    Returns (par, summary, report): the best parameters found, the
+    summarize() record of their model, and a list with a dict per relaxation
+    (kind 'base', 'fd', or 'step', the parameter values, and |r|, the largest
+    |residual| in units of the uncertainties).
+    """
+    run = run or run_one
+    obs = _tof4_obs(get_obs(obs)) if isinstance(obs, str) else get_obs(obs)
+    names = list(names)
+    dJs = np.asarray(obs.dJs, dtype=float)
+    use = np.isfinite(dJs) & (dJs > 0) & (np.arange(8) >= 1) & \
+          (np.arange(8) <= jmax//2)
+    bounds = bounds or {}
+    lo = np.array([bounds.get(name, (-np.inf, np.inf))[0] for name in names])
+    hi = np.array([bounds.get(name, (-np.inf, np.inf))[1] for name in names])
+    x = np.array([par[name] for name in names], dtype=float)
+    if steps is None:
+        steps = {}
+    h = np.array([steps.get(name, 0.01*(hi[k] - lo[k])
+                            if np.isfinite(hi[k] - lo[k]) else
+                            0.01*abs(x[k]) or 1e-3)
+                  for k, name in enumerate(names)])
+    report = []
+
+    def point(x):
+        return dict(par, **dict(zip(names, x.tolist())))
+
+    def resid(out):
+        return (out['Js'] - obs.Js)[use]/dJs[use]
+
+    def evaluate(pool, xs, kind, warm):
+        for k, x_ in enumerate(xs):
+            pool.submit(k, point(x_), obs, z_eos, warm, run)
+        outs = [None]*len(xs)
+        for k, out in pool.results():
+            outs[k] = out
+        for x_, out in zip(xs, outs):
+            r = resid(out) if out['status'] == 'ok' else None
+            report.append({'kind': kind, **dict(zip(names, x_.tolist())),
+                           'status': out['status'],
+                           'r': float(np.max(np.abs(r))) if r is not None
+                                else np.nan})
+            if verbosity > 0:
+                print(f"fit {kind:4s} " +
+                      ' '.join(f'{n}={v:.6g}' for n, v in zip(names, x_)) +
+                      f"  |r| = {report[-1]['r']:.3g}", flush=True)
+        return outs
+
+    def jacobian(pool, x, best):
+        # forward differences, or backward ones at an upper bound
+        step = np.where(x + h <= hi, h, -h)
+        xs = [np.clip(x + step[k]*np.eye(len(x))[k], lo, hi)
+              for k in range(len(x))]
+        outs = evaluate(pool, xs, 'fd', best['state'])
+        J = np.zeros((use.sum(), len(x)))
+        for k, out in enumerate(outs):
+            if out['status'] != 'ok':
+                raise RuntimeError(f"Relaxation failed ({out['status']}) "
+                                   f"while differentiating along {names[k]}.")
+            J[:,k] = (resid(out) - resid(best))/(xs[k][k] - x[k])
+        return J
+
+    with SupervisedPool(_fit_eval, nworkers or min(len(names),
+                                                    default_workers())) as pool:
+        best = evaluate(pool, [x], 'base', None)[0]
+        if best['status'] != 'ok':
+            raise RuntimeError(f"Starting model failed: {best['status']} "
+                               f"{best.get('error', '')}")
+        r = resid(best)
+        J, fails, radius = None, 0, 10.0
+        while np.max(np.abs(r)) > tol and len(report) < max_relax:
+            if J is None:
+                if len(report) + len(names) > max_relax:
+                    break
+                J = jacobian(pool, x, best)
+            dx = -np.linalg.lstsq(J, r, rcond=None)[0]
+            dx *= min(1.0, radius/np.max(np.abs(dx/h)))
+            x_new = np.clip(x + dx, lo, hi)
+            dx = x_new - x
+            if not np.any(dx):
+                break # pinned against the bounds
+            out = evaluate(pool, [x_new], 'step', best['state'])[0]
+            if out['status'] == 'ok':
+                r_new = resid(out)
+                # Broyden update with whatever step was taken
+                J += np.outer(r_new - r - J @ dx, dx)/(dx @ dx)
+                if np.linalg.norm(r_new) < np.linalg.norm(r):
+                    x, r, best, fails = x_new, r_new, out, 0
+                    radius *= 2
+                    continue
+            fails += 1
+            radius /= 2
+            if fails >= 2:
+                J, fails = None, 0
+    return point(x), best['summary'], report
+
+###############################################################################
+# Benchmarks
+###############################################################################
+# A fixed set of Jupiter and Saturn models relaxed through the usual entry
+# points (run_one, and _main of drive_2l_model.py and drive_3l_model.py) at a
+# few resolutions, to catch performance regressions when krono or this code
+# changes. Each case runs in a freshly spawned interpreter, so its wall time
+# includes the eos setup a real run pays and its peak RSS is its own. The eos
+# objects the entry point gets are wrapped in CountingEOS proxies to count eos
+# calls. A run is a dict with some provenance and a list of case records;
+# runs are appended to a JSON-lines history and compared against a baseline
+# run. Nothing but krono and its eos tables is needed (no network).
+BENCH_CASES = {
+    'jupiter-dual': ('run_one', 'jupiter',
+                     {'z1': 0.0075, 'rio': 0.15, 'roo': 0.8, 'y2_xy': 0.28}),
+    'saturn-dual': ('run_one', 'saturn',
+                    {'z1': 0.135, 'rio': 0.2, 'roo': 0.6, 'y2_xy': 0.4,
+                     'drho_a': -0.13261}),
+    'jupiter-2l': ('drive_2l_model', 'jupiter', ['0.27', '0.02', '0.1']),
+    'saturn-2l': ('drive_2l_model', 'saturn', ['0.2', '0.05', '0.2']),
+    'jupiter-3l': ('drive_3l_model', 'jupiter', ['0.27', '0.02', '0.1']),
+    'saturn-3l': ('drive_3l_model', 'saturn', ['0.2', '0.05', '0.2']),
+}
+
+def _counting_factories(timings):
+    # Stand-ins for get_eos and get_z_eos whose eos objects are counted under
+    # timings. get_z_eos calls get_eos itself, so only the outermost call's
+    # result is wrapped (otherwise each eos call would be counted twice).
+    depth = [0]
+    def counted(factory):
+        def get(spec):
+            depth[0] += 1
+            try:
+                eos = factory(spec)
+            finally:
+                depth[0] -= 1
+            return eos if depth[0] else CountingEOS(eos, timings)
+        return get
+    return counted(get_eos), counted(get_z_eos)
+
+def _bench_case(name, nz):
+    # Spawned worker: relax one benchmark case and return its record.
+    import resource, importlib
+    entry, planet, args = BENCH_CASES[name]
+    rec = {'case': name, 'nz': nz}
+    timings = Timings()
+    tic = timer()
+    try:
+        if entry == 'run_one':
+            t = run_one(dict(args, nz=nz), planet, timings=timings)
+        else:
+            # The driver gets its eos objects from get_eos and get_z_eos
+            global get_eos, get_z_eos
+            _get_eos, _get_z_eos = get_eos, get_z_eos
+            get_eos, get_z_eos = _counting_factories(timings)
+            try:
+                here = os.path.dirname(os.path.abspath(__file__))
+                if here not in sys.path:
+                    sys.path.insert(0, here)
+                drv = importlib.import_module(entry)
+                sys.argv = [f'{entry}.py', planet] + args + [
+                        '--nzones', str(nz), '-v', '0']
+                t, _ = drv._main(drv._PCL())
+            finally:
+                get_eos, get_z_eos = _get_eos, _get_z_eos
+        rec.update(summarize(t))
+        rec['status'] = 'ok'
+    except Exception as err:
+        rec['status'] = type(err).__name__
+        rec['error'] = str(err)
+    rec['walltime'] = timer() - tic
+    phases = timings.summary()
+    rec['n_eos'], rec['t_eos'] = phases['n_eos'], phases['t_eos']
+    rec['maxrss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+    return rec
+
+def _git_commit():
+    # This repo's current commit, if it is a git checkout.
+    import subprocess
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+def run_benchmarks(cases=None, nz=(1024, 4096), repeat=1, verbosity=1):
+    """Relax benchmark cases (all of BENCH_CASES by default) at each nz.
+
+    Cases run one at a time, each in a fresh interpreter; with repeat > 1 the
+    fastest of the repeats is kept. Returns the run: a dict of provenance
+    (time, host, commit, krono version) and a list of case records holding
+    walltime, niter, n_eos, t_eos, maxrss_mb, J2-J14, and status.
+    """
+    import datetime
+    run = {'time': datetime.datetime.now().isoformat(timespec='seconds'),
+           'host': platform.node(), 'python': platform.python_version(),
+           'commit': _git_commit(), 'krono': krono_version(), 'cases': []}
+    ctx = mp.get_context('spawn')
+    for name in cases or BENCH_CASES:
+        for nz_ in nz:
+            best = None
+            for _ in range(repeat):
+                with cf.ProcessPoolExecutor(1, mp_context=ctx) as pool:
+                    rec = pool.submit(_bench_case, name, nz_).result()
+                if best is None or rec['walltime'] < best['walltime']:
+                    best = rec
+            run['cases'].append(best)
+            if verbosity > 0:
+                print(f"{name:14s} nz={nz_:<6d} {best['status']:12s} "
+                      f"{best['walltime']:8.2f} s  niter={best.get('niter', -1)}"
+                      f"  eos calls={best['n_eos']}  "
+                      f"rss={best['maxrss_mb']:.0f} MB", flush=True)
+    return run
+
+def compare_bench(run, baseline, tol=0.2):
+    """Flag slowdowns of benchmark `run` relative to a `baseline` run.
+
+    A case regresses if its wall time, outer iterations, or eos calls grew by
+    more than the fraction tol, or if it failed where the baseline didn't. A
+    case without an outer iteration count (in either run) counts as failed.
+    Returns a list of (case, nz, quantity, baseline value, new value).
+    """
+    base = {(rec['case'], rec['nz']): rec for rec in baseline['cases']}
+    flagged = []
+    for rec in run['cases']:
+        old = base.get((rec['case'], rec['nz']))
+        if old is None:
+            continue
+        if rec['status'] != 'ok':
+            if old['status'] == 'ok':
+                flagged.append((rec['case'], rec['nz'], 'status',
+                                old['status'], rec['status']))
+            continue
+        if min(old.get('niter', -1), rec.get('niter', -1)) < 0:
+            flagged.append((rec['case'], rec['nz'], 'niter',
+                            old.get('niter', -1), rec.get('niter', -1)))
+            continue
+        for qty in ('walltime', 'niter', 'n_eos'):
+            if (old.get(qty, 0) > 0 and
+                rec.get(qty, 0) > (1 + tol)*old[qty]):
+                flagged.append((rec['case'], rec['nz'], qty, old[qty],
+                                rec[qty]))
+    return flagged
+
+###############################################################################
+# Surrogate emulator of sweep results
+###############################################################################
+# A Gaussian-process regressor (squared-exponential kernel with one length
+# scale per parameter, shared by all outputs) trained on stored sweep results.
+# It predicts J2, J4, J6, and ymean for new parameter vectors in microseconds,
+# with a 1-sigma predictive uncertainty, so it can screen sampler proposals
+# before any are sent to the real solver (see run_mcmc's surrogate option).
+# Hyperparameters are chosen by maximizing the marginal likelihood with a
+# coordinate search over a log grid, which only needs numpy.
+class Surrogate:
+    """Gaussian-process emulator of model outputs as functions of parameters."""
+
+    def __init__(self, names, outputs=('J2', 'J4', 'J6', 'ymean')):
+        self.names = list(names)
+        self.outputs = list(outputs)
+
+    def _X(self, X):
+        # (N, ndim) array of normalized inputs from dicts or an array.
+        if isinstance(X, dict):
+            X = [X]
+        if len(X) and isinstance(X[0], dict):
+            X = [[par[name] for name in self.names] for par in X]
+        return (np.atleast_2d(np.asarray(X, dtype=float)) - self.xlo)/self.xscale
+
+    def _kernel(self, A, B, ell):
+        d2 = (((A[:,None,:] - B[None,:,:])/ell)**2).sum(axis=-1)
+        return np.exp(-0.5*d2)
+
+    def _lml(self, ell, noise):
+        # Log marginal likelihood summed over the (standardized) outputs.
+        K = self._kernel(self.X, self.X, ell) + noise*np.eye(len(self.X))
+        try:
+            L = np.linalg.cholesky(K)
+        except np.linalg.LinAlgError:
+            return -np.inf
+        alpha = np.linalg.solve(L, self.Y)
+        return (-0.5*np.sum(alpha**2) -
+                self.Y.shape[1]*np.sum(np.log(np.diag(L))))
+
+    def fit(self, results, max_points=2000, seed=None):
+        """Train on converged models in `results` (anything as_columns takes).
+
+        At most max_points randomly chosen models are used.
+        """
+        cols = as_columns(results)
+        X = np.column_stack([cols[name] for name in self.names]).astype(float)
+        Y = np.column_stack([cols[out] for out in self.outputs]).astype(float)
+        ok = np.all(np.isfinite(X), axis=1) & np.all(np.isfinite(Y), axis=1)
+        if 'status' in cols:
+            ok &= cols['status'] == 'ok'
+        X, Y = X[ok], Y[ok]
+        if len(X) > max_points:
+            keep = np.random.default_rng(seed).choice(len(X), max_points,
+                                                      replace=False)
+            X, Y = X[keep], Y[keep]
+        if len(X) < 2:
+            raise ValueError("Need at least two converged models to train on.")
+
+        self.xlo = X.min(axis=0)
+        self.xscale = np.where(np.ptp(X, axis=0) > 0, np.ptp(X, axis=0), 1.0)
+        self.ymean = Y.mean(axis=0)
+        self.ystd = Y.std(axis=0)
+        self.yscale = np.where(self.ystd > 0, self.ystd, 1.0) # guarded
+        self.X = (X - self.xlo)/self.xscale
+        self.Y = (Y - self.ymean)/self.yscale
+
+        # Coordinate search for length scales and noise
+        grid = np.logspace(-1.5, 1, 11)
+        ell = np.full(len(self.names), 0.3)
+        noise = 1e-6
+        best = self._lml(ell, noise)
+        for sweep_ in range(2):
+            for k in range(len(ell)):
+                for val in grid:
+                    trial = ell.copy()
+                    trial[k] = val
+                    lml = self._lml(trial, noise)
+                    if lml > best:
+                        best, ell = lml, trial
+            for val in (1e-8, 1e-6, 1e-4, 1e-2):
+                lml = self._lml(ell, val)
+                if lml > best:
+                    best, noise = lml, val
+        self.ell, self.noise, self.lml = ell, noise, best
+
+        K = self._kernel(self.X, self.X, ell) + noise*np.eye(len(self.X))
+        self._L = np.linalg.cholesky(K)
+        self._alpha = np.linalg.solve(self._L.T, np.linalg.solve(self._L, self.Y))
+        return self
+
+    def predict(self, X):
+        """Predicted outputs and their 1-sigma uncertainties.
+
+        X is a parameter dict, a list of dicts, or an (N, ndim) array with
+        columns in the order of self.names. Returns (mean, sd), each of shape
+        (N, len(self.outputs)).
+        """
+        Xn = self._X(X)
+        Ks = self._kernel(Xn, self.X, self.ell)
+        mean = Ks @ self._alpha
+        v = np.linalg.solve(self._L, Ks.T)
+        var = np.clip(1 + self.noise - np.sum(v**2, axis=0), 0, None)
+        sd = np.sqrt(var)[:,None]*self.ystd # none for a constant output
+        return mean*self.yscale + self.ymean, sd
+
+    def loglike(self, X, obs, jmax=6):
+        """Gaussian J log-likelihood of predicted models, with the surrogate's
+        uncertainty added to obs's J uncertainties."""
+        mean, sd = self.predict(X)
+        lnl = np.zeros(len(mean))
+        for k, out in enumerate(self.outputs):
+            if out[0] != 'J' or int(out[1:]) > jmax:
+                continue
+            n = int(out[1:])
+            var = obs.dJs[n//2]**2 + sd[:,k]**2
+            if not np.isfinite(obs.dJs[n//2]):
+                continue
+            lnl -= 0.5*((mean[:,k] - obs.Js[n//2])**2/var +
+                        np.log(2*np.pi*var))
+        return lnl
+
+###############################################################################
+# Ensemble MCMC over the three-layer model
+###############################################################################
+# An affine-invariant ensemble sampler (Goodman & Weare 2010 stretch move, with
+# the ensemble split in two halves as in emcee) whose walker log-probabilities
+# are evaluated in parallel, one relaxation per worker process. The chain is
+# checkpointed to an .npz file so that a resubmitted job continues where the
+# previous one stopped.
+def default_bounds(obs):
+    """Uniform-prior bounds of the three-layer model's sampled parameters."""
+    return {
+        'y1': (0.1, 0.3),
+        'z1': (0.0, 0.1),
+        'z2': (0.0, 0.5),
+        'rt': (0.5, 0.95),
+        'drho_a': (-0.2, 0.0),
+        'drho_c': (9.0, 12.0),
+        'drho_w': (0.1, 2.0),
+        'm': (obs.m - 3*obs.dm, obs.m + 3*obs.dm),
+    }
+
+def _mcmc_lnp(theta, names, bounds, fixed, obs, z_eos, jmax, store):
+    # Worker: log-probability (uniform prior times J likelihood) of theta and
+    # the model's result record (None if theta is outside the prior).
+    lo, hi = bounds
+    if np.any(theta < lo) or np.any(theta > hi):
+        return -np.inf, None
+    par = dict(fixed)
+    par.update(zip(names, theta.tolist()))
+    rec = dict(zip(names, theta.tolist()))
+    mstore = _open_store(store, names, obs, 'threeLayerModel') if store else None
+    try:
+        t = run_3l(par, obs, z_eos,
+                   warm=mstore.nearest(par) if mstore else None)
+    except Exception as err:
+        rec['status'] = type(err).__name__
+        return -np.inf, rec
+    if mstore is not None:
+        mstore.add(par, t)
+    rec.update(summarize(t))
+    rec['status'] = 'ok'
+    rec['lnp'] = float(obs.J_loglike(model_Js(t), jmax=jmax))
+    return rec['lnp'], rec
+
+def _save_chain(fname, chain, lnp, rng, nevals, walltime):
+    # Atomically write the chain checkpoint.
+    tmp = f'{fname}.tmp-{os.getpid()}.npz'
+    np.savez(tmp, chain=chain, lnp=lnp, nevals=nevals, walltime=walltime,
+             rng=json.dumps(rng.bit_generator.state))
+    os.replace(tmp, fname)
+
+def run_mcmc(names, bounds, nwalkers, nsteps, obs='jupiter', fixed=None,
+             jmax=6, checkpoint=None, every=1, nworkers=None, store=None,
+             seed=None, a=2.0, verbosity=1, results=None, surrogate=None,
+             z_eos='ice'):
+    """Sample the three-layer model parameters `names` with an ensemble MCMC.
+
+    bounds maps each name to its (lo, hi) uniform prior. fixed holds any other
+    three_layer_params entries (e.g. nz), and z_eos is as for run_3l. The
+    likelihood is obs.J_loglike on J2-J<jmax>. If `checkpoint` names an
+    existing file the chain is resumed from it, and it is rewritten every
+    `every` steps; the run stops once the chain has `nsteps` steps. If
+    `store` is a directory, relaxations are warm-started from the nearest
+    converged model there. If `results` is a directory, every relaxed model
+    is appended to a ResultsStore there (e.g. to train a Surrogate on later).
+
+    If a trained Surrogate (over `names`) is given, proposals are screened
+    with it first (two-stage delayed acceptance, Christen & Fox 2005): only
+    proposals accepted under the surrogate's likelihood are relaxed, and the
+    second stage corrects for the surrogate's error, so the chain still
+    samples the true posterior.
+
+    Returns (chain, lnp, throughput) with chain of shape
+    (nsteps, nwalkers, ndim), lnp of shape (nsteps, nwalkers), and throughput
+    in models/hour.
+    """
+    obs = get_obs(obs)
+    names = list(names)
+    ndim = len(names)
+    lo = np.array([bounds[name][0] for name in names], dtype=float)
+    hi = np.array([bounds[name][1] for name in names], dtype=float)
+    fixed = dict(fixed or {})
+    if nwalkers < 2*ndim or nwalkers % 2:
+        raise ValueError("nwalkers must be even and at least 2*ndim.")
+    if nworkers is None:
+        nworkers = default_workers()
+
+    rng = np.random.default_rng(seed)
+    if checkpoint and os.path.isfile(checkpoint):
+        with np.load(checkpoint) as npz:
+            chain = list(npz['chain'])
+            lnps = list(npz['lnp'])
+            nevals = int(npz['nevals'])
+            walltime = float(npz['walltime'])
+            rng.bit_generator.state = json.loads(str(npz['rng']))
+        if chain[0].shape != (nwalkers, ndim):
+            raise ValueError(f"Checkpoint {checkpoint} has a different ensemble.")
+    else:
+        chain, lnps, nevals, walltime = [], [], 0, 0.0
+
+    rstore = ResultsStore(results) if results else None
+    def evaluate(pool, thetas):
+        args = (names, (lo, hi), fixed, obs, z_eos, jmax, store)
+        out = list(pool.map(_mcmc_lnp, thetas,
+                            *[itertools.repeat(arg) for arg in args]))
+        recs = [rec for _, rec in out if rec is not None]
+        if rstore is not None and recs:
+            rstore.append(recs)
+        return np.array([lnp for lnp, _ in out])
+
+    def surrogate_lnp(thetas):
+        inside = np.all((thetas >= lo) & (thetas <= hi), axis=1)
+        return np.where(inside, surrogate.loglike(thetas, obs, jmax), -np.inf)
+
+    tic = timer()
+    t0 = walltime
+    nscreened = 0
+    with cf.ProcessPoolExecutor(max_workers=nworkers) as pool:
+        if chain:
+            X, lnp = chain[-1].copy(), lnps[-1].copy()
+        else:
+            X = lo + (hi - lo)*rng.random((nwalkers, ndim))
+            lnp = evaluate(pool, X)
+            nevals += nwalkers
+        half = nwalkers//2
+        while len(chain) < nsteps:
+            for S, C in ((slice(0, half), slice(half, None)),
+                         (slice(half, None), slice(0, half))):
+                z = ((a - 1)*rng.random(half) + 1)**2/a
+                partners = X[C][rng.integers(0, half, half)]
+                Y = partners + z[:,None]*(X[S] - partners)
+                lnq = (ndim - 1)*np.log(z)
+                if surrogate is None:
+                    screen = np.ones(half, dtype=bool)
+                    dsur = 0.0
+                else:
+                    dsur = surrogate_lnp(Y) - surrogate_lnp(X[S])
+                    with np.errstate(invalid='ignore'):
+                        screen = np.log(rng.random(half)) < lnq + dsur
+                    lnq = 0.0 # the proposal term was used in the first stage
+                lnpY = np.full(half, -np.inf)
+                if screen.any():
+                    lnpY[screen] = evaluate(pool, Y[screen])
+                    nevals += screen.sum()
+                nscreened += half - screen.sum()
+                with np.errstate(invalid='ignore'):
+                    lnr = lnq + lnpY - lnp[S] - dsur
+                accept = screen & (np.log(rng.random(half)) < lnr)
+                X[S][accept] = Y[accept]
+                lnp[S][accept] = lnpY[accept]
+            chain.append(X.copy())
+            lnps.append(lnp.copy())
+            walltime = t0 + timer() - tic
+            if checkpoint and (len(chain) % every == 0 or len(chain) == nsteps):
+                _save_chain(checkpoint, np.array(chain), np.array(lnps), rng,
+                            nevals, walltime)
+            if verbosity > 0:
+                print(f"step {len(chain)}/{nsteps}: "
+                      f"max lnp = {np.max(lnp):.4g}, "
+                      f"{3600*nevals/walltime:.1f} models/hour" +
+                      (f", {nscreened} proposals screened out"
+                       if surrogate is not None else ""), flush=True)
+
+    throughput = 3600*nevals/walltime if walltime > 0 else np.nan
+    return np.array(chain), np.array(lnps), throughput
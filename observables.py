@@ -41,224 +41,342 @@ The returned struct has the following fields:
                           always length 8, starting with J0 (always = -1) for
                           various reasons.
 
+Planet classes also have methods to score models against the observed gravity
+in batches: obs.J_mahalanobis(Js) and obs.J_loglike(Js) take a length-8 vector
+or an (N, 8) array of model Js (same layout as obs.Js) and return one value per
+model, skipping harmonics with infinite uncertainty. Both accept an optional
+full covariance matrix and <Jn>_sig relative-uncertainty overrides. For Monte
+Carlo propagation, obs.draw(N) returns N perturbed observation vectors (mass,
+Js, and rotation period with the m and q that follow from them) as arrays.
+
+The values themselves live in the data file planets.json (or a YAML file of the
+same layout, if PyYAML is installed), together with named overlays that modify
+them, e.g. 'tof4' or 'winds'. The file is loaded into observables.catalog, and
+catalog.get(name, *overlays, **changes) returns a frozen Observables record
+with the fields above, applying the overlays in order:
+
+    obs = observables.catalog.get('saturn', 'winds', dP=300)
+
+The classes above (Jupiter, Saturn_winds, ...) are built from the same catalog
+and remain the usual way to get the standard variants.
+
 Important note about uncertainties: the d<x> quantities defined in the module
 use reference values whose exact meaning may vary and may depend on context. It
 is the user's job to decide if that value should be a 1-sigma, 2-sigma, or
 uniform error bars, for example.
 """
 
+import os
+import re
+import json
 import numpy as np
 
 G = 6.67430e-11         # http://physics.nist.gov/cuu/index.html
 
-class Jupiter:
-    pname = 'jupiter'
-
-    # Mass and radius, https://ssd.jpl.nasa.gov/ (2018)
-    M  = 1898.187e24
-    dM = 0.088e24
-    a0 = 71492e3
-    s0 = 69911e3
-
-    # Boundary conditions
-    P0 = 1e5            # The reference radius is the 1 bar level
-    T0 = 165; dT0 = 5   # Lindal, G.F., 1992. Astrophys. J. 103, 967–982.
-    rho0 = 0.169        # Protosolar ideal gas (mmw=2.319 amu) at (P0,T0)
-    drho0 = 0.0051      # half the range of T0+/-dT0
-    rhomax = 30000      # A guess, ANEOS serpentine at 50 Mbar is ~15000
-
-    # Nominal rotation rate, https://ssd.jpl.nasa.gov/ (2018)
-    P = 0.41354*24*3600
+CATALOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'planets.json')
+
+# Scalar fields stored for each planet (NaN where a planet has no value), and
+# the rotation and density fields derived from them.
+_FIELDS = ('M', 'dM', 'a0', 's0', 'P0', 'T0', 'dT0', 'rho0', 'drho0', 'rhomax',
+           'P', 'dP', 'NMoI', 'dNMoI', 'cfac')
+_DERIVED = ('w', 'GM', 'q', 'm', 'dw', 'dq', 'dm', 'rhobar')
+_JKEY = re.compile(r'(d?)J(\d+)(_sig)?')
+
+class Planet:
+    """Common methods of the planet observables classes."""
+    __slots__ = ()
+
+    def J_sigmas(self, **sigs):
+        """Vector of J uncertainties like dJs, with optional <Jn>_sig overrides.
+
+        For example, J_sigmas(J4_sig=1e-3) sets the J4 uncertainty to 1e-3*|J4|.
+        """
+        dJs = np.array(self.dJs, dtype=float)
+        for n in range(2, 16, 2):
+            sig = sigs.get(f'J{n}_sig')
+            if sig is not None:
+                dJs[n//2] = abs(sig*self.Js[n//2])
+        return dJs
+
+    def _J_residuals(self, Js, cov, jmax, sigs):
+        # Residuals and covariance restricted to the usable harmonics.
+        Js = np.atleast_2d(np.asarray(Js, dtype=float))
+        if Js.shape[-1] != 8:
+            raise ValueError("Js must be a length-8 vector or (N, 8) array.")
+        if cov is None:
+            sd = self.J_sigmas(**sigs)
+        else:
+            cov = np.asarray(cov, dtype=float)
+            sd = np.sqrt(np.diag(cov))
+        use = np.isfinite(sd) & (sd > 0) & (np.arange(8) <= jmax//2)
+        res = Js[:,use] - self.Js[use]
+        if cov is None:
+            return res, sd[use]
+        return res, cov[np.ix_(use, use)]
+
+    def J_mahalanobis(self, Js, cov=None, jmax=14, **sigs):
+        """Mahalanobis distance of model Js from the observed Js.
+
+        Js is a length-8 vector or an (N, 8) array laid out like obs.Js. Only
+        J2-J<jmax> with finite, nonzero uncertainty are used. The uncertainties
+        are obs.dJs (with any <Jn>_sig overrides), unless a full 8x8 covariance
+        matrix `cov` in the same layout is given. Returns an array of N
+        distances (a scalar for a single vector).
+        """
+        res, sd = self._J_residuals(Js, cov, jmax, sigs)
+        if sd.ndim == 1:
+            d2 = np.sum((res/sd)**2, axis=1)
+        else:
+            L = np.linalg.cholesky(sd)
+            d2 = np.sum(np.linalg.solve(L, res.T)**2, axis=0)
+        d = np.sqrt(d2)
+        return d if np.ndim(Js) > 1 else d[0]
+
+    def J_loglike(self, Js, cov=None, jmax=14, **sigs):
+        """Gaussian log-likelihood of model Js; arguments as in J_mahalanobis."""
+        res, sd = self._J_residuals(Js, cov, jmax, sigs)
+        if sd.ndim == 1:
+            d2 = np.sum((res/sd)**2, axis=1)
+            logdet = 2*np.sum(np.log(sd))
+        else:
+            L = np.linalg.cholesky(sd)
+            d2 = np.sum(np.linalg.solve(L, res.T)**2, axis=0)
+            logdet = 2*np.sum(np.log(np.diag(L)))
+        lnl = -0.5*(d2 + logdet + res.shape[1]*np.log(2*np.pi))
+        return lnl if np.ndim(Js) > 1 else lnl[0]
+
+    def draw(self, n, seed=None, jmax=14, rotation=True):
+        """Draw n perturbed observation vectors for Monte Carlo propagation.
+
+        M, J2-J<jmax>, and (if rotation) P are drawn from independent normal
+        distributions with the dM, dJs, and dP uncertainties; harmonics with
+        infinite or NaN uncertainty keep their nominal values. Returns a dict
+        of arrays: 'M' (n,), 'Js' (n, 8) laid out like obs.Js, and 'P', 'w',
+        'q', 'm' (n,) with q and m computed from each drawn P and M.
+        """
+        rng = np.random.default_rng(seed)
+        M = self.M + self.dM*rng.standard_normal(n)
+        dJs = np.asarray(self.dJs, dtype=float)
+        sd = np.where(np.isfinite(dJs) & (np.arange(8) <= jmax//2), dJs, 0.0)
+        Js = self.Js + sd*rng.standard_normal((n, 8))
+        out = {'M': M, 'Js': Js}
+        if rotation:
+            P = self.P + self.dP*rng.standard_normal(n)
+            w = 2*np.pi/P
+            out.update(P=P, w=w, q=w**2*self.a0**3/(G*M),
+                       m=w**2*self.s0**3/(G*M))
+        return out
+
+def _derive(fields):
+    # Rotation parameters and mean density that follow from the stored values.
+    M, a0, s0, P, dP = (fields[key] for key in ('M', 'a0', 's0', 'P', 'dP'))
     w = 2*np.pi/P
     GM = G*M
-    q = w**2*a0**3/GM
-    m = w**2*s0**3/GM
-
-    # Sometimes we use an estimate of roation period uncertainty
-    dP = 30e-3 # Conservative! See e.g. Higgins et al. 1996
     dw = 2*np.pi/P**2*dP
-    dq = 2*w*a0**3/GM*dw
-    dm = 2*w*s0**3/GM*dw
-
-    # Some methods (e.g. priors.py) use these fiducial values for scale...
-    rhobar = M/(4*np.pi/3*s0**3)
-
-    ## Gravity
-    # Nominal coefficients from Iess et al. (2018) Table 1
-    cfac = 71492e3/a0 # Iess et al. ref. radius converted to our equatorial radius
-    J2  = 14696.572e-6*cfac**2
-    J4  =  -586.609e-6*cfac**4
-    J6  =    34.198e-6*cfac**6
-    J8  =    -2.426e-6*cfac**8
-    J10 =     0.172e-6*cfac**10
-    J12 =     0.000e-6*cfac**12
-    J14 =     0.000e-6*cfac**14
-
-    # Formal uncertainties from Juno (we don't often use those)
-    dJ2  = 0.014e-6*cfac**2
-    dJ4  = 0.004e-6*cfac**4
-    dJ6  = 0.009e-6*cfac**6
-    dJ8  = 0.025e-6*cfac**8
-    dJ10 = 0.069e-6*cfac**10
-    dJ12 = np.inf
-    dJ14 = np.inf
-
-    # It is occasionally convenient to collect the Js and dJs in vectors.
-    Js = np.array((-1, J2, J4, J6, J8, J10, J12, J14))
-    dJs = np.array((0, dJ2, dJ4, dJ6, dJ8, dJ10, dJ12, dJ14))
-
-    # A moment of inertia nominal value (not a real observation)
-    NMoI = 0.2635
-    dNMoI = 0.0005
-
-class Jupiter_tof4(Jupiter):
-    """Modify gravity uncertainties to tof4 truncation error."""
-    dJ2  = 1e-4*np.abs(Jupiter.J2)
-    dJ4  = 3e-3*np.abs(Jupiter.J4)
-    dJ6  = 3e-2*np.abs(Jupiter.J6)
-    dJ8  = 3e-1*np.abs(Jupiter.J8)
-    dJ10 = np.inf
-    dJ12 = np.inf
-    dJ14 = np.inf
-    dJs = np.array((0, dJ2, dJ4, dJ6, dJ8, dJ10, dJ12, dJ14))
-
-class Saturn:
-    pname = 'saturn'
-
-    # Mass and radius, https://ssd.jpl.nasa.gov/ (2018)
-    M  = 568.336e24
-    dM = 0.026e24
-    a0 = 60268e3
-    s0 = 58232e3
-
-    # Boundary conditions
-    P0 = 1e5            # The reference radius is the 1 bar level
-    T0 = 140; dT0 = 4   # Nettelmann et al. (2013), Icarus 225, 548-557.
-    rho0 = 0.199        # Protosolar ideal gas (mmw=2.319 amu) at (P0,T0)
-    drho0 = 0.0057      # half the range of T0+/-dT0
-    rhomax = 20000      # A guess, ANEOS serpentine at 50 Mbar is ~15000
-
-    # Nominal rotation rate, Mankovich (2019) rounded to the minute
-    P = 38040 # 10 hours 34 minutes
-    w = 2*np.pi/P
-    GM = G*M
-    q = w**2*a0**3/GM
-    m = w**2*s0**3/GM
-
-    # Sometimes we use an estimate of roation period uncertainty
-    dP = 120 # A 2-sigma ~= 2-minute spread of modern estimates
-    dw = 2*np.pi/P**2*dP
-    dq = 2*w*a0**3/GM*dw
-    dm = 2*w*s0**3/GM*dw
-
-    # Some methods (e.g. priors.py) use these fiducial values for scale...
-    rhobar = M/(4*np.pi/3*s0**3)
-
-    ## Gravity
-    # Nominal coefficients from Iess et al. (2019)
-    cfac = 60330e3/a0 # Iess et al. ref. radius converted to our equatorial radius
-    J2  = +16290.573e-6*cfac**2
-    J4  =   -935.314e-6*cfac**4
-    J6  =    +86.340e-6*cfac**6
-    J8  =    -14.624e-6*cfac**8
-    J10 =     +4.672e-6*cfac**10
-    J12 =     -0.000e-6*cfac**12
-    J14 =     +0.000e-6*cfac**14
-
-    # Formal uncertainties from Cassini (we don't often use those)
-    dJ2  = 0.028e-6*cfac**2
-    dJ4  = 0.037e-6*cfac**4
-    dJ6  = 0.087e-6*cfac**6
-    dJ8  = 0.205e-6*cfac**8
-    dJ10 = 0.420e-6*cfac**10
-    dJ12 = np.inf
-    dJ14 = np.inf
-
-    # It is occasionally convenient to collect the Js and dJs in vectors.
-    Js = np.array((-1, J2, J4, J6, J8, J10, J12, J14))
-    dJs = np.array((0, dJ2, dJ4, dJ6, dJ8, dJ10, dJ12, dJ14))
-
-class Saturn_tof4(Saturn):
-    """Modify gravity uncertainties to tof4 truncation error."""
-    dJ2  = 1e-4*np.abs(Saturn.J2)
-    dJ4  = 3e-3*np.abs(Saturn.J4)
-    dJ6  = 3e-2*np.abs(Saturn.J6)
-    dJ8  = 3e-1*np.abs(Saturn.J8)
-    dJ10 = np.inf
-    dJ12 = np.inf
-    dJ14 = np.inf
-    dJs = np.array((0, dJ2, dJ4, dJ6, dJ8, dJ10, dJ12, dJ14))
-
-class Saturn_winds(Saturn):
-    """Gravity uncertainties reflecting potential deep wind contribution.
-
-    See fig. 4 in Galanti, E., & Kaspi, Y. (2017). The Astrophysical Journal,
-    843(2), L25.
+    return dict(w=w, GM=GM, q=w**2*a0**3/GM, m=w**2*s0**3/GM, dw=dw,
+                dq=2*w*a0**3/GM*dw, dm=2*w*s0**3/GM*dw,
+                rhobar=M/(4*np.pi/3*s0**3))
+
+def _apply_overlay(fields, Js, dJs, spec):
+    # Modify fields, Js, and dJs in place according to one overlay dict.
+    for key in ('J', 'dJ', 'dJ_rel'):
+        vals = spec.get(key)
+        if vals is None:
+            continue
+        if len(vals) != 7:
+            raise ValueError(f"Overlay {key} must list 7 values (J2...J14).")
+        for k, val in enumerate(vals, 1):
+            if val is None:
+                continue
+            if key == 'J':
+                Js[k] = val
+            elif key == 'dJ':
+                dJs[k] = val
+            else:
+                dJs[k] = val*abs(Js[k]) if np.isfinite(val) else val
+    for key, val in spec.items():
+        if key in ('J', 'dJ', 'dJ_rel', 'notes') or val is None:
+            continue
+        match = _JKEY.fullmatch(key)
+        if key in _FIELDS:
+            fields[key] = float(val)
+        elif key == 'M_sig':
+            fields['dM'] = val*fields['M']
+        elif match and int(match[2]) in range(2, 16, 2):
+            k = int(match[2])//2
+            if match[3] and not match[1]:
+                dJs[k] = abs(val*Js[k])
+            elif not match[3]:
+                (dJs if match[1] else Js)[k] = val
+            else:
+                raise ValueError(f"Unknown overlay key {key}.")
+        else:
+            raise ValueError(f"Unknown overlay key {key}.")
+
+class Observables(Planet):
+    """Frozen observables of one planet, as returned by Catalog.get.
+
+    Has the fields described in the module docstring plus `variant`, the
+    overlays applied to the catalog values. Use replace() for a modified copy.
+    """
+    __slots__ = ('pname', 'variant', 'Js', 'dJs') + _FIELDS + _DERIVED
+
+    def __init__(self, fields):
+        fields = dict(fields)
+        fields.update(_derive(fields))
+        for key in ('Js', 'dJs'):
+            vec = np.array(fields[key], dtype=float)
+            vec.flags.writeable = False
+            fields[key] = vec
+        for key in self.__slots__:
+            object.__setattr__(self, key, fields.get(key, np.nan))
+
+    def __getattr__(self, name):
+        # J<n> and dJ<n> are views of the Js and dJs vectors.
+        match = _JKEY.fullmatch(name)
+        if match and not match[3] and int(match[2]) in range(2, 16, 2):
+            vec = self.dJs if match[1] else self.Js
+            return float(vec[int(match[2])//2])
+        raise AttributeError(
+            f"'Observables' object has no attribute '{name}'")
+
+    def __setattr__(self, name, val):
+        raise AttributeError("Observables records are frozen; use replace().")
+
+    def __delattr__(self, name):
+        raise AttributeError("Observables records are frozen.")
+
+    def __reduce__(self):
+        return (Observables, (self.asdict(),))
+
+    def __repr__(self):
+        variant = f"+{self.variant}" if self.variant else ''
+        return f"<Observables {self.pname}{variant}>"
+
+    def asdict(self):
+        """The stored fields (derived ones are recomputed on construction)."""
+        out = {key: getattr(self, key) for key in
+               ('pname', 'variant') + _FIELDS}
+        out['Js'] = np.array(self.Js)
+        out['dJs'] = np.array(self.dJs)
+        return out
+
+    def replace(self, **changes):
+        """A copy with changes applied like an overlay (e.g. dP=300, J4_sig=1e-3)."""
+        fields = self.asdict()
+        _apply_overlay(fields, fields['Js'], fields['dJs'], changes)
+        return Observables(fields)
+
+class Catalog:
+    """Observables of several planets loaded from a JSON or YAML data file.
+
+    The scalar fields of all planets are held in one structured array,
+    catalog.table (one row per planet, in catalog.names order), and the Js
+    and dJs in (nplanets, 8) arrays, so they can be used for all planets at
+    once. Overlays are dicts that modify a planet's values when a record is
+    made; a key may be any scalar field (e.g. 'dP'), 'J', 'dJ' (absolute
+    values), or 'dJ_rel' (relative to |J|) as lists of J2...J14 where null
+    keeps the value, or a J<n>, dJ<n>, <Jn>_sig, or M_sig override. Named
+    overlays are defined in the data file, globally or per planet.
     """
-    dJ2  = 15e-6 # I interpret Galanti+2017 (fig. 4) as 2-sigma=3e-5
-    dJ4  = 5e-6  # Represents *generous* ToF model error + deep winds
-    dJ6  = 5e-6  # Represents *generous* ToF model error + deep winds
-    dJ8  = np.inf
-    dJ10 = np.inf
-    dJ12 = np.inf
-    dJ14 = np.inf
-    dJs = np.array((0, dJ2, dJ4, dJ6, dJ8, dJ10, dJ12, dJ14))
-
-class Uranus:
-    pname = 'uranus'
-
-    # Mass and radius, https://ssd.jpl.nasa.gov/ (2018)
-    M = 86.8127e24
-    dM = 0.004e24
-    a0 = 25559e3
-    s0 = 25362e3
-
-    # Boundary conditions
-    P0 = 1e5            # The reference radius is the 1 bar level
-    T0 = 76; dT0 = 2    # Lindal, G.F., 1992. Astrophys. J. 103, 967–982.
-    rho0 = 0.367        # Protosolar ideal gas (mmw=2.319 amu) at (P0,T0)
-    drho0 = 0.0097      # half the range of T0+/-dT0
-    rhomax = 20000      # Generous guess
-
-    # Nominal rotation rate, https://ssd.jpl.nasa.gov/ (2018)
-    P = 0.71833*24*3600
-    w = 2*np.pi/P
-    GM = G*M
-    q = w**2*a0**3/GM
-    m = w**2*s0**3/GM
 
-    # Sometimes we use an estimate of roation period uncertainty
-    dP = 600 # Basically a wild guess, see e.g. Podolak and Helled 2012
-    dw = 2*np.pi/P**2*dP
-    dq = 2*w*a0**3/GM*dw
-    dm = 2*w*s0**3/GM*dw
-
-    # Some methods (e.g. priors.py) use these fiducial values for scale...
-    rhobar = M/(4*np.pi/3*s0**3)
-
-    ## Gravity
-    # Nominal coefficients from Jacobson (2014) table 12
-    cfac = 25559e3/a0 # Jacobson (2014) radius converted to our equatorial radius
-    J2  = +3510.7e-6*cfac**2
-    J4  =   -34.2e-6*cfac**4
-    J6  =          0*cfac**6
-    J8  =          0*cfac**8
-    J10 =          0*cfac**10
-    J12 =          0*cfac**12
-    J14 =          0*cfac**14
-
-    # Recommended uncertainties
-    dJ2  = 0.7e-6*cfac**2
-    dJ4  = 1.3e-6*cfac**4
-    dJ6  = np.inf
-    dJ8  = np.inf
-    dJ10 = np.inf
-    dJ12 = np.inf
-    dJ14 = np.inf
-
-    # It is occasionally convenient to collect the Js and dJs in vectors.
-    Js = np.array((-1, J2, J4, J6, J8, J10, J12, J14))
-    dJs = np.array((0, dJ2, dJ4, dJ6, dJ8, dJ10, dJ12, dJ14))
+    def __init__(self, fname=CATALOG_FILE):
+        self.fname = fname
+        data = _load_data(fname)
+        planets = data['planets']
+        self.names = list(planets)
+        self.table = np.zeros(len(planets), dtype=[(key, float) for key in
+                                                   _FIELDS])
+        self.Js = np.zeros((len(planets), 8))
+        self.dJs = np.zeros((len(planets), 8))
+        self.notes = {}
+        self._overlays = {}
+        for k, (name, entry) in enumerate(planets.items()):
+            cfac = entry['J_radius']/entry['a0']
+            for key in _FIELDS:
+                self.table[key][k] = entry.get(key, np.nan)
+            self.table['cfac'][k] = cfac
+            scale = cfac**np.arange(2, 16, 2)
+            self.Js[k] = (-1, *(np.asarray(entry['J'], dtype=float)*scale))
+            self.dJs[k] = (0, *(np.asarray(entry['dJ'], dtype=float)*scale))
+            self.notes[name] = entry.get('notes', {})
+            self._overlays[name] = entry.get('overlays', {})
+        self.overlays = data.get('overlays', {})
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name.lower() in self.names
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def index(self, name):
+        """Row of planet `name` in table, Js, and dJs."""
+        try:
+            return self.names.index(name.lower())
+        except ValueError:
+            raise KeyError(f"Planet {name} is not in {self.fname}.") from None
+
+    def overlay(self, name, overlay):
+        """The overlay dict named `overlay` as it applies to planet `name`."""
+        if not isinstance(overlay, str):
+            return overlay
+        found = self._overlays[self.names[self.index(name)]].get(overlay,
+                    self.overlays.get(overlay))
+        if found is None:
+            raise KeyError(f"No overlay {overlay} for planet {name}.")
+        return found
+
+    def get(self, name, *overlays, **changes):
+        """Observables record of planet `name` with overlays applied in order.
+
+        Each overlay is the name of one defined in the data file or an overlay
+        dict; keyword arguments are applied last, as one more overlay.
+        """
+        k = self.index(name)
+        fields = {key: float(self.table[key][k]) for key in _FIELDS}
+        fields['pname'] = self.names[k]
+        Js = self.Js[k].copy()
+        dJs = self.dJs[k].copy()
+        tags = []
+        for overlay in overlays + ((changes,) if changes else ()):
+            _apply_overlay(fields, Js, dJs, self.overlay(name, overlay))
+            tags.append(overlay if isinstance(overlay, str) else 'custom')
+        fields.update(Js=Js, dJs=dJs, variant='+'.join(tags))
+        return Observables(fields)
+
+    def draw(self, n, seed=None, jmax=14):
+        """Perturbed M and Js of all planets at once (see Planet.draw).
+
+        Returns a dict with 'M' (n, nplanets) and 'Js' (n, nplanets, 8).
+        """
+        rng = np.random.default_rng(seed)
+        M = self.table['M'] + self.table['dM']*rng.standard_normal(
+                (n, len(self)))
+        use = np.isfinite(self.dJs) & (np.arange(8) <= jmax//2)
+        sd = np.where(use, self.dJs, 0.0)
+        Js = self.Js + sd*rng.standard_normal((n, len(self), 8))
+        return {'M': M, 'Js': Js}
+
+def _load_data(fname):
+    # Parse a catalog data file; YAML needs PyYAML, which is optional.
+    with open(fname) as f:
+        if os.path.splitext(fname)[1].lower() in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError(
+                    f"Reading {fname} requires PyYAML; use JSON instead.")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+catalog = Catalog()
+
+class _Tunable(Planet):
+    """Planet class whose instances take value and relative-sigma overrides."""
 
     def __init__(self, **kwargs):
         """Customize instance."""
@@ -269,17 +387,11 @@ class Uranus:
                 setattr(self, kw, val)
 
         # Let user override dJs and dM with more convenient *relative* sigs
-        if 'J2_sig' in kwargs and kwargs['J2_sig'] is not None:
-            self.dJ2 = abs(kwargs['J2_sig']*self.J2)
-        if 'J4_sig' in kwargs and kwargs['J4_sig'] is not None:
-            self.dJ4 = abs(kwargs['J4_sig']*self.J4)
-        if 'J6_sig' in kwargs and kwargs['J6_sig'] is not None:
-            self.dJ6 = abs(kwargs['J6_sig']*self.J6)
-        if 'J8_sig' in kwargs and kwargs['J8_sig'] is not None:
-            self.dJ8 = abs(kwargs['J8_sig']*self.J8)
-        if 'J10_sig' in kwargs and kwargs['J10_sig'] is not None:
-            self.dJ10 = abs(kwargs['J10_sig']*self.J10)
-        if 'M_sig' in kwargs and kwargs['M_sig'] is not None:
+        for n in range(2, 12, 2):
+            sig = kwargs.get(f'J{n}_sig')
+            if sig is not None:
+                setattr(self, f'dJ{n}', abs(sig*getattr(self, f'J{n}')))
+        if kwargs.get('M_sig') is not None:
             self.dM = kwargs['M_sig']*self.M
 
         # We have to manually reset Js and dJs for this instance
@@ -288,115 +400,35 @@ class Uranus:
         self.dJs = np.array(
                 (0,self.dJ2,self.dJ4,self.dJ6,self.dJ8,self.dJ10,self.dJ12,self.dJ14))
 
-class Uranus_ppwd(Uranus):
-    J2  =  Uranus.J2
-    J4  =  Uranus.J4
-    J6  =  5.1769e-7
-    J8  = -1.0421e-8
-    J10 =  2.5672e-10
-    J12 = -7.2879e-12
-    J14 =  2.4279e-13
-
-    dJ2  = 1e-6*J2
-    dJ4  = 1e-5*J4
-    dJ6  = 1e-4*J6
-    dJ8  = 1e-4*J8
-    dJ10 = 1e-2*J10
-    dJ12 = 1e-0*J12
-    dJ14 = 1e-0*J14
-
-    Js = np.array((-1, J2, J4, J6, J8, J10, J12, J14))
-    dJs = np.array((0, dJ2, dJ4, dJ6, dJ8, dJ10, dJ12, dJ14))
-
-class Uranus_uncertain_rotation(Uranus_ppwd):
-    dP = 1800
-    dw = 2*np.pi/Uranus.P**2*dP
-    dq = 2*Uranus.w*Uranus.a0**3/Uranus.GM*dw
-    dm = 2*Uranus.w*Uranus.s0**3/Uranus.GM*dw
-
-class Neptune:
-    pname = 'neptune'
-
-    # Mass and radius, https://ssd.jpl.nasa.gov/ (2018)
-    M = 102.4126e24
-    dM = 0.0048e24
-    a0 = 24764e3
-    s0 = 24622e3
-
-    # Boundary conditions
-    P0 = 1e5            # The reference radius is the 1 bar level
-    T0 = 72; dT0 = 2    # Lindal, G.F., 1992. Astrophys. J. 103, 967–982.
-    rho0 = 0.387        # Protosolar ideal gas (mmw=2.319 amu) at (P0,T0)
-    drho0 = 0.0108      # half the range of T0+/-dT0
-    rhomax = 20000      # Generous guess
-
-    # Nominal rotation rate, https://ssd.jpl.nasa.gov/ (2018)
-    P = 0.67125*24*3600
-    w = 2*np.pi/P
-    GM = G*M
-    q = w**2*a0**3/GM
-    m = w**2*s0**3/GM
+def _planet_class(cls_name, name, *overlays, base=Planet, doc=None):
+    # A class with a catalog record's fields as class attributes.
+    rec = catalog.get(name, *overlays)
+    attrs = {key: getattr(rec, key) for key in ('pname',) + _FIELDS + _DERIVED
+             if key not in ('NMoI', 'dNMoI') or np.isfinite(getattr(rec, key))}
+    for n in range(2, 16, 2):
+        attrs[f'J{n}'] = rec.Js[n//2]
+        attrs[f'dJ{n}'] = rec.dJs[n//2]
+    attrs.update(Js=np.array(rec.Js), dJs=np.array(rec.dJs), __doc__=doc,
+                 __module__=__name__)
+    return type(cls_name, (base,), attrs)
+
+Jupiter = _planet_class('Jupiter', 'jupiter')
+Jupiter_tof4 = _planet_class('Jupiter_tof4', 'jupiter', 'tof4', base=Jupiter,
+    doc="""Modify gravity uncertainties to tof4 truncation error.""")
+Saturn = _planet_class('Saturn', 'saturn')
+Saturn_tof4 = _planet_class('Saturn_tof4', 'saturn', 'tof4', base=Saturn,
+    doc="""Modify gravity uncertainties to tof4 truncation error.""")
+Saturn_winds = _planet_class('Saturn_winds', 'saturn', 'winds', base=Saturn,
+    doc="""Gravity uncertainties reflecting potential deep wind contribution.
 
-    # Sometimes we use an estimate of roation period uncertainty
-    dP = 600 # Basically a wild guess, see e.g. Podolak and Helled 2012
-    dw = 2*np.pi/P**2*dP
-    dq = 2*w*a0**3/GM*dw
-    dm = 2*w*s0**3/GM*dw
-
-    # Some methods (e.g. priors.py) use these fiducial values for scale...
-    rhobar = M/(4*np.pi/3*s0**3)
-
-    ## Gravity
-    # Nominal coefficients from Jacobson (2009) table 5
-    cfac = 25225e3/a0 # Jacobson (2009) radius converted to our equatorial radius
-    J2  = +3408.4e-6*cfac**2
-    J4  =   -33.4e-6*cfac**4
-    J6  =          0*cfac**6
-    J8  =          0*cfac**8
-    J10 =          0*cfac**10
-    J12 =          0*cfac**12
-    J14 =          0*cfac**14
-
-    # Recommended uncertainties
-    dJ2  = 4.5e-6*cfac**2
-    dJ4  = 2.9e-6*cfac**4
-    dJ6  = np.inf
-    dJ8  = np.inf
-    dJ10 = np.inf
-    dJ12 = np.inf
-    dJ14 = np.inf
-
-    # It is occasionally convenient to collect the Js and dJs in vectors.
-    Js = np.array((-1, J2, J4, J6, J8, J10, J12, J14))
-    dJs = np.array((0, dJ2, dJ4, dJ6, dJ8, dJ10, dJ12, dJ14))
-
-    def __init__(self, **kwargs):
-        """Customize instance."""
-
-        # First override any defaults with directly supplied value
-        for kw, val in kwargs.items():
-            if kw in dir(self) and kwargs[kw] is not None:
-                setattr(self, kw, val)
-
-        # Let user override dJs and dM with more convenient *relative* sigs
-        if 'J2_sig' in kwargs and kwargs['J2_sig'] is not None:
-            self.dJ2 = abs(kwargs['J2_sig']*self.J2)
-        if 'J4_sig' in kwargs and kwargs['J4_sig'] is not None:
-            self.dJ4 = abs(kwargs['J4_sig']*self.J4)
-        if 'J6_sig' in kwargs and kwargs['J6_sig'] is not None:
-            self.dJ6 = abs(kwargs['J6_sig']*self.J6)
-        if 'J8_sig' in kwargs and kwargs['J8_sig'] is not None:
-            self.dJ8 = abs(kwargs['J8_sig']*self.J8)
-        if 'J10_sig' in kwargs and kwargs['J10_sig'] is not None:
-            self.dJ10 = abs(kwargs['J10_sig']*self.J10)
-        if 'M_sig' in kwargs and kwargs['M_sig'] is not None:
-            self.dM = kwargs['M_sig']*self.M
-
-        # We have to manually reset Js and dJs for this instance
-        self.Js = np.array(
-                (-1,self.J2,self.J4,self.J6,self.J8,self.J10,self.J12,self.J14))
-        self.dJs = np.array(
-                (0,self.dJ2,self.dJ4,self.dJ6,self.dJ8,self.dJ10,self.dJ12,self.dJ14))
+    See fig. 4 in Galanti, E., & Kaspi, Y. (2017). The Astrophysical Journal,
+    843(2), L25.
+    """)
+Uranus = _planet_class('Uranus', 'uranus', base=_Tunable)
+Uranus_ppwd = _planet_class('Uranus_ppwd', 'uranus', 'ppwd', base=Uranus)
+Uranus_uncertain_rotation = _planet_class('Uranus_uncertain_rotation',
+    'uranus', 'ppwd', 'uncertain_rotation', base=Uranus_ppwd)
+Neptune = _planet_class('Neptune', 'neptune', base=_Tunable)
 
 if __name__ == "__main__":
     print(Saturn)
@@ -0,0 +1,402 @@
+import os
+import time
+import numpy as np
+import lamat2021 as l21
+import observables
+
+# These tests need only numpy: krono need not be installed. Tests that relax
+# models take the `krono` fixture, which substitutes the stub package of
+# conftest.py for krono. Run with `python -m pytest`.
+
+def test_failure_log_non_ascii(tmp_path):
+    msg = 'T out of range in serpentine table: 1.2e5 K ≥ T_max — ' * 8
+    try:
+        raise ValueError(msg)
+    except ValueError as err:
+        log = l21.FailureLog(str(tmp_path / 'failures'))
+        log.add(err, {'rio': 0.2, 'roo': 0.6})
+        log.add(err, {'rio': 0.3, 'roo': 0.7})
+    cols = log.read('ValueError')
+    assert len(cols['error']) == 2
+    assert all(err == msg for err in cols['error'])
+    assert log.store.records()[0]['error'] == msg
+
+def test_results_store_keeps_int_columns(tmp_path):
+    store = l21.ResultsStore(str(tmp_path / 'results'))
+    store.append([{'nz': 512, 'niter': 12, 'J2': 14696.5},
+                  {'nz': 1024, 'niter': 9, 'J2': 14696.6}])
+    rec = store.records()[1]
+    assert type(rec['nz']) is int and rec == {'nz': 1024, 'niter': 9,
+                                              'J2': 14696.6}
+    assert store.read()['niter'].dtype.kind == 'i'
+    # an int column takes floats, and gaps, by becoming float
+    store.append({'nz': 2048, 'niter': 7.5})
+    store.append({'nz': 4096})
+    cols = store.read()
+    assert cols['nz'].dtype.kind == 'i' and cols['niter'].dtype.kind == 'f'
+    assert cols['niter'].tolist()[:3] == [12., 9., 7.5]
+    assert np.isnan(cols['niter'][3]) and np.isnan(cols['J2'][2])
+    store.append({'nz': 64, 'uid': 'a'})
+    assert store.read()['nz'].dtype.kind == 'i'
+
+class DictEOS:
+    # Returns a dict of arrays, like IceRockEOS.get; counts its calls.
+    def __init__(self):
+        self.ncalls = 0
+
+    def get(self, logp, logt):
+        self.ncalls += 1
+        return {'logrho': logp - logt, 'logs': logp + logt}
+
+    def get_logrho(self, logp, logt):
+        self.ncalls += 1
+        return logp - logt
+
+def test_refine_design_flat_j2_no_repeats():
+    done = l21.design(16, seed=1)
+    results = [dict(par, status='ok', J2=14696.5) for par in done]
+    new = l21.refine_design(results, 12, focus=1.0, seed=1)
+    assert len(new) == 12
+    names = list(l21.DESIGN_BOUNDS)
+    pts = np.array([[par[name] for name in names] for par in done + new])
+    assert len(np.unique(pts, axis=0)) == len(pts)
+
+def test_refine_design_from_incomplete_store(tmp_path):
+    store = l21.ResultsStore(str(tmp_path / 'results'))
+    for par in l21.param_grid(rio=[0.1, 0.2], roo=[0.6, 0.7], y2_xy=[0.3]):
+        store.append(dict(par, status='ok', J2=14696.5))
+    try:
+        l21.refine_design(store, 4, seed=1)
+    except ValueError as err:
+        assert all(name in str(err) for name in ('drho_a', 'drho_c', 'z1'))
+    else:
+        raise AssertionError("refine_design() ignored missing columns")
+    fixed = {'drho_a': -0.05, 'drho_c': 10., 'z1': 0.02}
+    new = l21.refine_design(store, 4, seed=1, fixed=fixed)
+    assert len(new) == 4
+    for par in new:
+        assert {key: par[key] for key in fixed} == fixed
+        assert 0.05 <= par['rio'] <= 0.5 and 0.27 <= par['y2_xy'] <= 0.45
+
+def test_memo_eos_hits_nearby_points():
+    # Profiles that move by less than tol between calls, as they do over
+    # the last outer iterations of a relaxation, are answered from the memo.
+    eos = DictEOS()
+    memo = l21.MemoEOS(eos, tol=1e-5)
+    logp = np.linspace(6, 13, 1024)
+    logt = np.linspace(2.2, 4.3, 1024)
+    for k in range(10):
+        shift = 1e-7*k
+        res = memo.get(logp + shift, logt - shift)
+        np.testing.assert_allclose(res['logrho'], logp - logt, atol=1e-5)
+        np.testing.assert_allclose(memo.get_logrho(logp + shift, logt - shift),
+                                   logp - logt, atol=1e-5)
+    st = memo.stats()
+    assert st['hit_rate'] > 0.85
+    assert st['entries'] < 1.2*2*len(logp)
+    # a call with new points only evaluates those
+    memo.get_logrho(np.r_[logp[:10], 20.], np.r_[logt[:10], 5.])
+    assert memo.misses == st['misses'] + 1
+
+def test_memo_eos_bounded():
+    memo = l21.MemoEOS(DictEOS(), tol=1e-5, maxbytes=2**16)
+    for k in range(20):
+        memo.get_logrho(np.linspace(6, 13, 500) + 0.01*k, np.full(500, 3.))
+    st = memo.stats()
+    assert st['nbytes'] <= 2**16 and st['evictions'] > 0
+
+def test_model_store_loads_states_on_demand(tmp_path):
+    path = str(tmp_path / 'states')
+    store = l21.ModelStore(['rio'], path, cache=2)
+    for k in range(5):
+        store.add({'rio': 0.1*k}, {'z2': float(k), 'tof.rho': np.full(8, k)})
+    other = l21.ModelStore(['rio'], path, cache=2)
+    assert len(other) == 5 and not other._cached
+    state = other.nearest({'rio': 0.21})
+    assert state['z2'] == 2. and np.all(state['tof.rho'] == 2)
+    for k in range(5):
+        other.nearest({'rio': 0.1*k})
+    assert len(other._cached) == 2
+
+def test_summarize_requires_model_quantities():
+    import types
+    t = types.SimpleNamespace(j2=0.0147, mtot_calc=1.9e30, outer_iteration=7,
+                              model=types.SimpleNamespace(ymean_xy=0.275))
+    rec = l21.summarize(t)
+    assert rec['niter'] == 7 and rec['ymean'] == 0.275
+    del t.outer_iteration
+    try:
+        l21.summarize(t)
+    except AttributeError as err:
+        assert 'iteration count' in str(err)
+    else:
+        raise AssertionError("summarize() accepted a model without niter")
+
+def test_compare_bench_flags_missing_niter():
+    case = {'case': 'jupiter', 'nz': 512, 'status': 'ok', 'walltime': 1.0,
+            'niter': 20, 'n_eos': 100}
+    baseline = {'cases': [case]}
+    assert l21.compare_bench({'cases': [dict(case)]}, baseline) == []
+    flagged = l21.compare_bench({'cases': [dict(case, niter=-1)]}, baseline)
+    assert [f[2] for f in flagged] == ['niter']
+    nocount = {key: val for key, val in case.items() if key != 'niter'}
+    flagged = l21.compare_bench({'cases': [nocount]}, baseline)
+    assert [f[2] for f in flagged] == ['niter']
+
+def test_bench_counts_each_eos_call_once(krono, monkeypatch):
+    # the stub makes one hhe and one z eos call per outer iteration
+    monkeypatch.setattr('sys.argv', ['pytest'])
+    get_eos, get_z_eos = l21.get_eos, l21.get_z_eos
+    for case in ('jupiter-dual', 'jupiter-2l', 'jupiter-3l'):
+        rec = l21._bench_case(case, 64)
+        assert rec['status'] == 'ok', rec.get('error')
+        assert rec['n_eos'] == 2*rec['niter']
+    assert l21.get_eos is get_eos and l21.get_z_eos is get_z_eos
+
+def _run_driver(name, args, monkeypatch):
+    # Run drive_<name>.py's _main with command line args.
+    import importlib
+    drv = importlib.import_module(f'drive_{name}')
+    monkeypatch.setattr('sys.argv', [f'drive_{name}.py'] + args)
+    return drv._main(drv._PCL())
+
+def test_cache_keys_agree_across_entry_points(krono, tmp_path, monkeypatch):
+    cache = str(tmp_path / 'results')
+    # a driver's model is found by the server (and the spec 1.0 is pure ice)
+    t, _ = _run_driver('2l_model', ['jupiter', '0.27', '0.02', '0.1',
+                                    '--nzones', '64', '-v', '0',
+                                    '--cache', cache], monkeypatch)
+    for z_eos in ('ice', 1.0):
+        rep = l21.serve_request({'model': 'twoLayerModel', 'params': t.params,
+                                 'z_eos': z_eos, 'cache': cache})
+        assert rep['status'] == 'ok' and rep['cached']
+    t, _ = _run_driver('2l_model', ['jupiter', '0.27', '0.02', '0.1',
+                                    '--nzones', '64', '-v', '0', '--z-eos', '1',
+                                    '--cache', cache], monkeypatch)
+    assert t.cached
+    # a sweep's model is found by the server
+    par = {'rio': 0.2, 'roo': 0.6, 'y2_xy': 0.3, 'nz': 64}
+    rec, = l21.sweep([par], nworkers=1, cache=cache)
+    assert rec['status'] == 'ok' and not rec['cached']
+    params = l21.dual_cavity_params(par, l21.get_obs('jupiter'))
+    rep = l21.serve_request({'model': 'dualCavityModel', 'params': params,
+                             'cache': cache})
+    assert rep['status'] == 'ok' and rep['cached']
+
+def test_three_layer_z_eos_defaults_to_ice(krono, tmp_path, monkeypatch):
+    t = l21.run_3l({'nz': 64})
+    assert t.model.z_eos is l21.get_eos('ice')
+    _run_driver('drho_scan', ['jupiter', '--model', '3l', '--drho-a', '-0.1',
+                              '--nzones', '64', '-v', '0'], monkeypatch)
+    _run_driver('rotation', ['jupiter', str(tmp_path / 'rot.npz'), '--model',
+                             '3l', '--draws', '20', '--nodes', '3',
+                             '--nzones', '64', '-v', '0'], monkeypatch)
+    assert {spec for spec, _ in l21._memo_instances} == {'hhe', 'ice'}
+
+def test_warm_start_carries_only_adjusted_quantities(krono):
+    t = l21.run_3l({'nz': 64})
+    state = l21.model_state(t)
+    assert {key for key in state if not key.startswith('tof.')} == \
+           {'y2_xy', 'ri'}
+    # z2 is an input of the three-layer model, small unless adjust_small
+    obs = l21.get_obs('jupiter')
+    state = {'z2': 0.7, 'small': 0.2, 'y2_xy': 0.33, 'ri': 0.15}
+    params = l21.three_layer_params({}, obs)
+    l21.apply_warm_start(params, state, model='threeLayerModel')
+    assert params['z2'] == 0.1 and params['small'] == obs.m
+    assert params['y2_xy'] == 0.33 and params['ri'] == 0.15
+    params = l21.three_layer_params({'m': 0.1, 'adjust_small': True}, obs)
+    l21.apply_warm_start(params, state, model='threeLayerModel')
+    assert params['small'] == 0.2
+    params = l21.dual_cavity_params({'rio': 0.2, 'roo': 0.6}, obs)
+    l21.apply_warm_start(params, state)
+    assert params['z2'] == 0.7 and 'ri' not in params
+
+def test_model_store_partitioned_by_planet(krono, tmp_path):
+    store = str(tmp_path / 'store')
+    par = {'rio': 0.2, 'roo': 0.6, 'y2_xy': 0.3, 'nz': 64}
+    for obs, rio, warm in (('jupiter', 0.2, False), ('jupiter', 0.21, True),
+                           ('saturn', 0.2, False)):
+        rec, = l21.sweep([dict(par, rio=rio)], obs, nworkers=1, store=store)
+        assert rec['status'] == 'ok' and rec['warm_start'] == warm
+
+def test_checkpoint_resumes_same_inputs_only(krono, tmp_path, capsys):
+    fname = str(tmp_path / 'ckpt.npz')
+    par = {'rio': 0.2, 'roo': 0.6, 'y2_xy': 0.3, 'nz': 64}
+    def interrupted():
+        try:
+            l21.run_one(dict(par, max_iters_outer=3),
+                        checkpoint=l21.Checkpoint(fname, 0.))
+        except RuntimeError:
+            pass
+        return l21.Checkpoint(fname)
+    cold = l21.run_one(par).outer_iteration
+    ckpt = interrupted()
+    t = l21.run_one(dict(par, y2_xy=0.31), checkpoint=ckpt)
+    assert ckpt.state is None and t.resumed_iters == 0
+    assert 'not resuming' in capsys.readouterr().err
+    ckpt = interrupted()
+    t = l21.run_one(par, checkpoint=ckpt)
+    assert ckpt.state is not None and t.resumed_iters == 3
+    assert t.outer_iteration < cold
+
+def test_multires_sweep_counts_every_level(krono):
+    par = {'rio': 0.2, 'roo': 0.6, 'y2_xy': 0.3, 'nz': 64}
+    rec, = l21.sweep([par], nworkers=1, levels=[16, 32])
+    assert rec['status'] == 'ok'
+    # the stub makes one hhe and one z eos call per outer iteration
+    assert rec['n_eos'] == 2*rec['niter'] and rec['niter'] > rec['niter_final']
+
+def test_surrogate_constant_output_is_certain():
+    rng = np.random.default_rng(1)
+    pars = [{'rio': rio, 'roo': roo} for rio, roo in rng.uniform(0, 1, (20, 2))]
+    results = [dict(par, J2=14696.5 + 100*par['rio'], ymean=0.275,
+                    status='ok') for par in pars]
+    sur = l21.Surrogate(['rio', 'roo'], ['J2', 'ymean']).fit(results)
+    mean, sd = sur.predict([{'rio': 0.3, 'roo': 0.4}, {'rio': 0.9, 'roo': 0.1}])
+    assert np.all(mean[:,1] == 0.275) and np.all(sd[:,1] == 0)
+    np.testing.assert_allclose(mean[:,0], [14726.5, 14786.5], rtol=1e-5)
+    assert np.all(sd[:,0] > 0)
+
+_PAR = {'rio': 0.2, 'roo': 0.6, 'y2_xy': 0.3, 'nz': 64}
+
+def test_sweep_returns_records_in_order(krono):
+    pars = [dict(_PAR, rio=rio) for rio in (0.15, 0.2, 0.25, 0.3)]
+    seen = []
+    results = l21.sweep(pars, nworkers=2, callback=seen.append)
+    assert [rec['rio'] for rec in results] == [0.15, 0.2, 0.25, 0.3]
+    assert all(rec['status'] == 'ok' for rec in results)
+    assert sorted(rec['rio'] for rec in seen) == [0.15, 0.2, 0.25, 0.3]
+    # the stub makes one hhe and one z eos call per outer iteration
+    assert all(rec['n_eos'] == 2*rec['niter'] for rec in results)
+    assert '4 timed models' in l21.timing_report(results)
+
+def test_eos_cache_memory_maps_arrays(krono, tmp_path):
+    import pickle
+    obj = {'big': np.arange(4096.), 'small': np.arange(4.)}
+    with open(tmp_path / 'obj.pkl', 'wb') as f:
+        l21._ArrayPickler(f, str(tmp_path)).dump(obj)
+    with open(tmp_path / 'obj.pkl', 'rb') as f:
+        out = l21._ArrayUnpickler(f, str(tmp_path)).load()
+    assert isinstance(out['big'], np.memmap) and np.all(out['big'] == obj['big'])
+    assert not isinstance(out['small'], np.memmap)
+    eos = l21.get_eos('ice')
+    assert eos.name == 'ice' and l21.get_eos('ice') is eos
+    assert os.path.isfile(os.path.join(l21._eos_cache_path('ice'), 'eos.pkl'))
+
+def test_icerock_eos_mixes_volumes(krono):
+    from krono.eos import aneos_pure
+    mix = l21.IceRockEOS(0.3, logp=(5., 15., 41), logt=(1.5, 5., 29))
+    # inside the mesh and beyond it (answered by the pure eos)
+    logp, logt = np.array([6.1, 9.33, 14.9, 16.]), np.array([2., 3.7, 4.9, 3.])
+    ice, rock = aneos_pure.eos('ice'), aneos_pure.eos('serpentine')
+    expect = -np.log10(0.3*10**-ice.get_logrho(logp, logt) +
+                       0.7*10**-rock.get_logrho(logp, logt))
+    np.testing.assert_allclose(mix.get_logrho(logp, logt), expect, rtol=1e-12)
+    np.testing.assert_allclose(mix.get_logrho(logp, logt, f_ice=1.),
+                               ice.get_logrho(logp, logt), rtol=1e-12)
+    assert l21.get_z_eos(1.0) is l21.get_eos('ice')
+
+def test_result_cache_hits_and_evicts(krono, tmp_path):
+    cache = l21.ResultCache(str(tmp_path / 'results'))
+    params = l21.dual_cavity_params(_PAR, l21.get_obs('jupiter'))
+    t = l21.run_one(_PAR)
+    key = cache.key(params, eos=l21.eos_tag('ice'))
+    assert cache.get(key) is None
+    cache.put(key, t)
+    entry = cache.get(key)
+    assert entry['J2'] == l21.summarize(t)['J2']
+    np.testing.assert_array_equal(entry['tof.rho'], t.rho)
+    # initial guesses of adjusted quantities don't change the key
+    assert cache.key(dict(params, z2=0.7), eos=l21.eos_tag('ice')) == key
+    assert cache.key(dict(params, z1=0.02), eos=l21.eos_tag('ice')) != key
+    cache.max_bytes = 1
+    cache.put(cache.key(dict(params, z1=0.02)), t)
+    assert cache.get(key) is None
+
+def test_mcmc_chain_resumes(krono, tmp_path):
+    ckpt = str(tmp_path / 'chain.npz')
+    bounds = {'y1': (0.2, 0.3), 'z1': (0.0, 0.05)}
+    kw = dict(fixed={'nz': 64}, nworkers=2, seed=1, verbosity=0,
+              checkpoint=ckpt)
+    chain, lnp, _ = l21.run_mcmc(['y1', 'z1'], bounds, 4, 2, **kw)
+    assert chain.shape == (2, 4, 2) and lnp.shape == (2, 4)
+    assert np.all(np.isfinite(lnp))
+    more, _, _ = l21.run_mcmc(['y1', 'z1'], bounds, 4, 3, **kw)
+    assert more.shape == (3, 4, 2)
+    np.testing.assert_array_equal(more[:2], chain)
+
+def test_sharded_sweep_resumes_and_merges(krono, tmp_path):
+    table = [dict(_PAR, rio=rio) for rio in (0.15, 0.2, 0.25, 0.3, 0.35)]
+    outdir = str(tmp_path / 'out')
+    for task in (1, 0):
+        assert l21.run_task(table, task, 2, outdir, nworkers=1) > 0
+    assert l21.run_task(table, 0, 2, outdir, nworkers=1) == 0
+    merged = l21.merge_shards(outdir).read()
+    assert merged['row'].tolist() == [0, 1, 2, 3, 4]
+    assert merged['rio'].tolist() == [0.15, 0.2, 0.25, 0.3, 0.35]
+
+def test_sweep_retries_and_logs_failures(krono, tmp_path):
+    failures = str(tmp_path / 'failures')
+    rec, = l21.sweep([_PAR], nworkers=1, max_iters=2, retries=2,
+                     failures=failures)
+    assert rec['status'] == 'RuntimeError' and rec['attempts'] == 3
+    assert len(l21.FailureLog(failures).read('RuntimeError')['error']) == 1
+
+def _sleep(sec):
+    # SupervisedPool task for test_supervised_pool_kills_slow_tasks.
+    time.sleep(sec)
+    return {'status': 'ok'}
+
+def test_supervised_pool_kills_slow_tasks():
+    with l21.SupervisedPool(_sleep, 2, timeout=0.5, poll=0.05) as pool:
+        pool.submit('slow', 30.)
+        pool.submit('fast', 0.)
+        out = dict(pool.results())
+    assert out['fast']['status'] == 'ok' and out['slow']['status'] == 'Timeout'
+    assert pool.nkilled == 1
+
+def test_server_relaxes_requests(krono, tmp_path):
+    import io, json
+    params = l21.dual_cavity_params(_PAR, l21.get_obs('jupiter'))
+    reqs = [{'model': 'dualCavityModel', 'params': params},
+            {'model': 'dualCavityModel', 'params': params, 'accel': 'secant',
+             'checkpoint': [str(tmp_path / 'ckpt.npz'), 0.]},
+            {'model': 'noSuchModel', 'params': params}]
+    fout = io.StringIO()
+    l21.serve_stdio(io.StringIO(''.join(json.dumps(req) + '\n'
+                                        for req in reqs)), fout)
+    reps = [json.loads(line) for line in fout.getvalue().splitlines()]
+    assert [rep['status'] for rep in reps] == ['ok', 'ok', 'ValueError']
+    assert abs(reps[1]['J2']/reps[0]['J2'] - 1) < 1e-6
+    assert reps[1]['n_accel'] > 0
+    assert not os.path.exists(tmp_path / 'ckpt.npz')
+
+def test_fit_js_recovers_parameter(krono):
+    obs = observables.catalog.get('jupiter', 'tof4').asdict()
+    obs['Js'] = l21.model_Js(l21.run_one(dict(_PAR, rio=0.25)))
+    obs = observables.Observables(obs)
+    par, summary, report = l21.fit_Js(_PAR, ['rio'], obs, tol=0.01,
+                                      nworkers=1, verbosity=0)
+    assert abs(par['rio'] - 0.25) < 1e-3 and report[-1]['r'] <= 0.01
+    assert [rep['kind'] for rep in report[:2]] == ['base', 'fd']
+
+def test_drho_scan_continues_from_base(krono):
+    grid = {'drho_a': [-0.2, -0.1, -0.05]}
+    results, base = l21.drho_scan(_PAR, grid)
+    assert [rec['status'] for rec in results] == ['ok']*3
+    assert results[2]['warm_from'] == -1
+    assert results[1]['warm_from'] == 2 and results[0]['warm_from'] == 1
+    assert all(rec['niter'] < base['niter'] for rec in results)
+
+def test_rotation_scan_interpolates_nodes(krono):
+    out = l21.rotation_scan(_PAR, 50, nodes=3, seed=1)
+    assert len(out['records']) == 4 and out['Js'].shape == (50, 8)
+    k = np.argmax(out['small'])
+    direct = l21.model_Js(l21.run_one(dict(_PAR, small=out['small'][k])))
+    np.testing.assert_allclose(out['Js'][k,1], direct[1], rtol=1e-6)
+
+def test_secant_acceleration_saves_iterations(krono):
+    out = l21.compare_outer(_PAR, method='secant')
+    assert out['naccel'] > 0 and out['saved'] > 0
+    assert out['dJ'] < 1e-3
@@ -0,0 +1,29 @@
+import numpy as np
+import observables
+import lamat2021 as l21
+
+def test_batched_scores_match_single_models():
+    obs = observables.Jupiter_tof4()
+    rng = np.random.default_rng(2)
+    sd = np.where(np.isfinite(obs.dJs), obs.dJs, 0.0)
+    Js = obs.Js + sd*rng.standard_normal((5, 8))
+    d = obs.J_mahalanobis(Js, jmax=6)
+    lnl = obs.J_loglike(Js, jmax=6)
+    assert d.shape == lnl.shape == (5,)
+    for k in range(5):
+        assert np.isclose(d[k], obs.J_mahalanobis(Js[k], jmax=6))
+        assert np.isclose(lnl[k], obs.J_loglike(Js[k], jmax=6))
+    cov = np.diag(sd**2)
+    np.testing.assert_allclose(obs.J_mahalanobis(Js, cov, jmax=6), d)
+
+def test_catalog_overlays():
+    obs = observables.catalog.get('saturn', 'winds', dP=300)
+    assert obs.variant == 'winds+custom' and obs.dP == 300
+    assert obs.J2 == observables.catalog.get('saturn').J2
+    assert l21.obs_tag(l21.get_obs('saturn+winds')) == 'saturn+winds'
+    try:
+        obs.dP = 1
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("Observables records should be frozen")